@@ -0,0 +1,266 @@
+import json
+import os
+import time
+import zlib
+from ebs_instrument import timed
+from ebs_model import Task
+from ebs_stats import VelocityStats
+from ebs_storage import atomic_write
+from ebs_timeline import DAY_SECONDS, Timeline, completion_time, task_velocity
+
+# Cold store for old completed tasks. They only matter for the velocity
+# statistics, so `ebs archive` moves them out of the data file into three files
+# next to it:
+#
+#   ebs_data.archive.jsonl.gz     the full task dicts, one per line; every archive
+#                                 run appends one gzip member
+#   ebs_data.archive.index.jsonl  one line per run with the names and the
+#                                 velocity rows of its tasks
+#   ebs_data.archive.json         summary loaded at startup: the number of
+#                                 archived tasks, their per-day timeline sums,
+#                                 decayed-velocity state and merged statistics
+#
+# The summary is merged into the repository's statistics and timeline (see
+# TaskRepository.attach_archive), so velocities, predictions and history are the
+# same as before archiving while only the open and recent tasks are loaded and
+# saved. Its size depends on the number of days, not of tasks. The index is read
+# on first use, for name checks, the per-task statistics and resampling; the
+# tasks themselves are read from the compressed file on demand.
+#
+# An archive run appends to the compressed file and the index, then saves the
+# summary (which records how many bytes of both files it covers and that the
+# run is pending), then deletes the tasks from the store and clears the pending
+# flag. Bytes past the recorded sizes are an interrupted run whose tasks are
+# still in the store, and are dropped by the next run; while a run is pending,
+# tasks that are archived but still in the store are removed when the archive
+# is attached.
+DEFAULT_ARCHIVE_DAYS = 90
+COMPRESS_LEVEL = 6
+READ_CHUNK = 1 << 16
+
+def archive_paths(data_path):
+    base = os.path.splitext(data_path)[0]
+    return base + ".archive.jsonl.gz", base + ".archive.json", base + ".archive.index.jsonl"
+
+# Append `data` to a file cut back to `size` bytes; returns the new size
+def _append_at(path, size, data):
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.truncate(size)
+        f.seek(size)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+class Archive:
+    def __init__(self, data_path):
+        self.path, self.summary_path, self.index_path = archive_paths(data_path)
+        # Bytes of the compressed file and of the index covered by the summary
+        self.size = 0
+        self.index_size = 0
+        self.count = 0
+        # Timeline sums per day ordinal of the archived tasks (see ebs_timeline)
+        self.days = {}
+        # Decayed-velocity state of the archived tasks (see Timeline.decay_state)
+        self.decay = Timeline().decay_state()
+        self.stats = VelocityStats()
+        # Set from an archive run's summary until its tasks left the store
+        self.pending = False
+        self._names = None
+        self._rows = None
+        self._entries = None
+
+    # The archive of a data file, or None when nothing was archived yet
+    @classmethod
+    @timed("archive.Archive.open")
+    def open(cls, data_path):
+        archive = cls(data_path)
+        if not os.path.exists(archive.summary_path):
+            return None
+        with open(archive.summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        archive.size = summary["size"]
+        archive.index_size = summary["index_size"]
+        archive.count = summary["count"]
+        archive.days = {int(day): sums for day, sums in summary["days"].items()}
+        archive.decay = summary["decay"]
+        archive.stats = VelocityStats.from_summary(summary["stats"])
+        archive.pending = summary["pending"]
+        return archive
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return name in self.names
+
+    # Archived names in archive order, as dict keys
+    @property
+    def names(self):
+        if self._names is None:
+            self._load_index()
+        return self._names
+
+    # (estimator, estimated, actual, velocity, completion time) of every archived
+    # task with a velocity
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._load_index()
+        return self._rows
+
+    # (estimated, actual, velocity) of the rows, for VelocityStats.entries
+    def entries(self):
+        if self._entries is None:
+            self._entries = [row[1:4] for row in self.rows]
+        return self._entries
+
+    @timed("archive.Archive.load_index")
+    def _load_index(self):
+        names = {}
+        rows = []
+        if self.index_size:
+            with open(self.index_path, "rb") as f:
+                for line in f.read(self.index_size).splitlines():
+                    run = json.loads(line)
+                    names.update(dict.fromkeys(run["names"]))
+                    rows.extend(tuple(row) for row in run["rows"])
+        self._names, self._rows = names, rows
+
+    def _save_summary(self):
+        atomic_write(self.summary_path, json.dumps({
+            "size": self.size,
+            "index_size": self.index_size,
+            "count": self.count,
+            "days": self.days,
+            "decay": self.decay,
+            "stats": self.stats.summary(),
+            "pending": self.pending
+        }, separators=(",", ":")))
+
+    # Write tasks to the archive. Returns their part of the statistics (a
+    # VelocityStats) for TaskRepository.archive_tasks. The run stays pending
+    # until settle() is called once the tasks are deleted from the store.
+    @timed("archive.Archive.add")
+    def add(self, tasks):
+        names = self.names
+        stats = VelocityStats()
+        rows = []
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        chunks = []
+        for task in tasks:
+            if task.name in names:
+                raise ValueError(f"Task '{task.name}' is already archived")
+            chunks.append(compressor.compress((json.dumps(task.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")))
+            stats.add_task(task)
+            velocity = task_velocity(task)
+            if velocity is not None:
+                rows.append((task.estimator, task.estimated_hours, task.actual_hours, velocity, completion_time(task)))
+        chunks.append(compressor.flush())
+        run = [task.name for task in tasks]
+        size = _append_at(self.path, self.size, b"".join(chunks))
+        index_size = _append_at(self.index_path, self.index_size, (json.dumps(
+            {"names": run, "rows": rows}, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+        timeline = Timeline.from_tasks(tasks)
+        for day, sums in timeline.days.items():
+            old = self.days.get(day)
+            self.days[day] = list(sums) if old is None else [a + b for a, b in zip(old, sums)]
+        merged = Timeline()
+        merged.add_decay(self.decay)
+        merged.add_decay(timeline.decay_state())
+        self.decay = merged.decay_state()
+        self.size, self.index_size = size, index_size
+        self.count += len(run)
+        names.update(dict.fromkeys(run))
+        self._rows.extend(rows)
+        self._entries = None
+        self.stats.merge(stats)
+        self.pending = True
+        self._save_summary()
+        return stats
+
+    # Record that the last run's tasks are gone from the store
+    def settle(self):
+        if self.pending:
+            self.pending = False
+            self._save_summary()
+
+    # Stream the archived task dicts, oldest run first
+    def dicts(self):
+        if not self.size:
+            return
+        with open(self.path, "rb") as f:
+            left = self.size
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            pending = b""
+            while left:
+                chunk = f.read(min(READ_CHUNK, left))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                while chunk:
+                    pending += decompressor.decompress(chunk)
+                    # Every run is its own gzip member
+                    chunk = decompressor.unused_data if decompressor.eof else b""
+                    if decompressor.eof:
+                        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        yield json.loads(line)
+
+    # Archived tasks whose names contain text (case-insensitive), in archive order
+    def search(self, text, limit=None):
+        query = text.lower()
+        matches = []
+        for name in self.names:
+            if query in name.lower():
+                matches.append(name)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    # Full records of the given archived names (decompresses the archive once)
+    @timed("archive.Archive.tasks")
+    def tasks(self, names):
+        wanted = set(names) & self.names.keys()
+        found = {}
+        for d in self.dicts():
+            if d["name"] in wanted:
+                found[d["name"]] = Task.from_dict(d)
+                if len(found) == len(wanted):
+                    break
+        return [found[name] for name in names if name in found]
+
+    def get(self, name):
+        tasks = self.tasks([name])
+        return tasks[0] if tasks else None
+
+# Completed tasks finished more than `days` days before `now`
+def archivable(repo, days=DEFAULT_ARCHIVE_DAYS, now=None):
+    cutoff = (time.time() if now is None else now) - days * DAY_SECONDS
+    return [task for task in repo.completed.values() if completion_time(task) < cutoff]
+
+# Move tasks from the repository and its store to the archive, keeping their
+# contribution to the statistics. Returns the archive (created if needed).
+@timed("archive.archive_tasks")
+def archive_tasks(repo, store, data_path, tasks):
+    archive = repo.archive
+    if archive is None:
+        archive = Archive(data_path)
+        repo.attach_archive(archive)
+    if tasks:
+        repo.archive_tasks(tasks, archive.add(tasks))
+        store.apply(repo, [("delete", task.name) for task in tasks])
+        archive.settle()
+    return archive
+
+# Attach the data file's archive to a freshly loaded repository. Tasks left in
+# the store by an interrupted archive run are deleted from it. Returns the archive.
+def load_archive(repo, store, data_path):
+    archive = Archive.open(data_path)
+    if archive is not None:
+        leftovers = repo.attach_archive(archive)
+        if leftovers:
+            store.apply(repo, [("delete", name) for name in leftovers])
+        archive.settle()
+    return archive
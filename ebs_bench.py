@@ -0,0 +1,469 @@
+# Benchmark suite for the core paths. Generates synthetic datasets, times each
+# operation and writes the results as JSON so runs of different versions can be
+# compared:
+#
+#   python ebs_bench.py run --sizes 1000 10000 100000 --output before.json
+#   python ebs_bench.py run --sizes 1000 10000 100000 --output after.json --compare before.json
+#   python ebs_bench.py generate 1000000 --output big_data.json
+#
+# `run` also exits 1 when an operation misses its latency budget (BUDGETS_MS).
+import argparse
+import json
+import os
+import platform
+import random
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from ebs_archive import Archive, archive_tasks
+from ebs_core import analyze_data, analyze_stats, load_data, save_data, update_velocity
+from ebs_model import TaskRepository
+from ebs_snapshot import Snapshot
+from ebs_storage import JournalStore, JsonStore, SnapshotStore, SqliteStore
+from ebs_timeline import Timeline
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+ESTIMATORS = ("", "alice", "bob", "carol", "dave", "erin")
+# Each operation runs at least MIN_RUNS times and at most `repeat` times, stopping
+# early once it has used TIME_BUDGET seconds
+MIN_RUNS = 3
+TIME_BUDGET = 5.0
+# Slowdown (new / old median) reported as a regression by --compare, ignoring
+# differences below REGRESSION_MIN_MS as timer noise
+REGRESSION_THRESHOLD = 1.10
+REGRESSION_MIN_MS = 1.0
+# Idle clients connected to the sync server while its round trips are timed
+SERVER_CLIENTS = 200
+# Load check: this many clients record time at once, all on one task or each on
+# its own, SERVER_LOAD_CALLS times each
+SERVER_LOAD_CLIENTS = (50, 200)
+SERVER_LOAD_CALLS = 10
+# Median latency budgets (ms) checked at every size; `run` exits 1 when one is
+# exceeded or when a server load check had failed calls
+BUDGETS_MS = {"predict_hours": 100, "predict_unfinished": 100,
+              "server.load_one_task_50": 200, "server.load_own_tasks_50": 200,
+              "server.load_one_task_200": 2000, "server.load_own_tasks_200": 2000}
+
+# Synthetic dataset in the ebs_data.json format. About 70% of the tasks are done;
+# estimates are log-normal, velocities scatter log-normally around 1 and the work
+# on each task is split over a geometric number of time segments (mean ~3)
+def generate_data(n_tasks, seed=0, completed_ratio=0.7):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    tasks = []
+    for i in range(n_tasks):
+        estimated = round(min(rng.lognormvariate(1.5, 0.8), 200.0), 1) or 0.5
+        completed = rng.random() < completed_ratio
+        actual = estimated / rng.lognormvariate(0.0, 0.35)
+        if not completed:
+            actual *= rng.random()
+        n_segments = 1
+        while n_segments < 20 and rng.random() < 0.65:
+            n_segments += 1
+        if not completed and rng.random() < 0.3:
+            n_segments = 0
+        start = base + timedelta(minutes=i * 30 + rng.randrange(30))
+        segments = []
+        t = start
+        for _ in range(n_segments):
+            t += timedelta(hours=rng.uniform(1, 48))
+            segments.append({"hours": round(actual / n_segments, 2) or 0.01, "timestamp": t.isoformat()})
+        task = {
+            "name": f"task {i:07d}",
+            "estimated_hours": estimated,
+            "actual_hours": round(sum(s["hours"] for s in segments), 2) if segments else None,
+            "time_segments": segments,
+            "start_time": start.isoformat(),
+            "completed": completed
+        }
+        estimator = ESTIMATORS[rng.randrange(len(ESTIMATORS))]
+        if estimator:
+            task["estimator"] = estimator
+        if segments:
+            task["end_time"] = segments[-1]["timestamp"]
+        tasks.append(task)
+    data = {"tasks": tasks, "velocity": 1.0}
+    update_velocity(data)
+    return data
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = (len(sorted_values) - 1) * p / 100
+    low = int(index)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (index - low)
+
+# Time fn() repeatedly and measure its peak traced allocation in one extra run.
+# `items` is the number of tasks each call processes, for the throughput figure.
+def measure(fn, items, repeat, memory=True):
+    fn()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat and (len(timings) < MIN_RUNS or time.perf_counter() - started < TIME_BUDGET):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = percentile(timings, 50)
+    result = {
+        "runs": len(timings),
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "min_ms": timings[0] * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "max_ms": timings[-1] * 1000,
+        "throughput_per_s": items / p50 if p50 > 0 else None
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+# Core operations at one dataset size; returns {operation: measurement}
+def bench_core(data, workdir, repeat, memory=True):
+    n = len(data["tasks"])
+    path = os.path.join(workdir, "ebs_data.json")
+    save_data(data, path)
+    results = {"file_bytes": os.path.getsize(path)}
+    repo = TaskRepository.from_data(data)
+    unfinished = len(repo.unfinished)
+    from ebs_simulation import simulate_hours, simulate_unfinished
+
+    results["load_data"] = measure(lambda: load_data(path), n, repeat, memory)
+    results["save_data"] = measure(lambda: save_data(data, path), n, repeat, memory)
+    results["build_repository"] = measure(lambda: TaskRepository.from_data(data), n, repeat, memory)
+    snapshot_store = SnapshotStore(path)
+    snapshot_store.import_json()
+    def load_snapshot():
+        store = SnapshotStore(path)
+        store.close(store.load_repository())
+    results["snapshot_load_repository"] = measure(load_snapshot, n, repeat, memory)
+    with Snapshot(snapshot_store.snapshot_path) as snapshot:
+        results["snapshot_velocity_stats"] = measure(snapshot.velocity_stats, n, repeat, memory)
+    results["update_velocity"] = measure(lambda: update_velocity(data), n, repeat, memory)
+    results["update_velocity_stats"] = measure(lambda: update_velocity(data, repo.stats), n, repeat, memory)
+    results["analyze_data"] = measure(lambda: analyze_data(data), n, repeat, memory)
+    results["analyze_stats"] = measure(lambda: analyze_stats(repo.stats), n, repeat, memory)
+    results["timeline_build"] = measure(lambda: Timeline.from_tasks(repo).window(), n, repeat, memory)
+    timeline = repo.timeline
+    latest = max((t for t, _ in timeline.entries.values()), default=0)
+    results["timeline_window"] = measure(lambda: timeline.recent(now=latest), 1, repeat, memory)
+    results["predict_hours"] = measure(lambda: simulate_hours(repo, 100, seed=1), 1, repeat, memory)
+    results["predict_unfinished"] = measure(lambda: simulate_unfinished(repo, seed=1), unfinished, repeat, memory)
+
+    # One task change persisted through each incremental store
+    task = next(iter(repo.unfinished.values()), None) or next(iter(repo))
+    journal = JournalStore(path, compact_every=10 ** 9)
+    results["journal_put"] = measure(lambda: journal.put_task(repo, task), 1, repeat, memory)
+    os.remove(journal.journal_path)
+    sqlite = SqliteStore(path, os.path.join(workdir, "ebs_data.db"))
+    results["sqlite_put"] = measure(lambda: sqlite.put_task(repo, task), 1, repeat, memory)
+    results["sqlite_load_repository"] = measure(sqlite.load_repository, n, repeat, memory)
+    sqlite.close(repo)
+
+    # One headless report (see ebs_report), figure template already built
+    from ebs_report import generate_reports
+    reports = os.path.join(workdir, "reports")
+    results["report"] = measure(lambda: generate_reports([("bench", path)], reports, storage="json", workers=1),
+                                n, repeat, memory)
+    return results
+
+# The same dataset with every completed task archived (see ebs_archive): startup
+# and saving with only the open tasks in the data file, to compare with
+# load_data + build_repository and save_data, and one archived task looked up
+def bench_archive(data, workdir, repeat, memory=True):
+    n = len(data["tasks"])
+    path = os.path.join(workdir, "archived.json")
+    save_data(data, path)
+    repo = TaskRepository.from_data(data)
+    completed = list(repo.completed.values())
+    archive_tasks(repo, JsonStore(path), path, completed)
+    hot = repo.to_data()
+    middle = completed[len(completed) // 2].name if completed else ""
+
+    def load():
+        archived = TaskRepository.from_data(load_data(path))
+        archived.attach_archive(Archive.open(path))
+        return archived
+
+    return {
+        "load_repository": measure(load, n, repeat, memory),
+        "save_data": measure(lambda: save_data(hot, path), len(hot["tasks"]), repeat, memory),
+        "lookup": measure(lambda: repo.archive.get(middle), 1, repeat, memory)
+    }
+
+# List refreshes of the real GUI, driven without a mainloop. Needs a display;
+# returns {"skipped": reason} when Tk cannot start.
+def bench_gui(workdir, n, repeat, memory=True):
+    try:
+        import customtkinter as ctk
+        root = ctk.CTk()
+    except Exception as e:
+        return {"skipped": str(e)}
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import ebs_gui
+        app = ebs_gui.EBSSystem(root)
+        root.update()
+
+        def refresh(fn):
+            def run():
+                fn()
+                root.update_idletasks()
+            return run
+
+        def search():
+            app.task_search_var.set("task 00")
+            app.filter_tasks()
+            root.update_idletasks()
+
+        results = {
+            "update_record_tasks": measure(refresh(app.update_record_tasks), n, repeat, memory),
+            "update_finish_tasks": measure(refresh(app.update_finish_tasks), n, repeat, memory),
+            "update_task_listbox": measure(refresh(app.update_task_listbox), n, repeat, memory),
+            "filter_tasks": measure(search, n, repeat, memory)
+        }
+        app.store.close()
+        root.destroy()
+        return results
+    finally:
+        os.chdir(cwd)
+
+# Sync server round trips with SERVER_CLIENTS other clients connected, which
+# receive every change; the server runs on its own event loop thread and the
+# idle clients are drained by one more thread, so they cost little here
+def bench_server(data, workdir, repeat, memory=True, clients=SERVER_CLIENTS):
+    import asyncio
+    from ebs_remote import RemoteSession
+    from ebs_server import SyncServer
+    n = len(data["tasks"])
+    path = os.path.join(workdir, "server_data.json")
+    save_data(data, path)
+    loop = asyncio.new_event_loop()
+    server = SyncServer(JournalStore(path))
+    address = loop.run_until_complete(server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    selector = selectors.DefaultSelector()
+    idle = []
+    for _ in range(clients):
+        sock = socket.create_connection(address)
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        idle.append(sock)
+    stopping = threading.Event()
+
+    def drain():
+        while not stopping.is_set():
+            for key, _ in selector.select(0.1):
+                try:
+                    key.fileobj.recv(1 << 20)
+                except OSError:
+                    pass
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    session = RemoteSession(address)
+    try:
+        repo = session.load_repository()
+        name = next(iter(repo.unfinished), None) or next(iter(repo))
+        return {
+            "connected_clients": clients,
+            "server_load": measure(session.load_repository, n, repeat, memory),
+            "server_record_time": measure(lambda: session.record_time(repo, session, name, 0.1), 1, repeat, memory)
+        }
+    finally:
+        session.close()
+        stopping.set()
+        drainer.join()
+        for sock in idle:
+            sock.close()
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+# Many clients calling record_time at the same moment, each on its own
+# connection and thread: all on one task (`shared`) or each on its own. Returns
+# the call latencies, failed calls (e.g. timed out) included, and how many failed.
+def load_check(address, names, clients, calls=SERVER_LOAD_CALLS, shared=False):
+    from ebs_remote import RemoteSession
+    sessions = [RemoteSession(address) for _ in range(clients)]
+    repos = [session.load_repository() for session in sessions]
+    start = threading.Barrier(clients)
+    timings = []
+    errors = []
+
+    def client(i):
+        session, repo = sessions[i], repos[i]
+        name = names[0] if shared else names[i % len(names)]
+        start.wait()
+        for _ in range(calls):
+            began = time.perf_counter()
+            try:
+                session.record_time(repo, session, name, 0.1)
+            except (OSError, KeyError, ValueError) as e:
+                errors.append(e)
+            timings.append(time.perf_counter() - began)
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for session in sessions:
+            session.close()
+    timings.sort()
+    return {"clients": clients, "runs": len(timings), "errors": len(errors),
+            "p50_ms": percentile(timings, 50) * 1000, "p95_ms": percentile(timings, 95) * 1000,
+            "p99_ms": percentile(timings, 99) * 1000, "max_ms": timings[-1] * 1000}
+
+# Load checks against a server of their own, with one unfinished task per client
+def bench_server_load(workdir, clients=SERVER_LOAD_CLIENTS):
+    import asyncio
+    from ebs_server import SyncServer
+    path = os.path.join(workdir, "load_data.json")
+    data = generate_data(max(clients), seed=1, completed_ratio=0)
+    save_data(data, path)
+    loop = asyncio.new_event_loop()
+    server = SyncServer(JournalStore(path))
+    address = loop.run_until_complete(server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    names = [task["name"] for task in data["tasks"]]
+    try:
+        results = {}
+        for n in clients:
+            results[f"load_one_task_{n}"] = load_check(address, names, n, shared=True)
+            results[f"load_own_tasks_{n}"] = load_check(address, names, n)
+        return results
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(sizes, repeat, memory=True, gui=True, seed=0):
+    report = {
+        "created": datetime.now().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {}
+    }
+    for n in sizes:
+        data = generate_data(n, seed)
+        with tempfile.TemporaryDirectory() as workdir:
+            print(f"{n} tasks ...", file=sys.stderr)
+            results = bench_core(data, workdir, repeat, memory)
+            results["archive"] = bench_archive(data, workdir, repeat, memory)
+            results["server"] = bench_server(data, workdir, repeat, memory)
+            # The load checks use a dataset of their own, so they run once
+            if n == sizes[0]:
+                results["server"].update(bench_server_load(workdir))
+            if gui:
+                results["gui"] = bench_gui(workdir, n, repeat, memory)
+        report["sizes"][str(n)] = results
+    return report
+
+def _operations(results, prefix=""):
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            yield prefix + name, value
+        elif isinstance(value, dict):
+            yield from _operations(value, prefix + name + ".")
+
+# Median latency of every operation present in both reports; returns the regressions
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for size, results in new["sizes"].items():
+        old_ops = dict(_operations(old["sizes"].get(size, {})))
+        for name, value in _operations(results):
+            if name not in old_ops:
+                continue
+            ratio = value["p50_ms"] / old_ops[name]["p50_ms"] if old_ops[name]["p50_ms"] else float("inf")
+            slower = value["p50_ms"] - old_ops[name]["p50_ms"] > REGRESSION_MIN_MS
+            flag = "  REGRESSION" if ratio > threshold and slower else ""
+            print(f"{size:>8} {name:<32} {old_ops[name]['p50_ms']:10.2f} -> {value['p50_ms']:10.2f} ms  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+# Operations slower than their BUDGETS_MS entry, or with failed calls; returns
+# [(size, name, p50 ms)]
+def check_budgets(report, budgets=BUDGETS_MS):
+    over = []
+    for size, results in report["sizes"].items():
+        for name, value in _operations(results):
+            if value.get("errors"):
+                print(f"{size:>8} {name:<32} {value['errors']} of {value['runs']} calls failed")
+                over.append((size, name, value["p50_ms"]))
+                continue
+            if name in budgets and value["p50_ms"] > budgets[name]:
+                print(f"{size:>8} {name:<32} p50 {value['p50_ms']:10.2f} ms  over the {budgets[name]} ms budget")
+                over.append((size, name, value["p50_ms"]))
+    return over
+
+def print_report(report):
+    for size, results in report["sizes"].items():
+        print(f"== {size} tasks ({results['file_bytes'] / 1e6:.1f} MB)")
+        for name, value in _operations(results):
+            memory = f"  peak {value['peak_bytes'] / 1e6:8.1f} MB" if "peak_bytes" in value else ""
+            print(f"  {name:<32} p50 {value['p50_ms']:10.2f} ms  p95 {value['p95_ms']:10.2f} ms{memory}")
+        if "skipped" in results.get("gui", {}):
+            print(f"  gui skipped: {results['gui']['skipped']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ebs_bench", description="EBS benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("run", help="run the benchmarks")
+    p.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    p.add_argument("--repeat", type=int, default=10, help="maximum timed runs per operation")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", help="write the results as JSON")
+    p.add_argument("--compare", help="earlier results to compare against; exits 1 on regressions")
+    p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory runs")
+    p.add_argument("--no-gui", action="store_true", help="skip the GUI list-refresh benchmarks")
+    p = commands.add_parser("generate", help="write a synthetic dataset")
+    p.add_argument("tasks", type=int)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", default="ebs_data.json")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        save_data(generate_data(args.tasks, args.seed), args.output)
+        return 0
+    report = run(args.sizes, args.repeat, not args.no_memory, not args.no_gui, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    status = 1 if check_budgets(report) else 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare(json.load(f), report):
+                status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
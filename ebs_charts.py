@@ -0,0 +1,154 @@
+import customtkinter as ctk
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from ebs_instrument import timed_methods
+from ebs_report import ERROR_BINS, FIGURE_SIZE, TREND_POINTS, chart_layout, error_histogram, lttb
+from ebs_timeline import RECENT_DAYS
+
+# How often an open analysis window checks the statistics for changes
+ANALYSIS_REFRESH_MS = 1000
+# Chart titles and axis labels (see ebs_report.chart_layout)
+CHART_LABELS = ("估計誤差分佈 (%)", "誤差百分比", "任務數", "速度趨勢", "完成任務順序", "速度")
+
+# Axis limits with headroom. The current limits are kept while the data fits and
+# fills at least half of them, so most updates can be blitted without a full redraw.
+def fit_limits(current, low, high, anchored=False):
+    if current[0] <= low and high <= current[1] and (high - low) * 2 >= current[1] - current[0]:
+        return current
+    pad = (high - low) * 0.25 or 1.0
+    return (low if anchored else low - pad, high + pad)
+
+# Persistent analysis window. The figure, axes and artists are created once; a
+# refresh only recomputes the series when the velocity statistics changed, swaps
+# the data into the existing artists and blits them over the cached background.
+# Closing the window hides it so the next show() reuses everything.
+@timed_methods("charts.AnalysisView")
+class AnalysisView:
+    def __init__(self, master, repo):
+        self.repo = repo
+        self.version = None
+        self.background = None
+        self.refresh_job = None
+        self.entries = []
+        self.rows = np.empty((0, 3))
+        self.error_counts = np.zeros(ERROR_BINS, dtype=int)
+        self.window = ctk.CTkToplevel(master)
+        self.window.title("數據分析")
+        self.window.geometry("800x500")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.text = ctk.CTkTextbox(self.window, height=100, width=500)
+        self.text.pack(pady=10)
+
+        self.figure = Figure(figsize=FIGURE_SIZE)
+        (self.error_ax, self.trend_ax, self.error_bars, self.trend_line,
+         self.mean_line) = chart_layout(self.figure, CHART_LABELS, animated=True)
+        self.artists = list(self.error_bars) + [self.trend_line, self.mean_line]
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(side="top", fill="both", expand=1)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def show(self):
+        self.window.deiconify()
+        self.window.lift()
+        self.refresh()
+        self._schedule()
+
+    def hide(self):
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.window.withdraw()
+
+    def _schedule(self):
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+        self.refresh_job = self.window.after(ANALYSIS_REFRESH_MS, self._poll)
+
+    def _poll(self):
+        self.refresh_job = None
+        self.refresh()
+        self._schedule()
+
+    # A full draw renders everything except the animated artists; keep that as the
+    # background to blit onto, then draw the artists on top
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+
+    # Completed-task rows (estimated, actual, velocity) and the error histogram.
+    # Completions are appended to stats.entries(), so when the previous entries are
+    # unchanged only the new ones are converted and counted.
+    def _update_series(self, stats):
+        entries = stats.entries()
+        if entries[:len(self.entries)] == self.entries:
+            new = entries[len(self.entries):]
+        else:
+            new = entries
+            self.rows = np.empty((0, 3))
+            self.error_counts = np.zeros(ERROR_BINS, dtype=int)
+        self.entries = entries
+        rows = np.array([entry for entry in new if entry[2] is not None], dtype=float).reshape(-1, 3)
+        estimated, actual, velocities = rows.T
+        errors = np.divide((estimated - actual) * 100, estimated, out=np.zeros_like(estimated), where=estimated > 0)
+        self.error_counts += error_histogram(errors)
+        self.rows = np.concatenate((self.rows, rows))
+
+    def refresh(self):
+        stats = self.repo.stats
+        if stats.version == self.version:
+            return
+        self.version = stats.version
+        self._update_text(stats)
+        self._update_series(stats)
+
+        for bar, count in zip(self.error_bars, self.error_counts):
+            bar.set_height(count)
+        limits_changed = self._set_limits(self.error_ax.set_ylim, self.error_ax.get_ylim(), 0, self.error_counts.max(), True)
+
+        velocities = self.rows[:, 2]
+        x, y = lttb(np.arange(len(velocities), dtype=float), velocities, TREND_POINTS)
+        self.trend_line.set_data(x, y)
+        mean = stats.mean if stats.count else 1.0
+        self.mean_line.set_ydata([mean, mean])
+        limits_changed |= self._set_limits(self.trend_ax.set_xlim, self.trend_ax.get_xlim(), 0, max(len(velocities) - 1, 1), True)
+        limits_changed |= self._set_limits(self.trend_ax.set_ylim, self.trend_ax.get_ylim(), y.min(initial=mean), y.max(initial=mean))
+
+        if limits_changed or self.background is None:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_artists()
+            self.canvas.blit(self.figure.bbox)
+
+    def _set_limits(self, setter, current, low, high, anchored=False):
+        limits = fit_limits(current, low, high, anchored)
+        if limits == current:
+            return False
+        setter(*limits)
+        return True
+
+    def _update_text(self, stats):
+        avg_velocity = stats.mean if stats.count else 1.0
+        completion_rate = stats.count / stats.total_tasks * 100 if stats.total_tasks else 0.0
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", f"平均速度: {avg_velocity:.2f}\n")
+        self.text.insert("end", f"任務完成率: {completion_rate:.2f}%\n")
+        archived = len(self.repo.archive) if self.repo.archive is not None else 0
+        self.text.insert("end", f"任務數: {len(self.repo) + archived} (已完成: {len(self.repo.completed)} "
+                                f"未完成: {len(self.repo.unfinished)} 已封存: {archived})\n")
+        timeline = self.repo.timeline
+        decayed = timeline.decayed_velocity()
+        if decayed is not None:
+            recent = timeline.recent()
+            velocity = "-" if recent["velocity"] is None else f"{recent['velocity']:.2f}"
+            self.text.insert("end", f"最近{RECENT_DAYS}天速度: {velocity} ({recent['completed']} 個任務)  "
+                                    f"衰減速度: {decayed:.2f}\n")
+        if stats.count:
+            self.text.insert("end", f"速度標準差: {stats.variance ** 0.5:.2f}  P10/P50/P90: "
+                                    f"{stats.quantile(0.1):.2f} / {stats.quantile(0.5):.2f} / {stats.quantile(0.9):.2f}\n")
@@ -0,0 +1,508 @@
+# Command line interface to the scheduling core, for scripts and cron jobs.
+# Only the headless core is imported at startup; numpy is loaded by `predict`.
+# Without a command the GUI is started, so the global options apply to it too.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import ebs_core as core
+import ebs_instrument as instrument
+import ebs_transfer as transfer
+from ebs_archive import DEFAULT_ARCHIVE_DAYS, archivable, archive_tasks, load_archive
+from ebs_model import Task
+from ebs_partitions import DEFAULT_PROJECT, Workspace, merge_stats, parse_partition, partition_label
+from ebs_storage import STORES
+from ebs_remote import DEFAULT_PORT, RemoteSession, parse_address
+
+# Median start-up time of `stats` on an empty dataset must stay below this
+COLD_START_TARGET_MS = 150
+
+# Task operations run locally through the store, or on the sync server when the
+# store is a RemoteSession (see ebs_remote)
+def ops(store):
+    return store if getattr(store, "remote", False) else core
+
+def cmd_add(repo, store, args):
+    # Inside a partition new tasks default to the partition's estimator
+    estimator = args.estimator or (args.partition[1] if args.partition else "")
+    ops(store).add_task(repo, store, args.name, args.hours, estimator)
+    print(f"Added '{args.name}' ({args.hours:g} h)")
+
+def cmd_log(repo, store, args):
+    task = ops(store).record_time(repo, store, args.name, args.hours)
+    print(f"Logged {args.hours:g} h on '{args.name}' (total {task.actual_hours:g} h)")
+
+def cmd_finish(repo, store, args):
+    ops(store).finish_task(repo, store, args.name)
+    print(f"Finished '{args.name}' (velocity now {repo.velocity:.2f})")
+
+def cmd_list(repo, store, args):
+    tasks = repo if args.all else repo.unfinished.values()
+    for task in tasks:
+        status = "done" if task.completed else "open"
+        print(f"{status}\t{task.estimated_hours:g}\t{task.actual_hours or 0:g}\t{task.name}")
+
+# Archived tasks whose names contain QUERY, read from the compressed archive
+def cmd_archived(repo, store, args):
+    names = repo.archive.search(args.query, args.limit) if repo.archive is not None else []
+    tasks = repo.archive.tasks(names) if names else []
+    if args.json:
+        print(json.dumps([task.to_dict() for task in tasks], ensure_ascii=False))
+        return
+    for task in tasks:
+        print(f"archived\t{task.estimated_hours:g}\t{task.actual_hours or 0:g}\t{task.name}")
+
+# Move completed tasks finished more than --days days ago to the archive (see ebs_archive)
+def cmd_archive(repo, store, args):
+    if getattr(store, "remote", False):
+        raise ValueError("Archive on the server's machine, without --server")
+    tasks = archivable(repo, args.days)
+    if args.dry_run:
+        print(f"{len(tasks)} completed tasks finished more than {args.days:g} days ago")
+        return
+    archive = archive_tasks(repo, store, data_file(args), tasks)
+    print(f"Archived {len(tasks)} tasks to {archive.path} ({len(archive)} archived in total)")
+
+def cmd_import(repo, store, args):
+    tasks, skipped = transfer.import_file(repo, store, args.input, args.format, args.skip_duplicates, args.batch_size)
+    print(f"Imported {len(tasks)} tasks from {args.input}" + (f" ({skipped} duplicates skipped)" if skipped else ""))
+
+# .csv and .jsonl are streamed (see ebs_transfer); anything else is a JSON data file
+def cmd_export(repo, store, args):
+    if args.format or os.path.splitext(args.output)[1].lower() in transfer.EXTENSIONS:
+        count = transfer.export_file(repo, args.output, args.format)
+    else:
+        core.save_data(repo.to_data(), args.output)
+        count = len(repo)
+    print(f"Exported {count} tasks to {args.output}")
+
+def cmd_predict(repo, store, args):
+    from ebs_simulation import PERCENTILES, simulate_hours, simulate_unfinished
+    if args.hours is not None:
+        result = simulate_hours(repo, args.hours, n_simulations=args.simulations, seed=args.seed,
+                                window_days=args.window, half_life_days=args.half_life)
+    else:
+        result = simulate_unfinished(repo, n_simulations=args.simulations, seed=args.seed,
+                                     window_days=args.window, half_life_days=args.half_life)
+    if args.json:
+        print(json.dumps({"simulations": result["simulations"], "mean": result["mean"],
+                          "percentiles": {f"P{p}": result["percentiles"][p] for p in PERCENTILES},
+                          "window_fallback": result["window_fallback"]}))
+        return
+    for p in PERCENTILES:
+        print(f"P{p}\t{result['percentiles'][p]:.2f} h")
+    print(f"mean\t{result['mean']:.2f} h")
+    _window_note(result["window_fallback"])
+
+# Estimators whose window had too few completions (see collect_velocities)
+def _window_note(fallback):
+    from ebs_simulation import MIN_WINDOW_SAMPLES
+    if fallback:
+        names = ", ".join(estimator or "-" for estimator in fallback)
+        print(f"note: fewer than {MIN_WINDOW_SAMPLES} completions in the window for {names}; "
+              "their whole history was used", file=sys.stderr)
+
+def cmd_stats(repo, store, args):
+    avg_velocity, completion_rate, estimated, actual, errors = core.analyze_stats(repo.stats)
+    recent = repo.timeline.recent()
+    archived = len(repo.archive) if repo.archive is not None else 0
+    stats = {
+        "tasks": len(repo) + archived,
+        "completed": len(repo.completed) + archived,
+        "unfinished": len(repo.unfinished),
+        "archived": archived,
+        "velocity": avg_velocity,
+        "velocity_stdev": repo.stats.variance ** 0.5,
+        "velocity_p50": repo.stats.quantile(0.5),
+        "velocity_recent": recent["velocity"],
+        "completed_recent": recent["completed"],
+        "velocity_decayed": repo.timeline.decayed_velocity(),
+        "completion_rate": completion_rate,
+        "mean_error_pct": sum(errors) / len(errors) if errors else 0.0
+    }
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        for key, value in stats.items():
+            print(f"{key}\t{value:.2f}" if isinstance(value, float) else f"{key}\t{value}")
+
+# Completions, velocity and logged hours per ISO week or calendar month
+def cmd_history(repo, store, args):
+    if args.by == "week":
+        rows = [(f"{year}-W{week:02d}", summary) for (year, week), summary in repo.timeline.weekly()]
+    else:
+        rows = [(f"{year}-{month:02d}", summary) for (year, month), summary in repo.timeline.monthly()]
+    if args.json:
+        print(json.dumps([dict(summary, period=period) for period, summary in rows]))
+        return
+    for period, summary in rows:
+        velocity = "-" if summary["velocity"] is None else f"{summary['velocity']:.2f}"
+        print(f"{period}\t{summary['completed']}\t{velocity}\t{summary['hours']:.1f} h")
+
+# Data file of the partition worked on, else --data; the plan and the archive live next to it
+def data_file(args):
+    return Workspace(args.data, args.storage).data_path(args.partition) if args.partition else args.data
+
+def plan_file(args):
+    from ebs_schedule import plan_path
+    return plan_path(data_file(args))
+
+def _priority(text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"Invalid priority {text!r}")
+    return int(value) if value.is_integer() else value
+
+# Edit the milestone plan (see ebs_schedule); an empty string clears a field
+def cmd_plan(repo, store, args):
+    from ebs_schedule import load_plan, parse_date, parse_weekdays, save_plan
+    path = plan_file(args)
+    plan = load_plan(path)
+    if args.plan_command == "show":
+        print(json.dumps(plan, indent=2, ensure_ascii=False))
+        return
+    if args.plan_command == "task":
+        core.get_task(repo, args.name)
+        entry = plan["tasks"].setdefault(args.name, {})
+        for field in ("milestone", "priority", "assignee"):
+            value = getattr(args, field)
+            if value == "":
+                entry.pop(field, None)
+            elif value is not None:
+                entry[field] = _priority(value) if field == "priority" else value
+        if not entry:
+            del plan["tasks"][args.name]
+    elif args.plan_command == "developer":
+        if args.remove:
+            if plan["developers"].pop(args.name, None) is None:
+                raise KeyError(f"No developer named '{args.name}'")
+        else:
+            entry = plan["developers"].setdefault(args.name, {})
+            if args.hours_per_day is not None:
+                if args.hours_per_day <= 0:
+                    raise ValueError("Hours per day must be greater than 0")
+                entry["hours_per_day"] = args.hours_per_day
+            if args.weekdays is not None:
+                entry["weekdays"] = parse_weekdays(args.weekdays)
+            for day in args.off or ():
+                entry.setdefault("days_off", []).append(parse_date(day, "day off").isoformat())
+    else:
+        milestones = plan["milestones"]
+        existing = next((m for m in milestones if m["name"] == args.name), None)
+        if args.remove:
+            if existing is None:
+                raise KeyError(f"No milestone named '{args.name}'")
+            milestones.remove(existing)
+        else:
+            if existing is None:
+                existing = {"name": args.name}
+                milestones.append(existing)
+            if args.due == "":
+                existing.pop("due", None)
+            elif args.due is not None:
+                existing["due"] = parse_date(args.due, "due date").isoformat()
+    save_plan(plan, path)
+    print(f"Saved {path}")
+
+def _schedule_json(summary):
+    def dates(percentiles):
+        return {f"P{p}": d.isoformat() for p, d in percentiles.items()}
+    return {
+        "scenario": summary["scenario"], "start": summary["start"].isoformat(), "simulations": summary["simulations"],
+        "unassigned": summary["unassigned"], "window_fallback": summary["window_fallback"],
+        "milestones": [dict(m, percentiles=dates(m["percentiles"]), due=m["due"] and m["due"].isoformat())
+                       for m in summary["milestones"]],
+        "developers": [dict(d, percentiles=dates(d["percentiles"])) for d in summary["developers"]]
+    }
+
+# Ship dates per milestone and developer for the plan and its what-if scenarios
+def cmd_schedule(repo, store, args):
+    from ebs_schedule import BASELINE, load_plan, schedule
+    plan = load_plan(plan_file(args))
+    scenarios = [BASELINE] + (list(plan["scenarios"]) if args.all_scenarios else args.scenario or [])
+    results = schedule(repo, plan, list(dict.fromkeys(scenarios)), args.simulations, args.seed,
+                       args.window, args.half_life, args.workers)
+    if args.json:
+        print(json.dumps([_schedule_json(summary) for summary in results.values()]))
+        return
+    for summary in results.values():
+        print(f"== {summary['scenario']} (from {summary['start']}, {summary['simulations']} simulations)")
+        rows = [("milestone", m) for m in summary["milestones"]] + [("developer", d) for d in summary["developers"]]
+        for kind, row in rows:
+            dates = "\t".join(f"P{p} {d}" for p, d in row["percentiles"].items())
+            due = f"\tdue {row['due']} ({row['on_time']:.0%} on time)" if row.get("due") else ""
+            print(f"{kind}\t{row['name'] or '-'}\t{row['tasks']} tasks\t{dates}{due}")
+        if summary["unassigned"]:
+            print(f"unassigned\t{summary['unassigned']} tasks, taken by whoever is free first")
+    _window_note(next(iter(results.values()))["window_fallback"])
+
+# Per-partition counts and velocities from the summary cache, and the team-wide
+# velocity distribution merged from them
+def cmd_partitions(repo, store, args):
+    summaries = Workspace(args.data, args.storage).summaries()
+    team = merge_stats(summaries.values())
+    if args.json:
+        print(json.dumps({
+            "partitions": [{"partition": partition_label(key), "tasks": summary["tasks"],
+                            "completed": summary["completed"], "unfinished": summary["unfinished"],
+                            "velocity": summary["velocity"]} for key, summary in summaries.items()],
+            "team": {"tasks": team.total_tasks, "velocities": team.count, "velocity": team.mean if team.count else None,
+                     "velocity_stdev": team.variance ** 0.5, "velocity_p10": team.quantile(0.1),
+                     "velocity_p50": team.quantile(0.5), "velocity_p90": team.quantile(0.9)}
+        }))
+        return
+    for key, summary in summaries.items():
+        print(f"{partition_label(key)}\t{summary['tasks']}\t{summary['completed']}\t{summary['velocity']:.2f}")
+    if team.count:
+        print(f"team\t{team.total_tasks}\t{team.count}\t{team.mean:.2f}\tstdev {team.variance ** 0.5:.2f}"
+              f"\tP10/P50/P90 {team.quantile(0.1):.2f}/{team.quantile(0.5):.2f}/{team.quantile(0.9):.2f}")
+
+# Copy the tasks of the (unpartitioned) data file into partitions by estimator,
+# archived ones included; the data file itself is left as it is
+def cmd_split(repo, store, args):
+    tasks = list(repo)
+    if repo.archive is not None:
+        tasks += [Task.from_dict(d) for d in repo.archive.dicts()]
+    counts = Workspace(args.data, args.storage).split(tasks, args.project)
+    for key, count in counts.items():
+        print(f"{partition_label(key)}\t{count}")
+
+# A dataset may exist only as the journal, snapshot or database of its storage mode
+def _dataset_exists(path):
+    base = os.path.splitext(path)[0]
+    return os.path.exists(path) or any(os.path.exists(base + ext) for ext in (".journal", ".snap", ".db"))
+
+# Nightly reports: an HTML page with charts per dataset (see ebs_report). The
+# datasets are the data file (or --partition), every partition, or the files given.
+def cmd_report(repo, store, args):
+    from ebs_report import generate_reports
+    if args.dataset:
+        missing = [path for path in args.dataset if not _dataset_exists(path)]
+        if missing:
+            raise ValueError(f"No data file {missing[0]}")
+        datasets = [(os.path.splitext(os.path.basename(path))[0], path) for path in args.dataset]
+    elif args.all_partitions:
+        workspace = Workspace(args.data, args.storage)
+        datasets = [(partition_label(key), workspace.data_path(key)) for key in workspace.partitions()]
+        if not datasets:
+            raise ValueError(f"{args.data} has no partitions")
+    else:
+        label = partition_label(args.partition) if args.partition else os.path.splitext(os.path.basename(args.data))[0]
+        datasets = [(label, data_file(args))]
+    reports = generate_reports(datasets, args.output, args.format, args.storage, args.workers)
+    failed = 0
+    for report in reports:
+        if "error" in report:
+            failed += 1
+            print(f"{report['label']}\terror: {report['error']}", file=sys.stderr)
+        else:
+            print(f"{report['label']}\t{os.path.join(args.output, report['page'])}")
+    print(f"Wrote {len(reports) - failed} reports to {os.path.join(args.output, 'index.html')}")
+    if failed:
+        raise SystemExit(1)
+
+# Share the data file (or partition) with the team: the server owns it and the
+# clients connect with --server
+def cmd_serve(repo, store, args):
+    from ebs_server import serve
+    serve(store, repo, args.host, args.port,
+          ready=lambda address: print(f"Serving {args.data} on {address[0]}:{address[1]}", flush=True))
+
+# Run `stats` in fresh interpreters against an empty dataset and report the median
+def cmd_cold_start(repo, store, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        command = [sys.executable, os.path.abspath(__file__), "--data", os.path.join(tmp, "ebs_data.json"), "stats"]
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            timings.append((time.perf_counter() - start) * 1000)
+    median = sorted(timings)[len(timings) // 2]
+    print(f"cold start: median {median:.1f} ms over {args.runs} runs (target {args.target} ms)")
+    if median > args.target:
+        raise SystemExit(1)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ebs", description="Evidence-Based Scheduling")
+    parser.add_argument("--data", default=core.DATA_FILE, help="data file (default: %(default)s)")
+    parser.add_argument("--storage", choices=sorted(STORES), help="storage mode (default: $EBS_STORAGE or json)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="record timings and counters; report on exit to stderr or $EBS_INSTRUMENT_REPORT")
+    parser.add_argument("--profile", metavar="FILE", help="also run cProfile and write pstats to FILE")
+    parser.add_argument("--partition", type=parse_partition, metavar="PROJECT/ESTIMATOR",
+                        help="work on one partition of the data file (see `partitions` and `split`)")
+    parser.add_argument("--server", type=parse_address, metavar="HOST:PORT",
+                        help="work on the schedule shared by a sync server (see `serve`)")
+    commands = parser.add_subparsers(dest="command")
+
+    p = commands.add_parser("add", help="add a task")
+    p.add_argument("name")
+    p.add_argument("hours", type=float, help="estimated hours")
+    p.add_argument("--estimator", default="")
+    p.set_defaults(func=cmd_add)
+
+    p = commands.add_parser("log", help="record hours worked on a task")
+    p.add_argument("name")
+    p.add_argument("hours", type=float)
+    p.set_defaults(func=cmd_log)
+
+    p = commands.add_parser("finish", help="mark a task as completed")
+    p.add_argument("name")
+    p.set_defaults(func=cmd_finish)
+
+    p = commands.add_parser("list", help="list unfinished tasks")
+    p.add_argument("--all", action="store_true", help="include completed tasks")
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser("archive", help="move old completed tasks to the compressed archive")
+    p.add_argument("--days", type=float, default=DEFAULT_ARCHIVE_DAYS,
+                   help="archive tasks finished more than DAYS days ago (default %(default)s)")
+    p.add_argument("--dry-run", action="store_true", help="only count them")
+    p.set_defaults(func=cmd_archive)
+
+    p = commands.add_parser("archived", help="search the archived tasks")
+    p.add_argument("query", nargs="?", default="", help="part of the task name")
+    p.add_argument("--limit", type=int, default=100)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_archived)
+
+    p = commands.add_parser("import", help="bulk import tasks and time segments from CSV or JSON Lines")
+    p.add_argument("input")
+    p.add_argument("--format", choices=transfer.FORMATS, help="default: from the file extension")
+    p.add_argument("--skip-duplicates", action="store_true", help="skip tasks whose name already exists")
+    p.add_argument("--batch-size", type=int, default=transfer.BATCH_SIZE, help="records validated per batch")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("export", help="write all tasks to a JSON data file, or CSV / JSON Lines")
+    p.add_argument("output")
+    p.add_argument("--format", choices=transfer.FORMATS, help="default: from the file extension")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("predict", help="Monte Carlo completion-time prediction")
+    p.add_argument("--hours", type=float, help="predict a block of estimated hours instead of the unfinished tasks")
+    p.add_argument("--simulations", type=int, default=10000)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--window", type=float, metavar="DAYS", help="only use velocities from the last DAYS days")
+    p.add_argument("--half-life", type=float, metavar="DAYS", help="weight velocities by age with this half-life")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_predict)
+
+    p = commands.add_parser("stats", help="print velocity and completion statistics")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_stats)
+
+    p = commands.add_parser("plan", help="edit the milestone plan used by `schedule`")
+    plan_commands = p.add_subparsers(dest="plan_command", required=True)
+    q = plan_commands.add_parser("show", help="print the plan")
+    q = plan_commands.add_parser("task", help="set a task's milestone, priority or assignee")
+    q.add_argument("name")
+    q.add_argument("--milestone")
+    q.add_argument("--priority", help="lower is done first (default 3)")
+    q.add_argument("--assignee", help="default: the task's estimator")
+    q = plan_commands.add_parser("developer", help="add or change a developer's availability")
+    q.add_argument("name")
+    q.add_argument("--hours-per-day", type=float)
+    q.add_argument("--weekdays", metavar="mon,tue,...", help="working days (default mon-fri)")
+    q.add_argument("--off", action="append", metavar="YYYY-MM-DD", help="day off (repeatable)")
+    q.add_argument("--remove", action="store_true")
+    q = plan_commands.add_parser("milestone", help="add a milestone (in order) or set its due date")
+    q.add_argument("name")
+    q.add_argument("--due", metavar="YYYY-MM-DD")
+    q.add_argument("--remove", action="store_true")
+    p.set_defaults(func=cmd_plan)
+
+    p = commands.add_parser("schedule", help="Monte Carlo ship dates per milestone and developer")
+    p.add_argument("--scenario", action="append", help="also run this what-if scenario of the plan (repeatable)")
+    p.add_argument("--all-scenarios", action="store_true")
+    p.add_argument("--simulations", type=int, default=2000)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--window", type=float, metavar="DAYS", help="only use velocities from the last DAYS days")
+    p.add_argument("--half-life", type=float, metavar="DAYS", help="weight velocities by age with this half-life")
+    p.add_argument("--workers", type=int, help="processes for the scenarios (default: one per CPU)")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_schedule)
+
+    p = commands.add_parser("history", help="completions, velocity and hours per week or month")
+    p.add_argument("--by", choices=("week", "month"), default="week")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_history)
+
+    p = commands.add_parser("report", help="write HTML reports with velocity and estimate-error charts")
+    p.add_argument("output", help="directory for the reports")
+    p.add_argument("--format", nargs="+", choices=("png", "svg"), default=["png"], help="chart formats (default png)")
+    p.add_argument("--all-partitions", action="store_true", help="one report per partition of the data file")
+    p.add_argument("--dataset", action="append", metavar="FILE", help="report on this data file instead (repeatable)")
+    p.add_argument("--workers", type=int, help="processes rendering the reports (default: one per CPU)")
+    p.set_defaults(func=cmd_report, needs_data=False)
+
+    p = commands.add_parser("partitions", help="list partitions and the team-wide velocity")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_partitions, needs_data=False)
+
+    p = commands.add_parser("split", help="split the data file into partitions by estimator")
+    p.add_argument("--project", default=DEFAULT_PROJECT)
+    p.set_defaults(func=cmd_split)
+
+    p = commands.add_parser("serve", help="run a sync server that owns the data file for the team")
+    p.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser("cold-start", help="measure CLI start-up time")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--target", type=float, default=COLD_START_TARGET_MS)
+    p.set_defaults(func=cmd_cold_start, needs_data=False)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.instrument or args.profile:
+        instrument.enable(os.environ.get("EBS_INSTRUMENT_REPORT"), args.profile)
+    if not getattr(args, "needs_data", True):
+        try:
+            return args.func(None, None, args)
+        except (KeyError, ValueError) as e:
+            print(f"error: {e.args[0]}", file=sys.stderr)
+            return 1
+    if args.server:
+        if args.partition or args.command == "serve":
+            print("error: --server cannot be combined with --partition or serve", file=sys.stderr)
+            return 1
+        try:
+            store = RemoteSession(args.server)
+        except OSError as e:
+            print(f"error: cannot reach the sync server: {e}", file=sys.stderr)
+            return 1
+        workspace = None
+    else:
+        workspace = Workspace(args.data, args.storage) if args.partition else None
+        store = workspace.open_store(args.partition) if workspace else core.open_store(args.storage, args.data)
+    if args.command is None:
+        import ebs_gui
+        ebs_gui.main(store, workspace, args.partition)
+        return 0
+    repo = core.open_repository(store)
+    if not args.server:
+        load_archive(repo, store, data_file(args))
+    try:
+        args.func(repo, store, args)
+    except (KeyError, ValueError) as e:
+        print(f"error: {e.args[0]}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        if not args.server:
+            raise
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        store.close(repo)
+        if workspace:
+            workspace.save_summary(args.partition, repo)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
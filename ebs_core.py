@@ -0,0 +1,125 @@
+# Scheduling core: data loading, velocity and statistics, and the task
+# operations shared by the GUI and the command line. Nothing here imports
+# customtkinter, matplotlib or numpy.
+from datetime import datetime
+from ebs_storage import DATA_FILE, load_data, save_data, open_store
+from ebs_model import Task, TaskRepository
+from ebs_instrument import timed
+
+# Update velocity based on completed tasks; reads the running
+# aggregates from stats when given instead of rescanning every task
+@timed("core.update_velocity")
+def update_velocity(data, stats=None):
+    if stats is not None:
+        if stats.count:
+            data["velocity"] = stats.mean
+        return
+    completed = [t for t in data["tasks"] if t.get("completed", False) and t["time_segments"]]
+    if completed:
+        total_velocity = sum(t["estimated_hours"] / sum(segment["hours"] for segment in t["time_segments"]) for t in completed)
+        data["velocity"] = total_velocity / len(completed)
+
+# Analyze data for statistics
+@timed("core.analyze_data")
+def analyze_data(data, stats=None):
+    if stats is not None:
+        return analyze_stats(stats)
+    completed = [t for t in data["tasks"] if t.get("completed", False) and t["time_segments"]]
+    avg_velocity = data["velocity"] if completed else 1.0
+    completion_rate = (len(completed) / len(data["tasks"]) * 100) if data["tasks"] else 0.0
+    estimated = [t["estimated_hours"] for t in completed]
+    actual = [sum(segment["hours"] for segment in t["time_segments"]) for t in completed]
+    errors = [(e - a) / e * 100 if e > 0 else 0 for e, a in zip(estimated, actual)]
+    return avg_velocity, completion_rate, estimated, actual, errors
+
+# Same statistics as analyze_data, read from a VelocityStats engine
+@timed("core.analyze_stats")
+def analyze_stats(stats):
+    completed = [(e, a) for e, a, v in stats.entries() if v is not None]
+    avg_velocity = stats.mean if completed else 1.0
+    completion_rate = (len(completed) / stats.total_tasks * 100) if stats.total_tasks else 0.0
+    estimated = [e for e, a in completed]
+    actual = [a for e, a in completed]
+    errors = [(e - a) / e * 100 if e > 0 else 0 for e, a in zip(estimated, actual)]
+    return avg_velocity, completion_rate, estimated, actual, errors
+
+# Load a store's data into a TaskRepository
+@timed("core.open_repository")
+def open_repository(store):
+    if hasattr(store, "load_repository"):
+        return store.load_repository()
+    return TaskRepository.from_data(store.load())
+
+# Task operations. Each one updates the repository, persists the change through
+# the store and raises ValueError (or KeyError for an unknown task) on bad input.
+def get_task(repo, name):
+    task = repo.get(name)
+    if task is None:
+        raise KeyError(f"No task named '{name}'")
+    return task
+
+@timed("core.add_task")
+def add_task(repo, store, name, hours, estimator=""):
+    if not name or hours <= 0:
+        raise ValueError("Task name and estimated hours must be valid")
+    if name in repo or repo.is_archived(name):
+        raise ValueError(f"Task '{name}' already exists")
+    task = Task(name, hours, estimator)
+    repo.add(task)
+    store.put_task(repo, task)
+    return task
+
+@timed("core.record_time")
+def record_time(repo, store, name, hours):
+    task = get_task(repo, name)
+    if hours <= 0:
+        raise ValueError("Hours must be greater than 0")
+    repo.add_segment(task, hours)
+    task.end_time = datetime.now().timestamp()
+    repo.update(task)
+    store.put_task(repo, task)
+    return task
+
+@timed("core.finish_task")
+def finish_task(repo, store, name):
+    task = get_task(repo, name)
+    task.actual_hours = task.actual_hours or 0
+    task.end_time = datetime.now().timestamp()
+    task.completed = True
+    repo.update(task)
+    store.put_task(repo, task)
+    return task
+
+@timed("core.delete_time_segment")
+def delete_time_segment(repo, store, name, index):
+    task = get_task(repo, name)
+    if not 0 <= index < len(task.hours):
+        raise ValueError(f"Task '{name}' has no segment {index + 1}")
+    repo.remove_segment(task, index)
+    if task.hours:
+        task.end_time = datetime.now().timestamp()
+    repo.update(task)
+    store.put_task(repo, task)
+    return task
+
+@timed("core.delete_task")
+def delete_task(repo, store, name):
+    get_task(repo, name)
+    task = repo.remove(name)
+    store.delete_task(repo, name)
+    return task
+
+@timed("core.modify_task")
+def modify_task(repo, store, name, new_name=None, estimated_hours=None):
+    task = get_task(repo, name)
+    if new_name and new_name != name:
+        if new_name in repo or repo.is_archived(new_name):
+            raise ValueError(f"Task '{new_name}' already exists")
+        repo.rename(name, new_name)
+        store.rename_task(repo, name, new_name)
+    if estimated_hours is not None and estimated_hours > 0:
+        task.estimated_hours = estimated_hours
+    task.actual_hours = sum(task.hours) if task.hours else None
+    repo.update(task)
+    store.put_task(repo, task)
+    return task
@@ -0,0 +1,734 @@
+import customtkinter as ctk
+from functools import lru_cache
+from tkinter import filedialog, messagebox
+from datetime import datetime
+import ebs_core as core
+import ebs_transfer as transfer
+from ebs_core import open_store
+from ebs_archive import Archive
+from ebs_writer import BackgroundWriter
+from ebs_model import TaskRepository
+from ebs_partitions import merge_stats, parse_partition, partition_label
+from ebs_search import NameIndex
+from ebs_timeline import DECAY_HALF_LIFE_DAYS, RECENT_DAYS
+from ebs_widgets import VirtualList
+import ebs_instrument as instrument
+
+# Global constants
+WINDOW_WIDTH = 450
+WINDOW_HEIGHT = 650
+TAB_FRAME_WIDTH = 450
+TAB_FRAME_HEIGHT = 650
+SEARCH_DEBOUNCE_MS = 150
+STORE_ERROR_POLL_MS = 500
+# How often changes pushed by a sync server are applied to the lists
+REMOTE_POLL_MS = 100
+# Archived tasks listed at most per search (see ebs_archive)
+ARCHIVE_SEARCH_LIMIT = 50
+# Velocity history used by the predictions: label -> simulate() keyword arguments
+PREDICT_HISTORY = {
+    "全部歷史": {},
+    f"最近{RECENT_DAYS}天": {"window_days": RECENT_DAYS},
+    "指數衰減": {"half_life_days": DECAY_HALF_LIFE_DAYS}
+}
+
+# matplotlib is only imported the first time a chart is drawn
+@lru_cache(maxsize=None)
+def load_pyplot():
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    # Set matplotlib font for Chinese support
+    plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt, FigureCanvasTkAgg
+
+# Main GUI class; every handler is timed when instrumentation is on
+@instrument.timed_methods("gui")
+class EBSSystem:
+    def __init__(self, root, store=None, workspace=None, partition=None):
+        self.root = root
+        self.root.title("Evidence-Based Scheduling")
+        self.root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
+        self.root.resizable(True, True)
+
+        ctk.set_appearance_mode("dark")
+        ctk.set_default_color_theme("blue")
+
+        # With a workspace (see ebs_partitions) one partition is loaded at a time
+        self.workspace = workspace
+        self.partition = partition
+        self.load_store(store or open_store())
+        self.search_job = None
+        self.analysis_view = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        if workspace is not None:
+            self.create_partition_bar()
+
+        # Create tab view
+        self.notebook = ctk.CTkTabview(root, width=580, height=360)
+        self.notebook.pack(pady=10, padx=10)
+
+        # Add tabs
+        self.notebook.add("添加任務")
+        self.notebook.add("記錄工作時間")
+        self.notebook.add("完成任務")
+        self.notebook.add("修改任務")
+        self.notebook.add("預測時間")
+        self.notebook.add("數據分析")
+
+        self.selected_finish_task_name = None
+        self.selected_record_task_name = None
+
+        # Initialize tabs
+        self.create_add_tab()
+        self.create_record_time_tab()
+        self.create_finish_tab()
+        self.create_modify_tab()
+        self.create_predict_tab()
+        self.create_analyze_tab()
+        self.check_store_errors()
+        if self.ops is not core:
+            self.poll_remote_changes()
+
+    def load_store(self, store):
+        self.ops = core
+        # The milestone plan lives next to the data file (see ebs_schedule); SqliteStore keeps it as json_path
+        self.data_path = getattr(store, "path", None) or getattr(store, "json_path", None)
+        if getattr(store, "remote", False):
+            # Shared schedule on a sync server (see ebs_remote): operations run there
+            self.repo = store.load_repository()
+            self.store = self.ops = store
+        elif hasattr(store, "load_repository"):
+            # The store persists from its own files, so the writer needs no copy of the tasks
+            self.repo = store.load_repository()
+            data = {"tasks": [], "velocity": self.repo.velocity}
+        else:
+            data = store.load()
+            self.repo = TaskRepository.from_data(data)
+        if self.ops is core:
+            self.store = BackgroundWriter(store, data)
+            # Old completed tasks are in the archive next to the data file; tasks an
+            # interrupted archive run left in the store are deleted from it. The run
+            # is settled (see ebs_archive.load_archive) once the deletes are saved.
+            archive = Archive.open(self.data_path) if self.data_path else None
+            if archive is not None:
+                leftovers = self.repo.attach_archive(archive)
+                for name in leftovers:
+                    self.store.delete_task(self.repo, name)
+                if not leftovers:
+                    archive.settle()
+        self.name_index = NameIndex(self.repo.names())
+
+    # Flush the store, report failures and settle a pending archive run; in a
+    # workspace also cache the partition summary
+    def close_store(self):
+        self.store.close()
+        errors = self.store.poll_errors()
+        for error in errors:
+            messagebox.showerror("錯誤", f"保存數據失敗: {error}")
+        if not errors and self.repo.archive is not None:
+            self.repo.archive.settle()
+        if self.workspace is not None:
+            self.workspace.save_summary(self.partition, self.repo)
+
+    def on_close(self):
+        self.close_store()
+        self.root.destroy()
+
+    ### Partitions ###
+    def create_partition_bar(self):
+        bar = ctk.CTkFrame(self.root)
+        bar.pack(pady=(10, 0), padx=10, fill="x")
+        ctk.CTkLabel(bar, text="分區 (專案/估計者):").pack(side="left", padx=5)
+        self.partition_box = ctk.CTkComboBox(bar, width=200, values=self.partition_labels(),
+                                             command=self.switch_partition)
+        self.partition_box.set(partition_label(self.partition))
+        self.partition_box.pack(side="left", padx=5)
+        ctk.CTkButton(bar, text="切換", width=60,
+                      command=lambda: self.switch_partition(self.partition_box.get())).pack(side="left", padx=5)
+
+    def partition_labels(self):
+        keys = set(self.workspace.partitions()) | {self.partition}
+        return [partition_label(key) for key in sorted(keys)]
+
+    # Unload the current partition and load the selected one (created on first change)
+    def switch_partition(self, label):
+        key = parse_partition(label)
+        if key == self.partition:
+            return
+        self.close_store()
+        if self.analysis_view is not None:
+            self.analysis_view.hide()
+            self.analysis_view.window.destroy()
+            self.analysis_view = None
+        self.partition = key
+        self.load_store(self.workspace.open_store(key))
+        self.partition_box.configure(values=self.partition_labels())
+        self.partition_box.set(partition_label(key))
+        self.estimator.delete(0, ctk.END)
+        self.estimator.insert(0, key[1])
+        self.selected_record_task_name = None
+        self.selected_finish_task_name = None
+        self.update_record_tasks()
+        self.update_time_segments_display()
+        self.update_finish_tasks()
+        self.modify_task_name.set("")
+        self.update_modify_fields()
+        self.task_search_var.set("")
+        self.update_task_listbox()
+
+    # Team-wide velocity from the partitions' summary caches plus the live partition
+    def show_team_stats(self):
+        summaries = self.workspace.summaries({self.partition: self.repo})
+        team = merge_stats(summaries.values())
+        lines = [f"{partition_label(key)}: {summary['tasks']} 個任務, 速度 {summary['velocity']:.2f}"
+                 for key, summary in summaries.items()]
+        if team.count:
+            lines.append(f"團隊: {team.count} 個已完成任務, 平均速度 {team.mean:.2f}, 標準差 {team.variance ** 0.5:.2f}")
+            lines.append(f"P10/P50/P90: {team.quantile(0.1):.2f} / {team.quantile(0.5):.2f} / {team.quantile(0.9):.2f}")
+        messagebox.showinfo("團隊統計", "\n".join(lines) or "沒有數據")
+
+    # Report failed background writes without blocking the handlers
+    def check_store_errors(self):
+        for error in self.store.poll_errors():
+            messagebox.showerror("錯誤", f"保存數據失敗: {error}")
+        self.root.after(STORE_ERROR_POLL_MS, self.check_store_errors)
+
+    # Apply the changes other clients made on the sync server and refresh the lists
+    def poll_remote_changes(self):
+        self.apply_remote_changes()
+        self.root.after(REMOTE_POLL_MS, self.poll_remote_changes)
+
+    def apply_remote_changes(self):
+        records = self.store.poll_changes(self.repo)
+        if records:
+            self.show_remote_changes(records)
+
+    def show_remote_changes(self, records):
+        for record in records:
+            if record["op"] == "put":
+                if record["task"]["name"] not in self.name_index:
+                    self.name_index.add(record["task"]["name"])
+            elif record["op"] == "delete":
+                if record["name"] in self.name_index and record["name"] not in self.repo:
+                    self.name_index.remove(record["name"])
+            elif (record["op"] == "rename" and record["old"] in self.name_index and record["new"] in self.repo
+                  and record["old"] not in self.repo):
+                self.name_index.rename(record["old"], record["new"])
+                if self.selected_record_task_name == record["old"]:
+                    self.selected_record_task_name = record["new"]
+                if self.selected_finish_task_name == record["old"]:
+                    self.selected_finish_task_name = record["new"]
+                if self.modify_task_name.get() == record["old"]:
+                    self.modify_task_name.set(record["new"])
+        if self.selected_record_task_name not in self.repo:
+            self.selected_record_task_name = None
+        self.update_record_tasks()
+        self.update_time_segments_display()
+        self.update_finish_tasks()
+        self.filter_tasks()
+        if self.modify_task_name.get() and self.modify_task_name.get() not in self.repo:
+            self.modify_task_name.set("")
+            self.new_task_name.delete(0, ctk.END)
+            self.new_estimated_hours.delete(0, ctk.END)
+            for widget in self.modify_segments_frame.winfo_children():
+                widget.destroy()
+
+    # Run a task operation. On a sync server it can still fail when another client
+    # changed the task first; the error is shown and the lists catch up.
+    def run_operation(self, operation, *args):
+        try:
+            getattr(self.ops, operation)(self.repo, self.store, *args)
+            return True
+        except (KeyError, ValueError, OSError) as e:
+            messagebox.showerror("錯誤", f"操作失敗: {e.args[0] if e.args else e}")
+            if self.ops is not core:
+                self.apply_remote_changes()
+            return False
+
+    ### Add Task Tab ###
+    def create_add_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("添加任務"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        ctk.CTkLabel(frame, text="任務名稱:").pack(pady=5)
+        self.task_name = ctk.CTkEntry(frame, width=200)
+        self.task_name.pack(pady=5)
+        ctk.CTkLabel(frame, text="估計時間 (小時):").pack(pady=5)
+        self.estimated_hours = ctk.CTkEntry(frame, width=100)
+        self.estimated_hours.pack(pady=5)
+        ctk.CTkLabel(frame, text="估計者 (可選):").pack(pady=5)
+        self.estimator = ctk.CTkEntry(frame, width=200)
+        self.estimator.pack(pady=5)
+        if self.partition is not None:
+            self.estimator.insert(0, self.partition[1])
+        ctk.CTkButton(frame, text="添加任務", command=self.add_task).pack(pady=5)
+        ctk.CTkButton(frame, text="從檔案匯入任務...", command=self.import_tasks).pack(pady=5)
+        ctk.CTkButton(frame, text="匯出任務到檔案...", command=self.export_tasks).pack(pady=5)
+
+    def add_task(self):
+        name = self.task_name.get().strip()
+        try:
+            hours = float(self.estimated_hours.get())
+            if not name or hours <= 0:
+                messagebox.showerror("錯誤", "任務名稱和估計時間必須有效！")
+                return
+            # Check for duplicate task name
+            if name in self.repo or self.repo.is_archived(name):
+                messagebox.showerror("錯誤", "任務名稱已存在！")
+                return
+            if not self.run_operation("add_task", name, hours, self.estimator.get().strip()):
+                return
+            self.name_index.add(name)
+            self.record_list.append(name)
+            self.finish_list.append(name)
+            if self.task_search_var.get():
+                self.filter_tasks()
+            else:
+                self.task_list.append(name)
+            self.task_name.delete(0, ctk.END)
+            self.estimated_hours.delete(0, ctk.END)
+            messagebox.showinfo("成功", f"任務 '{name}' 添加成功！")
+        except ValueError:
+            messagebox.showerror("錯誤", "估計時間必須是數字！")
+
+    # Bulk import from CSV / JSON Lines: one transaction, one list refresh at the end.
+    # Tasks whose name already exists are skipped and counted.
+    def import_tasks(self):
+        path = filedialog.askopenfilename(title="匯入任務", filetypes=[("CSV / JSON Lines", "*.csv *.jsonl *.ndjson")])
+        if not path:
+            return
+        try:
+            tasks, skipped = transfer.import_file(self.repo, self.store, path, skip_duplicates=True)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("錯誤", f"匯入失敗: {e}")
+            return
+        for task in tasks:
+            self.name_index.add(task.name)
+        self.update_record_tasks()
+        self.update_finish_tasks()
+        self.filter_tasks()
+        skipped_text = f"，略過 {skipped} 個已存在的任務" if skipped else ""
+        messagebox.showinfo("成功", f"已匯入 {len(tasks)} 個任務{skipped_text}")
+
+    def export_tasks(self):
+        path = filedialog.asksaveasfilename(title="匯出任務", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        try:
+            count = transfer.export_file(self.repo, path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("錯誤", f"匯出失敗: {e}")
+            return
+        messagebox.showinfo("成功", f"已匯出 {count} 個任務到 {path}")
+
+    ### Record Time Tab ###
+    def create_record_time_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("記錄工作時間"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        self.record_list = VirtualList(frame, command=self.select_record_task, radio=True)
+        self.record_list.pack(pady=5, padx=5)
+        self.update_record_tasks()
+        ctk.CTkLabel(frame, text="已記錄時間段:").pack(pady=5)
+        container_frame = ctk.CTkFrame(frame, width=200, height=150)
+        container_frame.pack(pady=5, padx=5)
+        container_frame.pack_propagate(False)
+        self.segments_frame = ctk.CTkScrollableFrame(container_frame, width=200)
+        self.segments_frame.pack(fill="both", expand=True)
+        ctk.CTkLabel(frame, text="本次工作時間 (小時):").pack(pady=5)
+        self.record_hours = ctk.CTkEntry(frame, width=100)
+        self.record_hours.pack(pady=5)
+        ctk.CTkButton(frame, text="記錄時間", command=self.record_time).pack(pady=5)
+
+    def update_record_tasks(self):
+        self.record_list.set_items(self.repo.names())
+        self.record_list.select(self.selected_record_task_name)
+
+    def select_record_task(self, name):
+        self.selected_record_task_name = name
+        self.record_list.select(name)
+        self.update_time_segments_display()
+
+    def update_time_segments_display(self):
+        for widget in self.segments_frame.winfo_children():
+            widget.destroy()
+        if not self.selected_record_task_name:
+            return
+        task = self.repo.get(self.selected_record_task_name)
+        if task is None:
+            return
+        if task.hours:
+            ctk.CTkLabel(self.segments_frame, text=f"總計時間: {task.actual_hours:.2f} 小時").pack(pady=2)
+        for i, (hours, ts) in enumerate(task.segments()):
+            time_str = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+            ctk.CTkLabel(self.segments_frame, text=f"{i+1}. {hours:.2f} 小時 ({time_str})").pack(pady=1)
+
+    def record_time(self):
+        if not self.selected_record_task_name:
+            messagebox.showerror("錯誤", "請選擇一個任務！")
+            return
+        try:
+            hours = float(self.record_hours.get())
+            if hours <= 0:
+                messagebox.showerror("錯誤", "工作時間必須大於0！")
+                return
+            if self.selected_record_task_name in self.repo:
+                if not self.run_operation("record_time", self.selected_record_task_name, hours):
+                    return
+                self.record_hours.delete(0, ctk.END)
+                self.update_time_segments_display()
+                messagebox.showinfo("成功", f"已為任務 '{self.selected_record_task_name}' 記錄 {hours:.2f} 小時工作時間")
+        except ValueError:
+            messagebox.showerror("錯誤", "工作時間必須是數字！")
+
+    ### Finish Task Tab ###
+    def create_finish_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("完成任務"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        self.finish_list = VirtualList(frame, command=self.select_finish_task, radio=True, empty_text="沒有未完成的任務")
+        self.finish_list.pack(pady=5, padx=5)
+        self.finish_total_time_label = ctk.CTkLabel(frame, text="已記錄總時間: 0 小時")
+        self.finish_total_time_label.pack(pady=5)
+        self.update_finish_tasks()
+        ctk.CTkButton(frame, text="標記為完成", command=self.finish_task).pack(pady=5)
+
+    def update_finish_tasks(self):
+        if self.selected_finish_task_name and self.selected_finish_task_name not in self.repo.unfinished:
+            self.selected_finish_task_name = None
+        self.finish_list.set_items(self.repo.unfinished)
+        self.finish_list.select(self.selected_finish_task_name)
+        if self.selected_finish_task_name:
+            self.select_finish_task(self.selected_finish_task_name)
+        else:
+            self.finish_total_time_label.configure(text="已記錄總時間: 0 小時")
+
+    def select_finish_task(self, name):
+        self.selected_finish_task_name = name
+        self.finish_list.select(name)
+        task = self.repo.get(name)
+        if task is not None:
+            self.finish_total_time_label.configure(text=f"已記錄總時間: {task.actual_hours or 0:.2f} 小時")
+
+    def finish_task(self):
+        if not self.selected_finish_task_name:
+            messagebox.showerror("錯誤", "請選擇一個任務！")
+            return
+        task = self.repo.get(self.selected_finish_task_name)
+        if task is None:
+            return
+        if not task.hours:
+            if not messagebox.askyesno("警告", "此任務沒有記錄工作時間。確定要標記為完成嗎？"):
+                return
+        if not self.run_operation("finish_task", task.name):
+            return
+        messagebox.showinfo("成功", f"任務 '{self.selected_finish_task_name}' 已標記為完成")
+        self.finish_list.remove(self.selected_finish_task_name)
+        self.selected_finish_task_name = None
+        self.finish_list.select(None)
+        self.finish_total_time_label.configure(text="已記錄總時間: 0 小時")
+
+    ### Modify Task Tab ###
+    def create_modify_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("修改任務"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        ctk.CTkLabel(frame, text="搜尋任務:").pack(pady=5)
+        search_container = ctk.CTkFrame(frame)
+        search_container.pack(pady=5, fill="x")
+        self.task_search_var = ctk.StringVar()
+        self.task_search_entry = ctk.CTkEntry(search_container, width=200, textvariable=self.task_search_var)
+        self.task_search_entry.pack(pady=5)
+        self.task_search_var.trace_add("write", self.schedule_filter)
+        self.task_list = VirtualList(search_container, command=self.select_task)
+        self.task_list.pack(pady=5)
+        self.update_task_listbox()
+        self.modify_task_name = ctk.StringVar()
+        ctk.CTkLabel(frame, text="新任務名稱:").pack(pady=5)
+        self.new_task_name = ctk.CTkEntry(frame, width=200)
+        self.new_task_name.pack(pady=5)
+        ctk.CTkLabel(frame, text="新估計時間 (小時):").pack(pady=5)
+        self.new_estimated_hours = ctk.CTkEntry(frame, width=100)
+        self.new_estimated_hours.pack(pady=5)
+        ctk.CTkLabel(frame, text="已記錄時間段:").pack(pady=5)
+        self.modify_segments_frame = ctk.CTkScrollableFrame(frame, width=TAB_FRAME_WIDTH, height=80)
+        self.modify_segments_frame.pack(pady=5, padx=5)
+        ctk.CTkButton(frame, text="刪除選定任務", command=self.delete_task, fg_color="#d12a2a").pack(pady=5)
+        ctk.CTkButton(frame, text="修改任務", command=self.modify_task).pack(pady=5)
+
+    def update_task_listbox(self):
+        self.task_list.set_items(self.repo.names())
+
+    # Debounce keystrokes so only the last one within SEARCH_DEBOUNCE_MS runs a search
+    def schedule_filter(self, *args):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DEBOUNCE_MS, self.filter_tasks)
+
+    def filter_tasks(self, *args):
+        self.search_job = None
+        search_text = self.task_search_var.get()
+        if search_text:
+            names = self.name_index.search(search_text)
+            # Archived tasks are listed after the live ones and open read-only
+            if self.repo.archive is not None:
+                names += self.repo.archive.search(search_text, ARCHIVE_SEARCH_LIMIT)
+            self.task_list.set_items(names)
+        else:
+            self.update_task_listbox()
+
+    def select_task(self, name):
+        self.modify_task_name.set(name)
+        self.task_search_var.set("")
+        self.update_modify_fields()
+
+    def update_modify_fields(self, event=None):
+        name = self.modify_task_name.get()
+        for widget in self.modify_segments_frame.winfo_children():
+            widget.destroy()
+        task = self.repo.get(name)
+        if task is None:
+            if self.repo.is_archived(name):
+                self.show_archived_task(self.repo.archive.get(name))
+            return
+        self.new_task_name.delete(0, ctk.END)
+        self.new_task_name.insert(0, task.name)
+        self.new_estimated_hours.delete(0, ctk.END)
+        self.new_estimated_hours.insert(0, str(task.estimated_hours))
+        if task.hours:
+            ctk.CTkLabel(self.modify_segments_frame, text=f"總計時間: {task.actual_hours:.2f} 小時").pack(pady=2)
+        for i, (hours, ts) in enumerate(task.segments()):
+            segment_frame = ctk.CTkFrame(self.modify_segments_frame)
+            segment_frame.pack(fill="x", pady=1)
+            time_str = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+            label = ctk.CTkLabel(segment_frame, text=f"{hours:.2f} 小時 ({time_str})")
+            label.pack(side="left", padx=5)
+            delete_btn = ctk.CTkButton(
+                segment_frame, text="X", width=30, height=20, fg_color="#d12a2a",
+                command=lambda t=task.name, idx=i: self.delete_time_segment(t, idx)
+            )
+            delete_btn.pack(side="right", padx=5)
+
+    def show_archived_task(self, task):
+        self.new_task_name.delete(0, ctk.END)
+        self.new_estimated_hours.delete(0, ctk.END)
+        ctk.CTkLabel(self.modify_segments_frame, text=f"已封存任務 (唯讀): {task.name}, 估計 {task.estimated_hours:g} 小時").pack(pady=2)
+        if task.hours:
+            ctk.CTkLabel(self.modify_segments_frame, text=f"總計時間: {task.actual_hours:.2f} 小時").pack(pady=2)
+        for hours, ts in task.segments():
+            time_str = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+            ctk.CTkLabel(self.modify_segments_frame, text=f"{hours:.2f} 小時 ({time_str})").pack(pady=1)
+
+    def delete_time_segment(self, task_name, segment_index):
+        task = self.repo.get(task_name)
+        if task is None:
+            return
+        if messagebox.askyesno("確認", f"確定要刪除時間段 {segment_index+1}？"):
+            if 0 <= segment_index < len(task.hours):
+                if not self.run_operation("delete_time_segment", task_name, segment_index):
+                    return
+                messagebox.showinfo("成功", "時間段已刪除")
+                self.update_modify_fields()
+
+    def delete_task(self):
+        name = self.modify_task_name.get()
+        if not name:
+            messagebox.showerror("錯誤", "請選擇要刪除的任務！")
+            return
+        if self.repo.is_archived(name):
+            messagebox.showerror("錯誤", "已封存的任務不能刪除！")
+            return
+        if messagebox.askyesno("確認", f"確定要刪除任務 '{name}'？此操作不可恢復。"):
+            if name in self.repo:
+                if not self.run_operation("delete_task", name):
+                    return
+                self.name_index.remove(name)
+                self.task_list.remove(name)
+                self.finish_list.remove(name)
+                self.record_list.remove(name)
+                if self.selected_finish_task_name == name:
+                    self.update_finish_tasks()
+                if self.selected_record_task_name == name:
+                    self.selected_record_task_name = None
+                    self.update_time_segments_display()
+                self.new_task_name.delete(0, ctk.END)
+                self.new_estimated_hours.delete(0, ctk.END)
+                for widget in self.modify_segments_frame.winfo_children():
+                    widget.destroy()
+                messagebox.showinfo("成功", f"任務 '{name}' 已刪除")
+
+    def modify_task(self):
+        old_name = self.modify_task_name.get().strip()
+        new_name = self.new_task_name.get().strip()
+        try:
+            new_estimated = float(self.new_estimated_hours.get()) if self.new_estimated_hours.get().strip() else None
+            if not old_name:
+                messagebox.showerror("錯誤", "請選擇要修改的任務！")
+                return
+            task = self.repo.get(old_name)
+            if task is None:
+                messagebox.showerror("錯誤", "已封存的任務不能修改！" if self.repo.is_archived(old_name) else "任務未找到！")
+                return
+            if new_name and new_name != old_name:
+                # Check for duplicate task name
+                if new_name in self.repo or self.repo.is_archived(new_name):
+                    messagebox.showerror("錯誤", "新任務名稱已存在！")
+                    return
+            if not self.run_operation("modify_task", old_name, new_name, new_estimated):
+                return
+            if task.name != old_name:
+                self.name_index.rename(old_name, new_name)
+                for task_list in (self.task_list, self.finish_list, self.record_list):
+                    task_list.rename(old_name, new_name)
+                if self.selected_finish_task_name == old_name:
+                    self.selected_finish_task_name = new_name
+                    self.finish_list.select(new_name)
+                if self.selected_record_task_name == old_name:
+                    self.selected_record_task_name = new_name
+                    self.record_list.select(new_name)
+            if self.selected_finish_task_name == task.name:
+                self.select_finish_task(task.name)
+            messagebox.showinfo("成功", f"任務 '{old_name}' 修改成功！")
+        except ValueError:
+            messagebox.showerror("錯誤", "時間必須是數字，且大於 0！")
+
+    ### Predict Time Tab ###
+    def create_predict_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("預測時間"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        ctk.CTkLabel(frame, text="預測總估計時間 (小時):").pack(pady=5)
+        self.predict_hours = ctk.CTkEntry(frame, width=100)
+        self.predict_hours.pack(pady=5)
+        ctk.CTkLabel(frame, text="速度歷史:").pack(pady=5)
+        self.predict_history = ctk.StringVar(value=next(iter(PREDICT_HISTORY)))
+        ctk.CTkOptionMenu(frame, values=list(PREDICT_HISTORY), variable=self.predict_history).pack(pady=5)
+        ctk.CTkButton(frame, text="預測完成時間", command=self.predict_time).pack(pady=5)
+        ctk.CTkButton(frame, text="預測所有未完成任務", command=self.predict_unfinished).pack(pady=5)
+        ctk.CTkButton(frame, text="預測里程碑日期", command=self.predict_milestones).pack(pady=5)
+        self.predict_result = ctk.CTkTextbox(frame, height=90, width=300)
+        self.predict_result.pack(pady=5)
+        self.predict_frame = frame
+        self.predict_canvas = None
+
+    def predict_time(self):
+        try:
+            hours = float(self.predict_hours.get())
+            if hours <= 0:
+                messagebox.showerror("錯誤", "預測時間必須大於0！")
+                return
+            from ebs_simulation import simulate_hours
+            self.show_prediction(f"估計 {hours:.2f} 小時", simulate_hours(self.repo, hours, **PREDICT_HISTORY[self.predict_history.get()]))
+        except ValueError:
+            messagebox.showerror("錯誤", "預測時間必須是數字！")
+
+    def predict_unfinished(self):
+        if not self.repo.unfinished:
+            messagebox.showerror("錯誤", "沒有未完成的任務！")
+            return
+        from ebs_simulation import simulate_unfinished
+        self.show_prediction("所有未完成任務", simulate_unfinished(self.repo, **PREDICT_HISTORY[self.predict_history.get()]))
+
+    # Ship dates of the plan's milestones and developers (edited with `ebs plan`)
+    def predict_milestones(self):
+        if not self.repo.unfinished:
+            messagebox.showerror("錯誤", "沒有未完成的任務！")
+            return
+        from ebs_schedule import BASELINE, empty_plan, load_plan, plan_path, schedule
+        try:
+            plan = load_plan(plan_path(self.data_path)) if self.data_path else empty_plan()
+            # In-process: forking worker processes while the writer thread holds
+            # locks could leave them deadlocked
+            result = schedule(self.repo, plan, workers=1, **PREDICT_HISTORY[self.predict_history.get()])[BASELINE]
+        except (OSError, KeyError, ValueError) as e:
+            messagebox.showerror("錯誤", f"無法讀取計劃: {e}")
+            return
+        self.predict_result.delete("1.0", "end")
+        self.predict_result.insert("1.0", f"里程碑日期 ({result['simulations']} 次模擬, {self.predict_history.get()})\n")
+        for kind, rows in (("里程碑", result["milestones"]), ("開發者", result["developers"])):
+            for row in rows:
+                dates = ", ".join(f"P{p} {d:%m/%d}" for p, d in row["percentiles"].items())
+                self.predict_result.insert("end", f"{kind} {row['name'] or '(無)'}: {dates}\n")
+                if row.get("due"):
+                    self.predict_result.insert("end", f"  截止 {row['due']:%m/%d}, 準時機率 {row['on_time']:.0%}\n")
+        if result["unassigned"]:
+            self.predict_result.insert("end", f"{result['unassigned']} 個任務由最先有空的人接手\n")
+        self.show_window_fallback(result["window_fallback"])
+
+    # Estimators with too few completions in the window use their whole history
+    def show_window_fallback(self, fallback):
+        from ebs_simulation import MIN_WINDOW_SAMPLES
+        if fallback:
+            names = ", ".join(estimator or "(無)" for estimator in fallback)
+            self.predict_result.insert("end", f"注意: {names} 在期間內完成少於 {MIN_WINDOW_SAMPLES} 個任務，已改用全部歷史\n")
+
+    def show_prediction(self, title, result):
+        from ebs_simulation import PERCENTILES
+        if self.predict_canvas is None:
+            plt, FigureCanvasTkAgg = load_pyplot()
+            self.predict_fig, self.predict_ax = plt.subplots(figsize=(4, 2.5))
+            self.predict_canvas = FigureCanvasTkAgg(self.predict_fig, master=self.predict_frame)
+            self.predict_canvas.get_tk_widget().pack(pady=5, fill="both", expand=True)
+            plt.close(self.predict_fig)
+        self.predict_result.delete("1.0", "end")
+        self.predict_result.insert("1.0", f"{title} ({result['simulations']} 次模擬, {self.predict_history.get()})\n")
+        for p in PERCENTILES:
+            self.predict_result.insert("end", f"P{p}: {result['percentiles'][p]:.2f} 小時\n")
+        self.predict_result.insert("end", f"平均: {result['mean']:.2f} 小時\n")
+        self.show_window_fallback(result["window_fallback"])
+        ax = self.predict_ax
+        ax.clear()
+        counts, edges = result["counts"], result["edges"]
+        # Plot the cumulative probability of finishing within each number of hours
+        ax.plot(edges[1:], counts.cumsum() / counts.sum() * 100, drawstyle="steps-post")
+        for p in PERCENTILES:
+            ax.axvline(result["percentiles"][p], linestyle="--", linewidth=0.8, color="gray")
+        ax.set_title("完成時間分佈")
+        ax.set_xlabel("小時")
+        ax.set_ylabel("完成機率 (%)")
+        ax.grid(True)
+        self.predict_fig.tight_layout()
+        self.predict_canvas.draw_idle()
+
+    ### Analyze Tab ###
+    def create_analyze_tab(self):
+        frame = ctk.CTkScrollableFrame(self.notebook.tab("數據分析"), width=TAB_FRAME_WIDTH, height=TAB_FRAME_HEIGHT)
+        frame.pack(pady=5, padx=5, fill="both", expand=True)
+        ctk.CTkButton(frame, text="顯示分析", command=self.show_analysis).pack(pady=10)
+        if self.workspace is not None:
+            ctk.CTkButton(frame, text="團隊統計", command=self.show_team_stats).pack(pady=10)
+        ctk.CTkLabel(frame, text="搜尋封存任務:").pack(pady=5)
+        self.archive_search = ctk.CTkEntry(frame, width=200)
+        self.archive_search.pack(pady=5)
+        ctk.CTkButton(frame, text="搜尋", command=self.search_archive).pack(pady=5)
+        self.archive_result = ctk.CTkTextbox(frame, height=120, width=300)
+        self.archive_result.pack(pady=5)
+
+    # Archived tasks are only decompressed when searched for
+    def search_archive(self):
+        self.archive_result.delete("1.0", "end")
+        archive = self.repo.archive
+        if archive is None:
+            self.archive_result.insert("1.0", "沒有已封存的任務\n")
+            return
+        names = archive.search(self.archive_search.get().strip(), ARCHIVE_SEARCH_LIMIT)
+        self.archive_result.insert("1.0", f"找到 {len(names)} 個 (共 {len(archive)} 個已封存)\n")
+        for task in archive.tasks(names):
+            finished = datetime.fromtimestamp(task.end_time).strftime("%Y-%m-%d") if task.end_time else "-"
+            self.archive_result.insert("end", f"{task.name}: 估計 {task.estimated_hours:g} 小時, "
+                                              f"實際 {task.actual_hours or 0:g} 小時, 完成 {finished}\n")
+
+    # The analysis window is built once and refreshed in place on later clicks
+    def show_analysis(self):
+        if self.analysis_view is None:
+            load_pyplot()
+            from ebs_charts import AnalysisView
+            self.analysis_view = AnalysisView(self.root, self.repo)
+        self.analysis_view.show()
+
+def main(store=None, workspace=None, partition=None):
+    if instrument.enabled:
+        instrument.watch_widgets()
+    root = ctk.CTk()
+    app = EBSSystem(root, store, workspace, partition)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+# Built-in instrumentation. Off by default: instrumented functions only check one
+# flag per call. Turn it on with EBS_INSTRUMENT=1 (0, false, no, off or empty
+# leave it off; the report is printed to stderr on exit, or written to
+# EBS_INSTRUMENT_REPORT; a .json path gives JSON) or with EBS_PROFILE=<file>
+# (additionally runs cProfile and writes pstats to <file>).
+# The command line flags --instrument and --profile FILE do the same.
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Upper bounds (ms) of the wall-time histogram buckets: 1/16 ms doubling up to ~16 s
+BUCKETS_MS = [0.0625 * 2 ** i for i in range(19)]
+
+enabled = False
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+_profiler = None
+_outputs = {"report": None, "profile": None}
+
+class _Timing:
+    __slots__ = ("calls", "total", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.calls += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    # Upper bound of the bucket holding the q-quantile call, capped at the slowest call
+    def quantile(self, q):
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+def record(name, ms):
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = _Timing()
+        timing.add(ms)
+
+def count(name, n=1):
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+# Decorator recording call count and wall time under `name`
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+# Class decorator timing __init__ and every public method as "<prefix>.<method>"
+def timed_methods(prefix):
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and (attr == "__init__" or not attr.startswith("_")):
+                setattr(cls, attr, timed(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+# Count tkinter widget creation and destruction per class (CTk widgets and the
+# tk widgets they are built from). Only patched in once instrumentation is on.
+def watch_widgets():
+    import tkinter
+    if getattr(tkinter.BaseWidget, "_ebs_watched", False):
+        return
+    init, destroy = tkinter.BaseWidget.__init__, tkinter.BaseWidget.destroy
+
+    def counted_init(self, *args, **kwargs):
+        count(f"widgets.created.{type(self).__name__}")
+        init(self, *args, **kwargs)
+
+    def counted_destroy(self):
+        count(f"widgets.destroyed.{type(self).__name__}")
+        destroy(self)
+
+    tkinter.BaseWidget.__init__ = counted_init
+    tkinter.BaseWidget.destroy = counted_destroy
+    tkinter.BaseWidget._ebs_watched = True
+
+def snapshot():
+    with _lock:
+        return {
+            "timings": {name: {
+                "calls": t.calls,
+                "total_ms": t.total,
+                "mean_ms": t.total / t.calls,
+                "p50_ms": t.quantile(0.5),
+                "p95_ms": t.quantile(0.95),
+                "max_ms": t.max,
+                "histogram": {f"<={bound:g}ms": n for bound, n in zip(BUCKETS_MS + [float("inf")], t.buckets) if n}
+            } for name, t in _timings.items()},
+            "counters": dict(_counters)
+        }
+
+def report():
+    data = snapshot()
+    lines = [f"{'operation':<40} {'calls':>7} {'total ms':>11} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name, t in sorted(data["timings"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{name:<40} {t['calls']:>7} {t['total_ms']:>11.1f} {t['mean_ms']:>9.2f} {t['p95_ms']:>9.2f} {t['max_ms']:>9.1f}")
+    if data["counters"]:
+        lines.append("")
+        lines.extend(f"{name:<40} {value:>12}" for name, value in sorted(data["counters"].items()))
+    return "\n".join(lines)
+
+# Write the report (JSON when the path ends in .json, stderr without a path) and
+# the pstats file when profiling
+def dump(path=None, profile_path=None):
+    if path is None:
+        print(report(), file=sys.stderr)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(snapshot(), f, indent=2)
+            else:
+                f.write(report() + "\n")
+    if _profiler is not None and profile_path:
+        _profiler.disable()
+        _profiler.dump_stats(profile_path)
+
+def _dump_at_exit():
+    dump(_outputs["report"], _outputs["profile"])
+
+# Can be called again (e.g. env var at import, then a CLI flag) to add a report
+# path or start profiling; everything is written once at exit
+def enable(report_path=None, profile_path=None):
+    global enabled, _profiler
+    if report_path:
+        _outputs["report"] = report_path
+    if profile_path and _profiler is None:
+        import cProfile
+        _outputs["profile"] = profile_path
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if not enabled:
+        enabled = True
+        atexit.register(_dump_at_exit)
+
+# Boolean environment switch: unset, empty, "0", "false", "no" and "off" mean off
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+if _env_flag("EBS_INSTRUMENT") or os.environ.get("EBS_PROFILE"):
+    enable(os.environ.get("EBS_INSTRUMENT_REPORT"), os.environ.get("EBS_PROFILE"))
@@ -0,0 +1,331 @@
+from array import array
+from datetime import datetime
+from ebs_stats import VelocityStats
+from ebs_timeline import Timeline
+from ebs_instrument import timed
+
+# ISO-8601 strings, as stored in ebs_data.json and the tasks table, to epoch seconds and back
+def _epoch(iso):
+    return datetime.fromisoformat(iso).timestamp() if iso else None
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+# One task. Times are epoch seconds and time segments are kept as two parallel
+# arrays of hours and timestamps instead of a list of {"hours", "timestamp"} dicts.
+class Task:
+    __slots__ = ("name", "estimated_hours", "estimator", "actual_hours", "start_time", "end_time",
+                 "completed", "hours", "timestamps")
+
+    def __init__(self, name, estimated_hours, estimator="", start_time=None):
+        self.name = name
+        self.estimated_hours = estimated_hours
+        self.estimator = estimator
+        self.actual_hours = None
+        self.start_time = start_time or datetime.now().timestamp()
+        self.end_time = None
+        self.completed = False
+        self.hours = array("d")
+        self.timestamps = array("d")
+
+    # Build from a task dict in the ebs_data.json schema (after migrate_data)
+    @classmethod
+    def from_dict(cls, d):
+        task = cls(d["name"], d["estimated_hours"], d.get("estimator") or "", _epoch(d.get("start_time")))
+        task.actual_hours = d.get("actual_hours")
+        task.end_time = _epoch(d.get("end_time"))
+        task.completed = d.get("completed", False)
+        for segment in d["time_segments"]:
+            task.hours.append(segment["hours"])
+            task.timestamps.append(_epoch(segment["timestamp"]))
+        return task
+
+    def to_dict(self):
+        d = {
+            "name": self.name,
+            "estimated_hours": self.estimated_hours,
+            "actual_hours": self.actual_hours,
+            "time_segments": [
+                {"hours": hours, "timestamp": _iso(ts)}
+                for hours, ts in zip(self.hours, self.timestamps)
+            ],
+            "start_time": _iso(self.start_time),
+            "completed": self.completed
+        }
+        if self.estimator:
+            d["estimator"] = self.estimator
+        if self.end_time is not None:
+            d["end_time"] = _iso(self.end_time)
+        return d
+
+    # (hours, epoch timestamp) pairs in the order they were recorded
+    def segments(self):
+        return zip(self.hours, self.timestamps)
+
+    def add_segment(self, hours, timestamp=None):
+        self.hours.append(hours)
+        self.timestamps.append(timestamp if timestamp is not None else datetime.now().timestamp())
+        self.actual_hours = (self.actual_hours or 0) + hours
+
+    def remove_segment(self, index):
+        hours = self.hours.pop(index)
+        self.timestamps.pop(index)
+        self.actual_hours = self.actual_hours - hours if self.hours else None
+        return hours
+
+# All tasks, indexed by name and partitioned into unfinished and completed.
+# Every mutation goes through the repository so the indexes and the velocity
+# statistics stay in step; after editing a task's fields call update(task), and
+# add or remove time segments with add_segment / remove_segment. With an archive
+# attached (see ebs_archive) the statistics and the timeline also count the
+# archived tasks, which are not in the indexes.
+#
+# A store can also leave its completed tasks where they are (see defer): they are
+# counted in the statistics from the store's aggregate, and get() or `in` loads
+# one the first time it is asked for. Their names are only read from the store
+# when names() is called; reading `tasks`, `completed`, the timeline or the
+# statistics' entries loads them all.
+class TaskRepository:
+    def __init__(self, velocity=1.0):
+        self._tasks = {}
+        self.unfinished = {}
+        self._completed = {}
+        self.stats = VelocityStats()
+        self.velocity = velocity
+        self._timeline = None
+        self.archive = None
+        # Store holding the deferred tasks. Once names() has indexed them their
+        # names map to None above; before that `seen` holds every name that was
+        # ever in the indexes, as the store's copy of those may be out of date.
+        self.source = None
+        self.indexed = True
+        self.seen = set()
+        # Renamed tasks' names -> their names in the store when it was opened
+        self.origins = {}
+        # Deferred tasks that are neither loaded nor indexed yet
+        self.unindexed = 0
+
+    @classmethod
+    @timed("model.TaskRepository.from_data")
+    def from_data(cls, data):
+        repo = cls(data.get("velocity", 1.0))
+        for d in data["tasks"]:
+            repo.add(Task.from_dict(d))
+        return repo
+
+    def to_data(self):
+        return {"tasks": [task.to_dict() for task in self.tasks.values()], "velocity": self.velocity}
+
+    @property
+    def tasks(self):
+        self.load_deferred()
+        return self._tasks
+
+    @property
+    def completed(self):
+        self.load_deferred()
+        return self._completed
+
+    # Every task name in display order, without loading deferred tasks
+    def names(self):
+        if not self.indexed:
+            self._index_deferred()
+        return self._tasks.keys()
+
+    def __len__(self):
+        return len(self._tasks) + self.unindexed
+
+    def __iter__(self):
+        return iter(self.tasks.values())
+
+    def __contains__(self, name):
+        return name in self._tasks or (not self.indexed and self.get(name) is not None)
+
+    def get(self, name):
+        task = self._tasks.get(name)
+        if task is None and self.source is not None and (name in self._tasks if self.indexed else name not in self.seen):
+            task = self._load_one(name)
+        return task
+
+    # Names stay unique across live and archived tasks
+    def is_archived(self, name):
+        return self.archive is not None and name in self.archive
+
+    # Completions and segments by calendar day (see ebs_timeline), built on first use
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            self._timeline = Timeline.from_tasks(self.tasks.values())
+            if self.archive is not None:
+                self._timeline.add_archive(self.archive.days, self.archive.decay)
+        return self._timeline
+
+    # Leave the completed tasks of `source` there until they are read; the tasks
+    # added so far are the rest. `stats` are the statistics of the deferred tasks
+    # as kept by the store. The source provides completed_task(name) (None for a
+    # name it has no completed task of), completed_tasks() and task_names(), the
+    # (name, completed) pairs of all its tasks in order.
+    def defer(self, source, stats):
+        self.source = source
+        self.indexed = False
+        self.seen = set(self._tasks)
+        self.unindexed = stats.total_tasks
+        self.stats.merge(stats)
+        self.stats.loader = self.load_deferred
+        self._refresh_velocity()
+
+    def _load_one(self, name):
+        task = self.source.completed_task(name)
+        if task is None:
+            return None
+        if name not in self._tasks:
+            self.unindexed -= 1
+        self.seen.add(name)
+        self._tasks[name] = self._completed[name] = task
+        self.stats.separate(task)
+        return task
+
+    # Put the deferred tasks' names in the indexes, in the store's order, mapped
+    # to None until they are loaded
+    @timed("model.TaskRepository.index_deferred")
+    def _index_deferred(self):
+        tasks = {}
+        renamed = {origin: name for name, origin in self.origins.items()}
+        for name, completed in self.source.task_names():
+            if name not in self._tasks:
+                name = renamed.get(name, name)
+            if name in self._tasks:
+                tasks[name] = self._tasks[name]
+            elif completed and name not in self.seen:
+                tasks[name] = None
+        # Tasks the store does not have yet come last
+        tasks.update(self._tasks)
+        self._tasks = tasks
+        self._completed = {name: task for name, task in tasks.items() if task is None or task.completed}
+        self.indexed = True
+        self.unindexed = 0
+        self.origins = {}
+
+    # Load every task still in the store; call it before closing a store whose
+    # repository is used afterwards
+    def load_deferred(self):
+        if self.source is None:
+            return
+        self.names()
+        for task in self.source.completed_tasks():
+            if task.name in self._tasks and self._tasks[task.name] is None:
+                self._tasks[task.name] = self._completed[task.name] = task
+                self.stats.separate(task)
+        self.source = self.stats.loader = None
+        self.seen = set()
+        # Entries in task order, as if everything had been loaded up front
+        entries = self.stats.completed
+        self.stats.completed = {name: entries[name] for name in self._completed if name in entries}
+
+    # Count an archive's tasks in the statistics. Tasks that are both archived and
+    # here were left behind by an interrupted archive run (only checked when the
+    # archive says a run may not have finished); they are removed and their names
+    # returned so the caller can delete them from the store.
+    def attach_archive(self, archive):
+        leftovers = [name for name in self.names() if name in archive] if archive.pending else []
+        for name in leftovers:
+            self.remove(name)
+        self.archive = archive
+        self.stats.add_archive(archive.stats, archive)
+        self._timeline = None
+        self._refresh_velocity()
+        return leftovers
+
+    # Tasks just written to the attached archive leave the indexes; `stats` is
+    # their part of the statistics as returned by Archive.add
+    def archive_tasks(self, tasks, stats):
+        for task in tasks:
+            self.remove(task.name)
+        self.stats.add_archive(stats, self.archive)
+        self._timeline = None
+        self._refresh_velocity()
+
+    def _refresh_velocity(self):
+        if self.stats.count:
+            self.velocity = self.stats.mean
+
+    def add(self, task):
+        if task.name in self:
+            raise ValueError(f"Duplicate task name: {task.name}")
+        if self.source is not None:
+            self.seen.add(task.name)
+        self._tasks[task.name] = task
+        (self._completed if task.completed else self.unfinished)[task.name] = task
+        self.stats.add_task(task)
+        if self._timeline is not None:
+            self._timeline.add_task(task)
+        self._refresh_velocity()
+
+    def update(self, task):
+        if task.completed and task.name in self.unfinished:
+            del self.unfinished[task.name]
+            self._completed[task.name] = task
+        self.stats.update_task(task)
+        if self._timeline is not None:
+            self._timeline.update_task(task)
+        self._refresh_velocity()
+
+    def add_segment(self, task, hours, timestamp=None):
+        task.add_segment(hours, timestamp)
+        if self._timeline is not None:
+            self._timeline.add_segment(hours, task.timestamps[-1])
+
+    def remove_segment(self, task, index):
+        timestamp = task.timestamps[index]
+        hours = task.remove_segment(index)
+        if self._timeline is not None:
+            self._timeline.remove_segment(hours, timestamp)
+        return hours
+
+    # Swap in a new record for an existing task of the same name, keeping its position
+    def replace(self, task):
+        old = self.get(task.name)
+        if old is None:
+            raise KeyError(task.name)
+        if old.completed and not task.completed:
+            self.remove(task.name)
+            self.add(task)
+            return
+        if self._timeline is not None:
+            self._timeline.remove_task(old)
+            self._timeline.add_task(task)
+        self._tasks[task.name] = task
+        (self._completed if old.completed else self.unfinished)[task.name] = task
+        self.update(task)
+
+    def remove(self, name):
+        self.get(name)
+        task = self._tasks.pop(name)
+        (self._completed if task.completed else self.unfinished).pop(name)
+        self.stats.remove_task(name)
+        if self._timeline is not None:
+            self._timeline.remove_task(task)
+        self._refresh_velocity()
+        return task
+
+    # Renaming rebuilds the ordered indexes so the task keeps its position
+    def rename(self, old_name, new_name):
+        if new_name in self:
+            raise ValueError(f"Duplicate task name: {new_name}")
+        self.get(old_name)
+        task = self._tasks[old_name]
+        if self.source is not None:
+            self.seen.add(new_name)
+            if not self.indexed:
+                self.origins[new_name] = self.origins.pop(old_name, old_name)
+        task.name = new_name
+        self._tasks = {new_name if name == old_name else name: t for name, t in self._tasks.items()}
+        partition = self._completed if task.completed else self.unfinished
+        renamed = {new_name if name == old_name else name: t for name, t in partition.items()}
+        if task.completed:
+            self._completed = renamed
+        else:
+            self.unfinished = renamed
+        self.stats.rename_task(old_name, new_name)
+        if self._timeline is not None:
+            self._timeline.rename_task(old_name, new_name)
@@ -0,0 +1,161 @@
+import json
+import os
+from urllib.parse import quote, unquote
+from ebs_archive import load_archive
+from ebs_core import open_repository
+from ebs_stats import VelocityStats
+from ebs_storage import DATA_FILE, atomic_write, open_store
+
+# Tasks partitioned by project and estimator. Every partition is an ordinary
+# dataset with its own storage file(s) and velocity history, kept in a directory
+# next to the data file:
+#
+#   ebs_data.partitions/<project>+<estimator>.json   (plus .journal, .snap, .db ...)
+#   ebs_data.partitions/summaries.json               per-partition summary cache
+#
+# Only the partitions that are opened are loaded. Cross-partition statistics come
+# from the summary cache, which records each partition's file sizes and mtimes;
+# a partition whose files changed since then is loaded once to refresh it.
+DEFAULT_PROJECT = "default"
+SUMMARY_FILE = "summaries.json"
+# Files that come and go while a partition is open (temporary writes and SQLite's
+# WAL, shared-memory and rollback journal sidecars); they are not part of its signature
+TRANSIENT_SUFFIXES = (".tmp", "-wal", "-shm", "-journal")
+
+# "project/estimator" -> (project, estimator); a missing project is DEFAULT_PROJECT
+def parse_partition(text):
+    project, _, estimator = text.strip().partition("/")
+    return project.strip() or DEFAULT_PROJECT, estimator.strip()
+
+def partition_label(key):
+    return f"{key[0]}/{key[1]}"
+
+# File name part; "." is escaped too so the stem ends at the first dot
+def _quote(text):
+    return quote(text, safe="").replace(".", "%2E")
+
+# Counts and velocity statistics of one loaded partition, archived tasks included
+def summarize(repo):
+    archived = len(repo.archive) if repo.archive is not None else 0
+    return {
+        "tasks": len(repo) + archived,
+        "completed": len(repo) - len(repo.unfinished) + archived,
+        "unfinished": len(repo.unfinished),
+        "velocity": repo.velocity,
+        "stats": repo.stats.summary()
+    }
+
+# Velocity statistics of several partitions merged from their summaries
+def merge_stats(summaries):
+    stats = VelocityStats()
+    for summary in summaries:
+        stats.merge(VelocityStats.from_summary(summary["stats"]))
+    return stats
+
+class Workspace:
+    def __init__(self, path=DATA_FILE, mode=None):
+        self.directory = os.path.splitext(path)[0] + ".partitions"
+        self.summary_path = os.path.join(self.directory, SUMMARY_FILE)
+        self.mode = mode
+
+    def _stem(self, key):
+        return f"{_quote(key[0])}+{_quote(key[1])}"
+
+    def data_path(self, key):
+        return os.path.join(self.directory, self._stem(key) + ".json")
+
+    # Store for one partition (see ebs_storage.open_store); nothing is loaded yet
+    def open_store(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        return open_store(self.mode, self.data_path(key))
+
+    # {stem: [[file name, size, mtime], ...]} for every partition on disk
+    def _files(self):
+        files = {}
+        if not os.path.isdir(self.directory):
+            return files
+        for entry in os.scandir(self.directory):
+            stem, dot, _ = entry.name.partition(".")
+            if dot and "+" in stem and not entry.name.endswith(TRANSIENT_SUFFIXES):
+                stat = entry.stat()
+                files.setdefault(stem, []).append([entry.name, stat.st_size, stat.st_mtime_ns])
+        return {stem: sorted(entries) for stem, entries in files.items()}
+
+    def _signature(self, key):
+        return self._files().get(self._stem(key), [])
+
+    def partitions(self):
+        keys = []
+        for stem in self._files():
+            project, _, estimator = stem.partition("+")
+            keys.append((unquote(project), unquote(estimator)))
+        return sorted(keys)
+
+    def _read_cache(self):
+        try:
+            with open(self.summary_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, cache):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.summary_path, json.dumps(cache, indent=2, ensure_ascii=False))
+
+    # Record the summary of a loaded partition after its changes were written
+    def save_summary(self, key, repo):
+        cache = self._read_cache()
+        cache[partition_label(key)] = dict(summarize(repo), signature=self._signature(key))
+        self._write_cache(cache)
+
+    # {key: summary} for every partition. `live` maps keys of partitions that are
+    # loaded right now to their repositories, whose in-memory state is used as is.
+    def summaries(self, live=None):
+        live = live or {}
+        cache = self._read_cache()
+        files = self._files()
+        result = {}
+        stale = False
+        for key in sorted(set(self.partitions()) | set(live)):
+            label = partition_label(key)
+            if key in live:
+                result[key] = summarize(live[key])
+                continue
+            entry = cache.get(label)
+            if entry is None or entry["signature"] != files[self._stem(key)]:
+                store = self.open_store(key)
+                repo = open_repository(store)
+                load_archive(repo, store, self.data_path(key))
+                store.close(repo)
+                entry = cache[label] = dict(summarize(repo), signature=self._signature(key))
+                stale = True
+            result[key] = entry
+        if stale:
+            self._write_cache(cache)
+        return result
+
+    # Split tasks (e.g. an unpartitioned repository) into partitions of `project`
+    # by estimator. Fails before writing anything if a target partition already
+    # has a task of the same name. Returns {key: number of tasks}.
+    def split(self, tasks, project=DEFAULT_PROJECT):
+        groups = {}
+        for task in tasks:
+            groups.setdefault((project, task.estimator or ""), []).append(task)
+        opened = {}
+        for key, group in groups.items():
+            store = self.open_store(key)
+            repo = open_repository(store)
+            clashes = [task.name for task in group if task.name in repo]
+            opened[key] = (store, repo)
+            if clashes:
+                for store, repo in opened.values():
+                    store.close(repo)
+                raise ValueError(f"Partition {partition_label(key)} already has task '{clashes[0]}'")
+        for key, group in groups.items():
+            store, repo = opened[key]
+            for task in group:
+                repo.add(task)
+            store.apply(repo, [("put", task) for task in group])
+            store.close(repo)
+            self.save_summary(key, repo)
+        return {key: len(group) for key, group in groups.items()}
@@ -0,0 +1,158 @@
+import itertools
+import json
+import queue
+import socket
+import threading
+from ebs_model import TaskRepository
+from ebs_storage import replay_record
+
+# Client of the sync server (see ebs_server). A RemoteSession keeps one
+# connection open and offers the ebs_core task operations with the same
+# signatures, so the CLI and the GUI call `ops.record_time(repo, store, ...)`
+# whether they work on local files or on the server. Each call returns once the
+# server has saved the change, with the local repository updated from the
+# server's pushed events. Events caused by other clients are applied by
+# poll_changes(), which returns them so the caller can refresh what it shows.
+DEFAULT_PORT = 8765
+# Seconds to wait for the server to answer a request
+CALL_TIMEOUT = 30.0
+ERRORS = {"KeyError": KeyError, "ValueError": ValueError}
+
+# "host:port", "host" or ":port" -> (host, port)
+def parse_address(text):
+    host, colon, port = text.strip().rpartition(":")
+    if not colon:
+        host, port = port, ""
+    return host or "127.0.0.1", int(port) if port else DEFAULT_PORT
+
+class RemoteSession:
+    remote = True
+
+    def __init__(self, address, timeout=CALL_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.sock = socket.create_connection(address, timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.responses = queue.Queue()
+        self.events = queue.Queue()
+        self.errors = queue.Queue()
+        # Changes of other clients applied during our own calls, not reported yet
+        self.unreported = []
+        self.client = None
+        self.seq = 0
+        self.closing = False
+        self.thread = threading.Thread(target=self._read, name="ebs-remote", daemon=True)
+        self.thread.start()
+
+    # Reader thread: responses go to the waiting call, events are queued
+    def _read(self):
+        try:
+            with self.sock.makefile("rb") as f:
+                for line in f:
+                    message = json.loads(line)
+                    (self.events if "seq" in message else self.responses).put(message)
+        except (OSError, ValueError):
+            pass
+        self.responses.put(None)
+        if not self.closing:
+            self.errors.put(ConnectionError(f"lost the connection to the sync server {self.address[0]}:{self.address[1]}"))
+
+    # Send one request and wait for its answer; server-side KeyError/ValueError are re-raised
+    def call(self, op, *args):
+        with self.lock:
+            request_id = next(self.ids)
+            data = json.dumps({"id": request_id, "op": op, "args": list(args)}, ensure_ascii=False)
+            self.sock.sendall((data + "\n").encode("utf-8"))
+            while True:
+                try:
+                    response = self.responses.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"the sync server did not answer {op} within {self.timeout:g} s")
+                if response is None:
+                    self.responses.put(None)
+                    raise ConnectionError("not connected to the sync server")
+                if response.get("id") == request_id:
+                    break
+        if not response["ok"]:
+            raise ERRORS.get(response.get("type"), OSError)(response["error"])
+        return response.get("result")
+
+    def load_repository(self):
+        result = self.call("load")
+        self.client, self.seq = result["client"], result["seq"]
+        return TaskRepository.from_data(result)
+
+    def load(self):
+        return self.load_repository().to_data()
+
+    def _sync(self, repo):
+        while True:
+            try:
+                record = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if record["seq"] <= self.seq:
+                continue
+            self.seq = record["seq"]
+            replay_record(repo, record)
+            if record["origin"] != self.client:
+                self.unreported.append(record)
+
+    # Apply the changes pushed since the last call; returns those made by other clients
+    def poll_changes(self, repo):
+        self._sync(repo)
+        records, self.unreported = self.unreported, []
+        return records
+
+    def _run(self, repo, name, op, *args):
+        self.call(op, *args)
+        self._sync(repo)
+        return repo.get(name)
+
+    # Task operations, as in ebs_core; `store` is this session
+    def add_task(self, repo, store, name, hours, estimator=""):
+        return self._run(repo, name, "add_task", name, hours, estimator)
+
+    def record_time(self, repo, store, name, hours):
+        return self._run(repo, name, "record_time", name, hours)
+
+    def finish_task(self, repo, store, name):
+        return self._run(repo, name, "finish_task", name)
+
+    def delete_time_segment(self, repo, store, name, index):
+        return self._run(repo, name, "delete_time_segment", name, index)
+
+    def delete_task(self, repo, store, name):
+        task = repo.get(name)
+        self._run(repo, name, "delete_task", name)
+        return task
+
+    def modify_task(self, repo, store, name, new_name=None, estimated_hours=None):
+        return self._run(repo, new_name or name, "modify_task", name, new_name, estimated_hours)
+
+    # Store protocol, for ebs_transfer.import_file: new tasks already added to repo
+    def apply(self, repo, changes):
+        if any(change[0] != "put" for change in changes):
+            raise ValueError("Only new tasks can be sent to the sync server in a batch")
+        self.call("import_tasks", [change[1].to_dict() for change in changes])
+        self._sync(repo)
+
+    def poll_errors(self):
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def close(self, repo=None):
+        self.closing = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.thread.join()
@@ -0,0 +1,258 @@
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import ebs_core as core
+from ebs_archive import Archive
+from ebs_instrument import timed
+from ebs_storage import atomic_write
+from ebs_timeline import RECENT_DAYS
+
+# Headless velocity and estimation-error reports, for nightly runs over every
+# project. Each dataset gets <name>.html with its statistics (the same numbers as
+# the Analyze tab, from analyze_stats) and the error-distribution and
+# velocity-trend charts rendered with Agg as <name>.png / <name>.svg; index.html
+# links them all. Datasets are rendered in parallel on a process pool, and every
+# worker builds the chart figure once and reuses it for all its reports.
+
+# Points kept in the velocity trend after downsampling
+TREND_POINTS = 500
+# Estimate errors are binned over this range (%); values outside land in the end bins
+ERROR_RANGE = (-200.0, 100.0)
+ERROR_BINS = 30
+FORMATS = ("png", "svg")
+FIGURE_SIZE = (12, 4)
+DPI = 100
+
+# Largest-Triangle-Three-Buckets downsampling: keeps the first and last point and,
+# from each bucket in between, the point forming the largest triangle with the
+# previously kept point and the average of the next bucket. Preserves the visual
+# shape of a series with `threshold` points.
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return x[kept], y[kept]
+
+# Counts of estimate errors (%) in the ERROR_BINS bins over ERROR_RANGE
+def error_histogram(errors):
+    return np.histogram(np.clip(errors, *ERROR_RANGE), bins=ERROR_BINS, range=ERROR_RANGE)[0]
+
+# Statistics and chart series of one repository, archived tasks included
+def report_data(repo):
+    avg_velocity, completion_rate, estimated, actual, errors = core.analyze_stats(repo.stats)
+    estimated = np.asarray(estimated, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    stats = repo.stats
+    timeline = repo.timeline
+    recent = timeline.recent()
+    archived = len(repo.archive) if repo.archive is not None else 0
+    summary = {
+        "tasks": len(repo) + archived,
+        "completed": len(repo.completed) + archived,
+        "unfinished": len(repo.unfinished),
+        "archived": archived,
+        "velocity": avg_velocity,
+        "velocity_stdev": stats.variance ** 0.5,
+        "velocity_p10": stats.quantile(0.1),
+        "velocity_p50": stats.quantile(0.5),
+        "velocity_p90": stats.quantile(0.9),
+        "velocity_recent": recent["velocity"],
+        "completed_recent": recent["completed"],
+        "velocity_decayed": timeline.decayed_velocity(),
+        "completion_rate": completion_rate,
+        "mean_error_pct": sum(errors) / len(errors) if errors else 0.0,
+        "estimated_hours": float(estimated.sum()),
+        "actual_hours": float(actual.sum())
+    }
+    velocities = estimated / actual if len(actual) else np.empty(0)
+    return summary, error_histogram(np.asarray(errors, dtype=float)), velocities
+
+# Titles and axis labels of the two charts: error distribution title, x and y
+# label, then the same for the velocity trend
+REPORT_LABELS = ("Estimate error distribution (%)", "Error (%)", "Tasks",
+                 "Velocity trend", "Completed task", "Velocity")
+
+# Lay out the error histogram and velocity trend side by side on `figure`, for
+# both the reports and the Analyze window (which animates the artists to blit
+# them). Returns (error axes, trend axes, error bars, trend line, mean line); the
+# caller swaps its data into the artists.
+def chart_layout(figure, labels, animated=False):
+    error_title, error_x, error_y, trend_title, trend_x, trend_y = labels
+    error_ax, trend_ax = figure.subplots(1, 2)
+    edges = np.linspace(*ERROR_RANGE, ERROR_BINS + 1)
+    error_bars = error_ax.bar(edges[:-1], np.zeros(ERROR_BINS), width=np.diff(edges), align="edge", animated=animated)
+    error_ax.set_xlim(*ERROR_RANGE)
+    error_ax.set_ylim(0, 1)
+    error_ax.set_title(error_title)
+    error_ax.set_xlabel(error_x)
+    error_ax.set_ylabel(error_y)
+    error_ax.grid(True)
+    trend_line, = trend_ax.plot([], [], marker="o", markersize=3, animated=animated)
+    mean_line = trend_ax.axhline(1.0, color="gray", linestyle="--", animated=animated)
+    trend_ax.set_xlim(0, 1)
+    trend_ax.set_ylim(0, 2)
+    trend_ax.set_title(trend_title)
+    trend_ax.set_xlabel(trend_x)
+    trend_ax.set_ylabel(trend_y)
+    trend_ax.grid(True)
+    return error_ax, trend_ax, error_bars, trend_line, mean_line
+
+# The report chart: figure, axes and artists are created once per process and
+# every report only swaps in its data before saving
+class ReportFigure:
+    def __init__(self):
+        from matplotlib.figure import Figure
+        self.figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+        self.title = self.figure.suptitle("")
+        (self.error_ax, self.trend_ax, self.error_bars, self.trend_line,
+         self.mean_line) = chart_layout(self.figure, REPORT_LABELS)
+        self.figure.tight_layout(rect=(0, 0, 1, 0.94))
+
+    def render(self, title, counts, velocities, mean, paths):
+        self.title.set_text(title)
+        for bar, count in zip(self.error_bars, counts):
+            bar.set_height(count)
+        self.error_ax.set_ylim(0, max(counts.max(initial=0), 1) * 1.1)
+        x, y = lttb(np.arange(len(velocities), dtype=float), velocities, TREND_POINTS)
+        self.trend_line.set_data(x, y)
+        self.mean_line.set_ydata([mean, mean])
+        low, high = y.min(initial=mean), y.max(initial=mean)
+        pad = (high - low) * 0.1 or 0.5
+        self.trend_ax.set_xlim(0, max(len(velocities) - 1, 1))
+        self.trend_ax.set_ylim(low - pad, high + pad)
+        for path in paths:
+            self.figure.savefig(path)
+
+@lru_cache(maxsize=None)
+def figure_template():
+    return ReportFigure()
+
+def _number(value, fmt="{:.2f}"):
+    return "-" if value is None else fmt.format(value)
+
+ROWS = (
+    ("Tasks", "tasks", "{}"), ("Completed", "completed", "{}"), ("Unfinished", "unfinished", "{}"),
+    ("Archived", "archived", "{}"), ("Average velocity", "velocity", "{:.2f}"),
+    ("Velocity stdev", "velocity_stdev", "{:.2f}"), ("Velocity P10", "velocity_p10", "{:.2f}"),
+    ("Velocity P50", "velocity_p50", "{:.2f}"), ("Velocity P90", "velocity_p90", "{:.2f}"),
+    (f"Velocity, last {RECENT_DAYS} days", "velocity_recent", "{:.2f}"),
+    (f"Completed, last {RECENT_DAYS} days", "completed_recent", "{}"),
+    ("Decayed velocity", "velocity_decayed", "{:.2f}"), ("Completion rate", "completion_rate", "{:.1f}%"),
+    ("Mean estimate error", "mean_error_pct", "{:.1f}%"), ("Estimated hours (completed)", "estimated_hours", "{:.1f}"),
+    ("Actual hours (completed)", "actual_hours", "{:.1f}")
+)
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}} th:first-child,td:first-child{{text-align:left}}
+img{{max-width:100%}}</style></head>
+<body>
+{body}
+</body></html>
+"""
+
+def report_html(report):
+    rows = "\n".join(f"<tr><th>{html.escape(label)}</th><td>{_number(report[key], fmt)}</td></tr>"
+                     for label, key, fmt in ROWS)
+    chart = f'<img src="{html.escape(report["files"][0])}" alt="charts">' if report["files"] else ""
+    body = (f"<h1>{html.escape(report['label'])}</h1>\n<p>Generated {report['generated']} from "
+            f"{html.escape(report['path'])}</p>\n<table>\n{rows}\n</table>\n{chart}\n<p><a href=\"index.html\">All reports</a></p>")
+    return PAGE.format(title=html.escape(report["label"]), body=body)
+
+def index_html(reports):
+    rows = []
+    for report in reports:
+        if "error" in report:
+            rows.append(f"<tr><td>{html.escape(report['label'])}</td>"
+                        f"<td colspan=\"5\">error: {html.escape(report['error'])}</td></tr>")
+            continue
+        link = f'<a href="{html.escape(report["page"])}">{html.escape(report["label"])}</a>'
+        rows.append(f"<tr><td>{link}</td><td>{report['tasks']}</td><td>{report['unfinished']}</td>"
+                    f"<td>{_number(report['velocity'])}</td><td>{_number(report['velocity_recent'])}</td>"
+                    f"<td>{report['mean_error_pct']:.1f}%</td></tr>")
+    header = ("<tr><th>Dataset</th><th>Tasks</th><th>Unfinished</th><th>Velocity</th>"
+              f"<th>Velocity, last {RECENT_DAYS} days</th><th>Mean error</th></tr>")
+    body = (f"<h1>Velocity reports</h1>\n<p>Generated {datetime.now():%Y-%m-%d %H:%M}</p>\n"
+            f"<table>\n{header}\n" + "\n".join(rows) + "\n</table>")
+    return PAGE.format(title="Velocity reports", body=body)
+
+# File name for a dataset label
+def report_name(label):
+    return re.sub(r"[^\w.-]+", "_", label).strip("._") or "report"
+
+# Load one dataset and write its page and charts. Runs in a pool worker; a
+# dataset that cannot be read or rendered is reported instead of failing the
+# batch. The dataset's own files are only read (see open_store's read_only).
+@timed("report.write_report")
+def write_report(job):
+    label, name, path, storage, output_dir, formats = job
+    report = {"label": label, "path": path, "page": name + ".html",
+              "generated": datetime.now().strftime("%Y-%m-%d %H:%M"), "files": []}
+    try:
+        store = core.open_store(storage, path, read_only=True)
+        repo = core.open_repository(store)
+        repo.load_deferred()
+        store.close(repo)
+        archive = Archive.open(path)
+        if archive is not None:
+            repo.attach_archive(archive)
+    except (OSError, KeyError, ValueError) as e:
+        report["error"] = str(e)
+        return report
+    try:
+        summary, counts, velocities = report_data(repo)
+        files = [f"{name}.{fmt}" for fmt in formats]
+        figure_template().render(label, counts, velocities, summary["velocity"],
+                                 [os.path.join(output_dir, file) for file in files])
+        report.update(summary, files=files)
+        atomic_write(os.path.join(output_dir, report["page"]), report_html(report))
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+    return report
+
+# Reports for (label, data path) datasets in output_dir, rendered on a pool of
+# `workers` processes (default: one per CPU; 1 renders here). Returns the reports
+# in dataset order; failed ones have an "error".
+@timed("report.generate_reports")
+def generate_reports(datasets, output_dir, formats=("png",), storage=None, workers=None):
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown report format: {fmt}")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    names = set()
+    for label, path in datasets:
+        name = base = report_name(label)
+        suffix = 1
+        while name in names or name == "index":
+            suffix += 1
+            name = f"{base}-{suffix}"
+        names.add(name)
+        jobs.append((label, name, path, storage, output_dir, tuple(formats)))
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        reports = [write_report(job) for job in jobs]
+    else:
+        # Each worker keeps its figure template between the datasets it renders
+        with ProcessPoolExecutor(workers) as pool:
+            reports = list(pool.map(write_report, jobs))
+    atomic_write(os.path.join(output_dir, "index.html"), index_html(reports))
+    return reports
@@ -0,0 +1,309 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+from ebs_instrument import timed
+from ebs_simulation import DEFAULT_ESTIMATOR, PERCENTILES, TABLE_SIZE, collect_velocities, pooled_history, resample_table
+from ebs_storage import atomic_write
+
+# Milestone schedule: who works on which unfinished task in which order, and when
+# each milestone and each developer is done. The plan is kept next to the data
+# file (ebs_data.plan.json) and edited with `ebs plan` or by hand:
+#
+#   {"start": "2026-10-19",                                  (default: today)
+#    "milestones": [{"name": "alpha", "due": "2026-12-01"}, {"name": "beta"}],
+#    "developers": {"alice": {"hours_per_day": 6, "weekdays": [0, 1, 2, 3, 4], "days_off": ["2026-12-24"]}},
+#    "tasks": {"Login page": {"milestone": "alpha", "priority": 1, "assignee": "alice"}},
+#    "scenarios": {"bob leaves": {"developers": {"bob": null}},
+#                  "carol joins": {"developers": {"carol": {}}, "tasks": {"Search": {"assignee": "carol"}}}}}
+#
+# A task's assignee defaults to its estimator. Tasks are worked on by milestone
+# (in plan order, tasks without a milestone last), then by priority (lower first),
+# then in backlog order. Each developer works through their own tasks; tasks whose
+# assignee is not a developer of the plan are taken by whoever is free first.
+# Without any developers in the plan every assignee is one, with the default hours.
+DEFAULT_HOURS_PER_DAY = 6.0
+DEFAULT_WEEKDAYS = (0, 1, 2, 3, 4)
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DEFAULT_PRIORITY = 3
+BASELINE = "baseline"
+N_SCHEDULE_SIMULATIONS = 2000
+# Fewest trials per process-pool job; below this the per-task overhead dominates
+MIN_SHARD_SIMULATIONS = 250
+# Working calendars are precomputed this far ahead and extended linearly after it
+HORIZON_DAYS = 5 * 366
+# Tasks whose random draws are made in one block
+TASK_CHUNK = 128
+
+def plan_path(data_path):
+    return os.path.splitext(data_path)[0] + ".plan.json"
+
+def empty_plan():
+    return {"milestones": [], "developers": {}, "tasks": {}, "scenarios": {}}
+
+def load_plan(path):
+    if not os.path.exists(path):
+        return empty_plan()
+    with open(path, "r", encoding="utf-8") as f:
+        return dict(empty_plan(), **json.load(f))
+
+def save_plan(plan, path):
+    atomic_write(path, json.dumps(plan, indent=2, ensure_ascii=False))
+
+def parse_date(text, what="date"):
+    try:
+        return date.fromisoformat(text)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {what} {text!r} (use YYYY-MM-DD)")
+
+# "mon,tue,wed" -> [0, 1, 2]
+def parse_weekdays(text):
+    days = []
+    for name in text.lower().split(","):
+        if name.strip()[:3] not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday {name!r} (use {','.join(WEEKDAYS)})")
+        days.append(WEEKDAYS.index(name.strip()[:3]))
+    return sorted(set(days))
+
+# The plan with a scenario's overrides: its "developers" and "tasks" entries are
+# merged into the plan's (null removes one), other keys replace the plan's
+def scenario_plan(plan, name):
+    if name == BASELINE:
+        return plan
+    if name not in plan["scenarios"]:
+        raise KeyError(f"No scenario named '{name}'")
+    result = dict(plan)
+    for key, value in plan["scenarios"][name].items():
+        if key in ("developers", "tasks"):
+            merged = dict(plan.get(key, {}))
+            for entry, override in value.items():
+                if override is None:
+                    merged.pop(entry, None)
+                else:
+                    merged[entry] = dict(merged.get(entry, {}), **override)
+            result[key] = merged
+        else:
+            result[key] = value
+    return result
+
+# Cumulative working hours at the start of each day from `start`: cum[k] hours are
+# available before day k
+def _calendar(name, spec, start, horizon=HORIZON_DAYS):
+    hours = float(spec.get("hours_per_day", DEFAULT_HOURS_PER_DAY))
+    weekdays = spec.get("weekdays", DEFAULT_WEEKDAYS)
+    working = np.isin((start.weekday() + np.arange(horizon)) % 7, weekdays)
+    for day in spec.get("days_off", ()):
+        k = (parse_date(day, f"day off of '{name}'") - start).days
+        if 0 <= k < horizon:
+            working[k] = False
+    cum = np.concatenate([[0.0], np.cumsum(working * hours)])
+    if not cum[-1] > 0:
+        raise ValueError(f"Developer '{name}' has no working hours")
+    return cum
+
+# Working hours done -> fractional day on which they are reached (day k runs from
+# k to k + 1); past the horizon at the calendar's average rate
+def _finish_days(hours, cum):
+    k = np.searchsorted(cum, hours)
+    inside = np.minimum(k, len(cum) - 1)
+    low = cum[np.maximum(inside - 1, 0)]
+    span = cum[inside] - low
+    days = np.where(span > 0, inside - 1 + (hours - low) / np.where(span > 0, span, 1.0), 0.0)
+    horizon = len(cum) - 1
+    return np.where(k > horizon, horizon + (hours - cum[-1]) * (horizon / cum[-1]), days)
+
+# Day index of the working day a fractional finish day falls on
+def _day_index(days):
+    return np.maximum(np.ceil(days) - 1, 0)
+
+# Arrays describing one scenario, in the order the tasks are worked on
+def _problem(repo, plan, table_ids, pooled_id):
+    start = parse_date(plan["start"], "start date") if plan.get("start") else date.today()
+    entries = plan.get("tasks", {})
+    milestones = [m["name"] for m in plan.get("milestones", ())]
+    dues = {m["name"]: parse_date(m["due"], f"due date of '{m['name']}'") for m in plan.get("milestones", ()) if m.get("due")}
+    rows = []
+    for position, task in enumerate(repo.unfinished.values()):
+        entry = entries.get(task.name, {})
+        milestone = entry.get("milestone") or ""
+        if milestone and milestone not in milestones:
+            milestones.append(milestone)
+        try:
+            priority = float(entry.get("priority", DEFAULT_PRIORITY))
+        except (TypeError, ValueError):
+            raise ValueError(f"Task '{task.name}': priority must be a number")
+        rows.append((milestone, priority, position, entry.get("assignee") or task.estimator or "", task))
+    if any(row[0] == "" for row in rows):
+        milestones.append("")
+    rank = {name: i for i, name in enumerate(milestones)}
+    rows.sort(key=lambda row: (rank[row[0]], row[1], row[2]))
+    developers = plan.get("developers") or {row[3]: {} for row in rows}
+    names = list(developers)
+    index = {name: i for i, name in enumerate(names)}
+    if rows and not names:
+        raise ValueError("The plan has no developers")
+    return {
+        "start": start,
+        "milestones": milestones,
+        "developers": names,
+        "due": {rank[name]: (due - start).days for name, due in dues.items() if name in rank},
+        "calendars": [_calendar(name, developers[name], start) for name in names],
+        "estimates": np.array([row[4].estimated_hours for row in rows], dtype=np.float64),
+        "spent": np.array([row[4].actual_hours or 0.0 for row in rows], dtype=np.float64),
+        "tables": np.array([table_ids.get(row[4].estimator or DEFAULT_ESTIMATOR, pooled_id) for row in rows], dtype=np.int64),
+        "assignees": np.array([index.get(row[3], -1) for row in rows], dtype=np.int64),
+        "milestone_ids": np.array([rank[row[0]] for row in rows], dtype=np.int64)
+    }
+
+# Event simulation of n trials at once. Each trial keeps every developer's next
+# free time; a task goes to its assignee, or to the developer who is free first
+# (argmin over the developers, the trials' event queues side by side), and moves
+# that developer's free time on by its sampled duration on their calendar.
+# Calendar days are only worked out when they matter: before a task is handed to
+# whoever is free first, and at a developer's last task of each milestone.
+# Returns (milestone finish days, developer finish days), each (count, n).
+def _simulate_trials(problem, tables, n, seed):
+    rng = np.random.default_rng(seed)
+    calendars = problem["calendars"]
+    done = np.zeros((len(calendars), n))
+    free = np.zeros((len(calendars), n))
+    stale = set()
+    ship = np.zeros((len(problem["milestones"]), n))
+    trials = np.arange(n)
+    estimates, spent = problem["estimates"], problem["spent"]
+    table_ids, assignees, milestone_ids = problem["tables"], problem["assignees"], problem["milestone_ids"]
+    # The last task of each (milestone, assignee) pair decides when that part of the milestone is done
+    last = np.zeros(len(estimates), dtype=bool)
+    last[[max(group) for group in _pairs(milestone_ids, assignees).values()]] = True
+    for start in range(0, len(estimates), TASK_CHUNK):
+        stop = min(start + TASK_CHUNK, len(estimates))
+        raw = rng.integers(0, TABLE_SIZE, (stop - start, n), dtype=np.uint16)
+        block = tables[table_ids[start:stop, None], raw] * estimates[start:stop, None] - spent[start:stop, None]
+        np.maximum(block, 0.0, out=block)
+        for i in range(start, stop):
+            hours = block[i - start]
+            who = assignees[i]
+            if who >= 0:
+                done[who] += hours
+                stale.add(who)
+                if last[i]:
+                    free[who] = _finish_days(done[who], calendars[who])
+                    stale.discard(who)
+                    np.maximum(ship[milestone_ids[i]], free[who], out=ship[milestone_ids[i]])
+                continue
+            for d in stale:
+                free[d] = _finish_days(done[d], calendars[d])
+            stale.clear()
+            first = free.argmin(axis=0)
+            done[first, trials] += hours
+            for d in np.unique(first):
+                mask = first == d
+                free[d, mask] = _finish_days(done[d, mask], calendars[d])
+            np.maximum(ship[milestone_ids[i]], free[first, trials], out=ship[milestone_ids[i]])
+    for d in stale:
+        free[d] = _finish_days(done[d], calendars[d])
+    return ship, free
+
+# {(milestone, assignee): [task positions]} of the assigned tasks
+def _pairs(milestone_ids, assignees):
+    pairs = {}
+    for i, (m, who) in enumerate(zip(milestone_ids.tolist(), assignees.tolist())):
+        if who >= 0:
+            pairs.setdefault((m, who), []).append(i)
+    return pairs
+
+# Worker state, sent once per process instead of with every job
+_worker = {}
+
+def _init_worker(problems, tables):
+    _worker["problems"] = problems
+    _worker["tables"] = tables
+
+def _run_job(job):
+    scenario, n, seed = job
+    return _simulate_trials(_worker["problems"][scenario], _worker["tables"], n, seed)
+
+def _dates(days, start):
+    return {p: start + timedelta(days=int(v))
+            for p, v in zip(PERCENTILES, np.percentile(_day_index(days), PERCENTILES, method="higher"))}
+
+def _summary(name, problem, ship, free, n):
+    start = problem["start"]
+    milestones = []
+    for m, milestone in enumerate(problem["milestones"]):
+        tasks = problem["milestone_ids"] == m
+        entry = {
+            "name": milestone,
+            "tasks": int(tasks.sum()),
+            "hours": float(problem["estimates"][tasks].sum()),
+            "percentiles": _dates(ship[m], start),
+            "due": None,
+            "on_time": None
+        }
+        if m in problem["due"]:
+            entry["due"] = start + timedelta(days=problem["due"][m])
+            entry["on_time"] = float((_day_index(ship[m]) <= problem["due"][m]).mean())
+        milestones.append(entry)
+    developers = []
+    for d, developer in enumerate(problem["developers"]):
+        tasks = problem["assignees"] == d
+        if tasks.any() or free[d].any():
+            developers.append({
+                "name": developer,
+                "tasks": int(tasks.sum()),
+                "hours": float(problem["estimates"][tasks].sum()),
+                "percentiles": _dates(free[d], start)
+            })
+    return {
+        "scenario": name,
+        "start": start,
+        "simulations": n,
+        "milestones": milestones,
+        "developers": developers,
+        "unassigned": int((problem["assignees"] < 0).sum())
+    }
+
+# Ship-date distributions per milestone and per developer for each scenario
+# (see scenario_plan). The trials of all scenarios are split into one job per
+# worker that run on a process pool of `workers` processes (default: one per
+# CPU; 1 runs them here). window_days and half_life_days select the
+# velocity history as in ebs_simulation; each summary's window_fallback lists
+# the estimators that kept their whole history. Returns {scenario: summary}.
+@timed("schedule.schedule")
+def schedule(repo, plan, scenarios=(BASELINE,), n_simulations=N_SCHEDULE_SIMULATIONS, seed=None,
+             window_days=None, half_life_days=None, workers=None):
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    history, fallback = collect_velocities(repo, window_days, half_life_days)
+    estimators = sorted(history)
+    pooled = pooled_history(repo, history)
+    tables = np.stack([resample_table(history[e][0], rng, history[e][1]) for e in estimators]
+                      + [resample_table(pooled[0], rng, pooled[1])])
+    table_ids = {estimator: i for i, estimator in enumerate(estimators)}
+    problems = [_problem(repo, scenario_plan(plan, name), table_ids, len(estimators)) for name in scenarios]
+    workers = workers or os.cpu_count() or 1
+    # Split each scenario's trials so that every worker gets a share
+    shard = max(-(-n_simulations * len(problems) // workers), MIN_SHARD_SIMULATIONS)
+    jobs = []
+    for s in range(len(problems)):
+        for first in range(0, n_simulations, shard):
+            jobs.append((s, min(shard, n_simulations - first)))
+    jobs = [(s, n, job_seed) for (s, n), job_seed in zip(jobs, seeds.spawn(len(jobs)))]
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        _init_worker(problems, tables)
+        try:
+            results = [_run_job(job) for job in jobs]
+        finally:
+            _worker.clear()
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(problems, tables)) as pool:
+            results = list(pool.map(_run_job, jobs))
+    summaries = {}
+    for s, name in enumerate(scenarios):
+        parts = [result for job, result in zip(jobs, results) if job[0] == s]
+        ship = np.concatenate([part[0] for part in parts], axis=1)
+        free = np.concatenate([part[1] for part in parts], axis=1)
+        summaries[name] = dict(_summary(name, problems[s], ship, free, n_simulations), window_fallback=fallback)
+    return summaries
@@ -0,0 +1,74 @@
+# Longest substrings indexed per name
+GRAM = 3
+
+# N-gram index over task names for case-insensitive substring search. Every
+# substring of up to GRAM characters has a posting set of the names containing
+# it, so a query of up to GRAM characters is one lookup; a longer one only checks
+# the names that contain every trigram of the query.
+class NameIndex:
+    def __init__(self, names=()):
+        # name -> (sequence number, lowercased name); dict order is display order
+        self.names = {}
+        self.grams = {}
+        self.next_seq = 0
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @staticmethod
+    def _trigrams(lowered):
+        return {lowered[i:i + GRAM] for i in range(len(lowered) - GRAM + 1)}
+
+    @staticmethod
+    def _grams(lowered):
+        return {lowered[i:i + n] for n in range(1, GRAM + 1) for i in range(len(lowered) - n + 1)}
+
+    def _index(self, name, lowered):
+        for gram in self._grams(lowered):
+            self.grams.setdefault(gram, set()).add(name)
+
+    def _unindex(self, name, lowered):
+        for gram in self._grams(lowered):
+            postings = self.grams[gram]
+            postings.discard(name)
+            if not postings:
+                del self.grams[gram]
+
+    def add(self, name):
+        lowered = name.lower()
+        self.names[name] = (self.next_seq, lowered)
+        self.next_seq += 1
+        self._index(name, lowered)
+
+    def remove(self, name):
+        seq, lowered = self.names.pop(name)
+        self._unindex(name, lowered)
+
+    # The renamed entry keeps its place in the display order
+    def rename(self, old_name, new_name):
+        seq, lowered = self.names[old_name]
+        self._unindex(old_name, lowered)
+        new_lowered = new_name.lower()
+        self.names = {new_name if name == old_name else name: (seq, new_lowered) if name == old_name else entry
+                      for name, entry in self.names.items()}
+        self._index(new_name, new_lowered)
+
+    # Names containing text, in display order
+    def search(self, text):
+        query = text.lower()
+        if not query:
+            return list(self.names)
+        if len(query) <= GRAM:
+            return self._ordered(self.grams.get(query, set()))
+        postings = sorted((self.grams.get(gram, set()) for gram in self._trigrams(query)), key=len)
+        candidates = set.intersection(*postings) if postings[0] else set()
+        return self._ordered({name for name in candidates if query in self.names[name][1]})
+
+    # Matches in display order: sorted by sequence number, or picked out of the
+    # names in order when they are a large share of them (e.g. a one-letter query)
+    def _ordered(self, matches):
+        if len(matches) * 8 > len(self.names):
+            return [name for name in self.names if name in matches]
+        return sorted(matches, key=lambda name: self.names[name][0])
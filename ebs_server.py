@@ -0,0 +1,366 @@
+import asyncio
+import json
+import math
+import signal
+import ebs_core as core
+import ebs_instrument as instrument
+from ebs_model import Task
+from ebs_storage import change_record
+from ebs_writer import Shadow, TaskSnapshot, coalesce
+
+# Sync server: one process owns the dataset and the team's GUI and CLI clients
+# (see ebs_remote) send it task operations instead of writing the data file
+# themselves. The protocol is one JSON object per line over TCP:
+#
+#   request   {"id": 7, "op": "record_time", "args": ["Login page", 2.5]}
+#   response  {"id": 7, "ok": true} or {"id": 7, "ok": false, "type": "KeyError", "error": "..."}
+#   event     {"op": "put", "task": {...}, "seq": 42, "origin": 3}   (also "delete" / "rename")
+#   event     {"op": "segment_add", "name": "Login page", "hours": 2.5, ..., "seq": 43, "origin": 3}
+#
+# Operations run one at a time on the event loop through the ebs_core functions,
+# so they are checked against the current state and never overwrite each other.
+# Their changes are committed in batches: one store.apply() (one fsync for the
+# journal) for everything that arrived within COMMIT_DELAY, while the next batch
+# collects. Once a batch is saved its changes are pushed to every client as
+# journal records (see ebs_storage) numbered by `seq`, and then the requests in it
+# are answered, so a client has its own changes applied when its call returns.
+# Recording time, deleting a segment and finishing a task are pushed as
+# segment-level records; the store is still given the whole task.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Seconds a batch waits for more changes, and between retries of a failed commit
+COMMIT_DELAY = 0.002
+RETRY_DELAY = 1.0
+# Longest request line (a bulk import is one line), and the unsent bytes a client
+# may fall behind by before it is disconnected
+MAX_MESSAGE = 1 << 28
+MAX_BACKLOG = 1 << 26
+
+# Operations clients may run: name -> ebs_core function taking (repo, store, *args)
+OPERATIONS = {
+    "add_task": core.add_task,
+    "record_time": core.record_time,
+    "finish_task": core.finish_task,
+    "delete_time_segment": core.delete_time_segment,
+    "delete_task": core.delete_task,
+    "modify_task": core.modify_task
+}
+
+# Argument types of every operation, as (required, optional): a request is
+# checked against them before it runs. bool is not taken for a number, and None
+# only where the ebs_core default is None.
+NAME = (str,)
+HOURS = (int, float)
+INDEX = (int,)
+NONE = (type(None),)
+SIGNATURES = {
+    "add_task": ((NAME, HOURS), (NAME,)),
+    "record_time": ((NAME, HOURS), ()),
+    "finish_task": ((NAME,), ()),
+    "delete_time_segment": ((NAME, INDEX), ()),
+    "delete_task": ((NAME,), ()),
+    "modify_task": ((NAME,), (NAME + NONE, HOURS + NONE)),
+    "import_tasks": (((list,),), ())
+}
+
+def _line(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+# Segment-level event (see ebs_storage.change_record) for the put of an operation
+# that only adds or deletes a segment or finishes the task; None for the others
+def _event(operation, task):
+    op, args = operation or (None, ())
+    if op == "record_time":
+        return ("segment_add", task.name, task.hours[-1], task.timestamps[-1], task.end_time)
+    if op == "delete_time_segment":
+        return ("segment_delete", task.name, args[1], task.end_time)
+    if op == "finish_task":
+        return ("finish", task.name, task.end_time)
+    return None
+
+# Serialize the puts that still hold a live task, under the name they were made
+# with. A put that coalesce() will replace by a later put of the same task gets a
+# stand-in instead, so a burst of operations on one task costs one to_dict().
+def _snapshots(changes):
+    names = [(change[2] if len(change) == 3 else change[1]["name"]) if change[0] == "put" else None
+             for change in changes]
+    replaced = set()
+    later = set()
+    for i in range(len(changes) - 1, -1, -1):
+        if names[i] is None:
+            later.difference_update(changes[i][1:])
+        elif names[i] in later:
+            replaced.add(i)
+        else:
+            later.add(names[i])
+    result = []
+    for i, change in enumerate(changes):
+        if change[0] == "put" and len(change) == 3:
+            snapshot = {"name": names[i]} if i in replaced else dict(change[1].to_dict(), name=names[i])
+            change = ("put", TaskSnapshot(snapshot))
+        result.append(change)
+    return result
+
+# ValueError unless `args` suit operation `op` (see SIGNATURES)
+def _check_args(op, args):
+    required, optional = SIGNATURES[op]
+    if not isinstance(args, list) or not len(required) <= len(args) <= len(required) + len(optional):
+        count = len(required) if not optional else f"{len(required)} to {len(required) + len(optional)}"
+        raise ValueError(f"{op} takes {count} arguments")
+    for number, (arg, types) in enumerate(zip(args, required + optional), 1):
+        if isinstance(arg, bool) or not isinstance(arg, types):
+            expected = " or ".join("null" if t is type(None) else t.__name__ for t in types)
+            raise ValueError(f"{op}: argument {number} must be {expected}, not {type(arg).__name__}")
+        if isinstance(arg, float) and not math.isfinite(arg):
+            raise ValueError(f"{op}: argument {number} must be a finite number")
+
+def _positive(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and 0 < value < math.inf
+
+def _error(request_id, e):
+    return {"id": request_id, "ok": False, "type": type(e).__name__, "error": str(e.args[0] if e.args else e)}
+
+class _Connection:
+    def __init__(self, number, writer):
+        self.number = number
+        self.writer = writer
+
+    # A client that stops reading is dropped instead of buffering events forever
+    def send(self, data):
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            self.writer.close()
+            return
+        self.writer.write(data)
+
+# Owns a store and its TaskRepository. Acts as the store of the ebs_core
+# operations it runs, collecting their changes for the next commit.
+class SyncServer:
+    def __init__(self, store, repo=None, commit_delay=COMMIT_DELAY):
+        self.store = store
+        self.repo = repo if repo is not None else core.open_repository(store)
+        # Stores that persist from their own files only need the velocity (see ebs_writer)
+        self.shadow = Shadow({"tasks": [], "velocity": self.repo.velocity} if hasattr(store, "load_repository")
+                             else self.repo.to_data())
+        self.commit_delay = commit_delay
+        self.connections = set()
+        self.next_connection = 0
+        # Last change number handed out; clients skip events they already have
+        self.seq = 0
+        self.origin = None
+        # (operation name, args) being run, which decides the event pushed for a put
+        self.operation = None
+        # (seq, change, origin, event) not committed yet, and the requests waiting for them
+        self.pending = []
+        self.waiters = []
+        self.failed = []
+        self.wakeup = None
+        self.server = None
+
+    # A put pushed as a segment-level event keeps the live task and is serialized
+    # when its batch is committed (see _snapshots); other puts are pushed whole
+    # and serialized now
+    def put_task(self, repo, task):
+        event = _event(self.operation, task)
+        if event is None:
+            self._change(("put", TaskSnapshot(task.to_dict())))
+        else:
+            self._change(("put", task, task.name), event)
+
+    def delete_task(self, repo, name):
+        self._change(("delete", name))
+
+    def rename_task(self, repo, old_name, new_name):
+        self._change(("rename", old_name, new_name))
+
+    # `event` is what the clients are sent instead of the change, if anything
+    def _change(self, change, event=None):
+        self.seq += 1
+        self.pending.append((self.seq, change, self.origin, event or change))
+        self.wakeup.set()
+
+    # Resolves once the changes made so far are saved (or raises why they were not)
+    def _committed(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.wakeup.set()
+        return waiter
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.failed:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), RETRY_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await self.wakeup.wait()
+            # Let the requests that arrive meanwhile join this batch
+            await asyncio.sleep(self.commit_delay)
+            self.wakeup.clear()
+            pending, waiters = self.pending, self.waiters
+            self.pending, self.waiters = [], []
+            changes = _snapshots([change for seq, change, origin, event in pending])
+            for change in changes:
+                self.shadow.apply(change)
+            self.shadow.velocity = self.repo.velocity
+            batch = coalesce(self.failed + changes)
+            error = None
+            if batch:
+                instrument.count("server.changes", len(pending))
+                instrument.count("server.batched_changes", len(batch))
+                try:
+                    await loop.run_in_executor(None, self.store.apply, self.shadow, batch)
+                    self.failed = []
+                except Exception as e:
+                    # The changes stay in memory and are retried with the next commit
+                    self.failed = batch
+                    error = OSError(f"not saved yet, the server will retry: {e}")
+            self._broadcast(pending)
+            for waiter in waiters:
+                if not waiter.done():
+                    if error is None:
+                        waiter.set_result(None)
+                    else:
+                        waiter.set_exception(error)
+
+    # Push the changes of a batch to every client, encoded once for all of them
+    def _broadcast(self, pending):
+        if not pending:
+            return
+        lines = []
+        for seq, change, origin, event in pending:
+            record = change_record(event)
+            record["seq"] = seq
+            record["origin"] = origin
+            lines.append(_line(record))
+        data = b"".join(lines)
+        for connection in list(self.connections):
+            connection.send(data)
+        instrument.count("server.events_sent", len(pending) * len(self.connections))
+
+    async def _handle(self, connection, request):
+        request_id = request.get("id")
+        op = request.get("op")
+        args = request.get("args", [])
+        if op == "load":
+            # Events up to `seq` are already included
+            data = self.repo.to_data()
+            return {"id": request_id, "ok": True,
+                    "result": dict(data, client=connection.number, seq=self.seq)}
+        if op == "ping":
+            return {"id": request_id, "ok": True}
+        try:
+            if not isinstance(op, str) or op not in SIGNATURES:
+                raise ValueError(f"Unknown operation {op!r}")
+            _check_args(op, args)
+        except ValueError as e:
+            return _error(request_id, e)
+        try:
+            self.origin = connection.number
+            self.operation = (op, args)
+            if op == "import_tasks":
+                self._import(args[0])
+            else:
+                OPERATIONS[op](self.repo, self, *args)
+        except Exception as e:
+            # Answered as an error whatever went wrong, so the connection stays up
+            return _error(request_id, e)
+        finally:
+            self.origin = self.operation = None
+        try:
+            await self._committed()
+        except OSError as e:
+            return _error(request_id, e)
+        return {"id": request_id, "ok": True}
+
+    # New tasks as one all-or-nothing batch (see ebs_transfer.import_file)
+    def _import(self, dicts):
+        tasks = []
+        names = set()
+        for d in dicts:
+            if not isinstance(d, dict) or not isinstance(d.get("name"), str) or not d["name"]:
+                raise ValueError("invalid task: a task must be an object with a name")
+            try:
+                task = Task.from_dict(d)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"invalid task: {e}")
+            if not _positive(task.estimated_hours) or not all(_positive(hours) for hours in task.hours):
+                raise ValueError(f"invalid task '{task.name}': hours must be numbers greater than 0")
+            if task.name in self.repo or self.repo.is_archived(task.name) or task.name in names:
+                raise ValueError(f"Task '{task.name}' already exists")
+            names.add(task.name)
+            tasks.append(task)
+        for task in tasks:
+            self.repo.add(task)
+            self.put_task(self.repo, task)
+
+    # Requests of one client are handled in order; different clients interleave
+    async def _serve_client(self, reader, writer):
+        self.next_connection += 1
+        connection = _Connection(self.next_connection, writer)
+        self.connections.add(connection)
+        instrument.count("server.connections")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be an object")
+                except ValueError as e:
+                    connection.send(_line(_error(None, ValueError(f"invalid request: {e}"))))
+                    continue
+                connection.send(_line(await self._handle(connection, request)))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.wakeup = asyncio.Event()
+        self.committer = asyncio.ensure_future(self._commit_loop())
+        self.server = await asyncio.start_server(self._serve_client, host, port, limit=MAX_MESSAGE)
+        return self.server.sockets[0].getsockname()[:2]
+
+    # Stop accepting clients, save what is pending and close the store
+    async def stop(self):
+        self.server.close()
+        for connection in list(self.connections):
+            connection.writer.close()
+        await self.server.wait_closed()
+        if self.pending or self.failed:
+            try:
+                await self._committed()
+            except OSError:
+                pass
+        self.committer.cancel()
+        self.store.close(self.shadow)
+
+# Run a server until SIGINT / SIGTERM; `ready` is called with the (host, port) it listens on
+def serve(store, repo=None, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    async def run():
+        stopped = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signum, stopped.set)
+            except (NotImplementedError, RuntimeError):
+                # No signal handlers on Windows; Ctrl+C still cancels run()
+                pass
+        server = SyncServer(store, repo)
+        address = await server.start(host, port)
+        if ready is not None:
+            ready(address)
+        try:
+            await stopped.wait()
+        finally:
+            await server.stop()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,217 @@
+import bisect
+import time
+import weakref
+import numpy as np
+from ebs_instrument import timed
+from ebs_timeline import DAY_SECONDS, completion_time
+
+# Monte Carlo settings
+N_SIMULATIONS = 10000
+PERCENTILES = (50, 80, 95)
+HISTOGRAM_BINS = 40
+# Tasks resampled per batch; keeps each (simulations x tasks) block cache-sized
+TASK_CHUNK = 128
+# Resampling draws 16-bit indices into a lookup table of inverse velocities
+TABLE_SIZE = 1 << 16
+DEFAULT_ESTIMATOR = ""
+
+# Estimators with fewer completions than this inside the window keep their whole history
+MIN_WINDOW_SAMPLES = 5
+# The tasks of a group whose variances are spread over the equivalent of at
+# least this many equal shares, (sum v)^2 / sum v^2 over the per-task variances
+# v, have their sum drawn from a normal distribution (central limit theorem)
+# instead of being resampled one by one (see _simulate_group)
+CLT_MIN_TASKS = 30
+
+# Velocity index of each repository with the stats version it was built at
+_indexes = weakref.WeakKeyDictionary()
+
+# Velocity (estimated / actual) of every completed task, archived ones included
+# (see ebs_archive), per estimator and sorted by completion time, as
+# {estimator: (completion times, velocities)}. Built once per version of the
+# repository's statistics, so windows are selected by bisecting the times.
+def velocity_index(repo):
+    cached = _indexes.get(repo)
+    if cached is not None and cached[0] == repo.stats.version:
+        return cached[1]
+    history = {}
+    if repo.archive is not None:
+        for estimator, estimated, actual, velocity, t in repo.archive.rows:
+            history.setdefault(estimator or DEFAULT_ESTIMATOR, []).append((t, velocity))
+    for task in repo.completed.values():
+        if task.hours and task.actual_hours:
+            estimator = task.estimator or DEFAULT_ESTIMATOR
+            history.setdefault(estimator, []).append((completion_time(task), task.estimated_hours / task.actual_hours))
+    index = {}
+    for estimator, rows in history.items():
+        rows.sort()
+        times, velocities = np.asarray(rows).T
+        index[estimator] = (times, velocities)
+    _indexes[repo] = (repo.stats.version, index)
+    return index
+
+# Velocity history by estimator, as ({estimator: (velocities, weights)},
+# fallback). With window_days only tasks completed in that many days before now
+# are used; estimators with fewer than MIN_WINDOW_SAMPLES completions in the
+# window keep their whole history and are listed in fallback. With
+# half_life_days every velocity is weighted by 2 ** (-age / half-life) (ages are
+# taken from the latest completion; only the ratios matter). weights is None
+# when uniform.
+def collect_velocities(repo, window_days=None, half_life_days=None, now=None):
+    index = velocity_index(repo)
+    if not index:
+        return {}, []
+    now = time.time() if now is None else now
+    latest = max(times[-1] for times, _ in index.values())
+    result = {}
+    fallback = []
+    for estimator, (times, velocities) in index.items():
+        first = 0
+        if window_days is not None:
+            first = bisect.bisect_left(times, now - window_days * DAY_SECONDS)
+            if first and len(times) - first < MIN_WINDOW_SAMPLES:
+                fallback.append(estimator)
+                first = 0
+        weights = None
+        if half_life_days is not None:
+            weights = np.exp2((times[first:] - latest) / (half_life_days * DAY_SECONDS))
+        result[estimator] = (velocities[first:], weights)
+    return result, sorted(fallback)
+
+# Everyone's history together, for estimators without their own; the repository
+# velocity when nothing is completed yet
+def pooled_history(repo, history):
+    if not history:
+        return np.array([repo.velocity]), None
+    velocities, weights = zip(*history.values())
+    return np.concatenate(velocities), None if weights[0] is None else np.concatenate(weights)
+
+# Build a TABLE_SIZE lookup table so a uniform 16-bit index resamples the history.
+# Every velocity gets TABLE_SIZE // k slots and the leftover slots are dealt out at
+# random, so each velocity is drawn with probability exactly 1/k in expectation.
+# With weights the slots are shared out in proportion to the weights instead.
+def resample_table(velocities, rng, weights=None):
+    inverse = (1.0 / velocities).astype(np.float32)
+    k = len(inverse)
+    if weights is None:
+        slots = np.concatenate([
+            np.repeat(np.arange(k), TABLE_SIZE // k),
+            rng.integers(0, k, TABLE_SIZE % k if k <= TABLE_SIZE else TABLE_SIZE)
+        ])
+    else:
+        share = weights / weights.sum() * TABLE_SIZE
+        whole = np.floor(share).astype(np.int64)
+        slots = np.repeat(np.arange(k), whole)
+        leftover = TABLE_SIZE - len(slots)
+        if leftover:
+            fraction = share - whole
+            slots = np.concatenate([slots, rng.choice(k, leftover, p=fraction / fraction.sum())])
+    return inverse[slots]
+
+# Exact per-task means and variances of the hours left on a group's tasks when
+# each task's inverse velocity is drawn from the history. A started task counts
+# max(estimate / velocity - spent, 0), so its moments only take the inverse
+# velocities above spent / estimate; tail sums over the sorted history give
+# them for all tasks with one searchsorted.
+def _group_moments(estimates, spent, velocities, weights=None):
+    inverse = 1.0 / velocities
+    p = np.full(len(inverse), 1.0 / len(inverse)) if weights is None else weights / weights.sum()
+    order = np.argsort(inverse)
+    inverse, p = inverse[order], p[order]
+    tails = np.zeros((3, len(inverse) + 1))
+    tails[:, :-1] = np.cumsum(np.stack((p, p * inverse, p * inverse * inverse))[:, ::-1], axis=1)[:, ::-1]
+    n, s1, s2 = tails[:, np.searchsorted(inverse, spent / estimates, side="right")]
+    mean = estimates * s1 - spent * n
+    second = estimates * estimates * s2 - 2 * estimates * spent * s1 + spent * spent * n
+    return mean, np.maximum(second - mean * mean, 0.0)
+
+# Simulated hours for one estimator's tasks: a (n_simulations,) array. The
+# largest set of low-variance tasks that passes CLT_MIN_TASKS is drawn as one
+# normal sum; the rest, which could dominate it, are resampled.
+def _simulate_group(estimates, spent, velocities, n_simulations, rng, weights=None):
+    totals = np.zeros(n_simulations)
+    if len(velocities) == 1:
+        # No spread in the history, so every simulation gives the same answer
+        totals += np.maximum(estimates / velocities[0] - spent, 0).sum()
+        return totals
+    if len(estimates) >= CLT_MIN_TASKS:
+        means, variances = _group_moments(estimates, spent, velocities, weights)
+        order = np.argsort(variances)
+        v = variances[order]
+        spread = np.cumsum(v) ** 2 >= CLT_MIN_TASKS * np.cumsum(v * v)
+        k = len(spread) - int(spread[::-1].argmax()) if spread.any() else 0
+        if k:
+            normal, order = order[:k], order[k:]
+            totals += rng.normal(means[normal].sum(), v[:k].sum() ** 0.5, n_simulations)
+            estimates, spent = estimates[order], spent[order]
+    if len(estimates):
+        totals += _resample_group(estimates, spent, velocities, n_simulations, rng, weights)
+    return totals
+
+# Resample every task's inverse velocity: a (n_simulations,) array of totals
+def _resample_group(estimates, spent, velocities, n_simulations, rng, weights=None):
+    totals = np.zeros(n_simulations)
+    table = resample_table(velocities, rng, weights)
+    bit_generator = rng.bit_generator
+    fresh = spent <= 0
+    # Untouched tasks reduce to one matrix-vector product per chunk
+    for chunk_estimates, chunk_spent in ((estimates[fresh], None), (estimates[~fresh], spent[~fresh])):
+        chunk_estimates = chunk_estimates.astype(np.float32)
+        buffer = np.empty(n_simulations * TASK_CHUNK, dtype=np.float32)
+        for start in range(0, len(chunk_estimates), TASK_CHUNK):
+            size = min(TASK_CHUNK, len(chunk_estimates) - start)
+            cells = n_simulations * size
+            raw = bit_generator.random_raw((cells + 3) // 4).view(np.uint16)[:cells].reshape(n_simulations, size)
+            # A contiguous output block keeps take() on its fast path
+            inverse = np.take(table, raw, out=buffer[:cells].reshape(n_simulations, size), mode="clip")
+            if chunk_spent is None:
+                totals += inverse @ chunk_estimates[start:start + size]
+            else:
+                # Started tasks only count the hours still left after what is logged
+                hours = inverse * chunk_estimates[start:start + size] - chunk_spent[start:start + size]
+                totals += np.maximum(hours, 0).sum(axis=1)
+    return totals
+
+# Summarize simulated totals into percentiles and a completion-time histogram.
+# window_fallback lists the estimators whose whole history was used (see
+# collect_velocities).
+def summarize(totals, window_fallback=()):
+    counts, edges = np.histogram(totals, bins=HISTOGRAM_BINS)
+    return {
+        "simulations": len(totals),
+        "window_fallback": list(window_fallback),
+        "mean": float(totals.mean()),
+        "percentiles": {p: float(v) for p, v in zip(PERCENTILES, np.percentile(totals, PERCENTILES))},
+        "counts": counts,
+        "edges": edges,
+        "totals": totals
+    }
+
+# Resample each estimator's velocity history over the given tasks.
+# tasks is an iterable of (estimator, estimated_hours, spent_hours); window_days
+# and half_life_days select recent history (see collect_velocities).
+@timed("simulation.simulate")
+def simulate(repo, tasks, n_simulations=N_SIMULATIONS, seed=None, window_days=None, half_life_days=None):
+    rng = np.random.default_rng(seed)
+    history, fallback = collect_velocities(repo, window_days, half_life_days)
+    pooled = pooled_history(repo, history)
+    groups = {}
+    for estimator, estimated, spent in tasks:
+        groups.setdefault(estimator or DEFAULT_ESTIMATOR, []).append((estimated, spent))
+    totals = np.zeros(n_simulations)
+    for estimator, rows in groups.items():
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+        # Estimators without their own history borrow everyone's
+        velocities, weights = history.get(estimator, pooled)
+        totals += _simulate_group(rows[:, 0], rows[:, 1], velocities, n_simulations, rng, weights)
+    return summarize(totals, fallback)
+
+# Remaining-time distribution for every unfinished task
+def simulate_unfinished(repo, n_simulations=N_SIMULATIONS, seed=None, window_days=None, half_life_days=None):
+    tasks = ((task.estimator, task.estimated_hours, task.actual_hours or 0) for task in repo.unfinished.values())
+    return simulate(repo, tasks, n_simulations, seed, window_days, half_life_days)
+
+# Distribution for a single block of estimated hours
+def simulate_hours(repo, hours, estimator=None, n_simulations=N_SIMULATIONS, seed=None,
+                   window_days=None, half_life_days=None):
+    return simulate(repo, [(estimator, hours, 0.0)], n_simulations, seed, window_days, half_life_days)
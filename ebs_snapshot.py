@@ -0,0 +1,198 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+import ebs_instrument as instrument
+from ebs_model import Task
+from ebs_stats import VelocityStats
+
+# Columnar binary snapshot of all tasks. Per-task and per-segment fields are
+# stored as contiguous typed arrays and names in a string table, so a snapshot is
+# memory-mapped and read column by column instead of parsed:
+#
+#   header      magic, version, byte order, task/segment/string counts,
+#               string blob size, velocity
+#   task        estimated, actual, start, end (f8; NaN = none), name, estimator
+#               (u4 string ids), flags (u1; bit 0 = completed), segment start (u8, n+1)
+#   segment     hours, timestamp (f8, epoch seconds)
+#   strings     offsets (u8, k+1) into a UTF-8 blob; string 0 is ""
+#
+# Every array starts on an 8-byte boundary. Arrays use the native byte order,
+# which is recorded in the header and checked on load.
+MAGIC = b"EBSSNAP\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHc5xQQQQd")
+COMPLETED = 1
+NAN = float("nan")
+
+TASK_COLUMNS = (("estimated", "d"), ("actual", "d"), ("start", "d"), ("end", "d"),
+                ("name", "I"), ("estimator", "I"), ("flags", "B"))
+SEGMENT_COLUMNS = (("hours", "d"), ("timestamp", "d"))
+
+def _padding(size):
+    return -size % 8
+
+# Columns in file order with their lengths for the given counts
+def _layout(n_tasks, n_segments, n_strings, blob_size):
+    return ([(name, code, n_tasks) for name, code in TASK_COLUMNS]
+            + [("segment_start", "Q", n_tasks + 1)]
+            + [(name, code, n_segments) for name, code in SEGMENT_COLUMNS]
+            + [("string_offsets", "Q", n_strings + 1), ("blob", "B", blob_size)])
+
+# Write tasks (Task records, see ebs_model) as a snapshot. The file is written
+# next to the target and renamed over it; `source`, the snapshot the tasks are
+# read from, if any, is closed first so its mapping does not block the rename.
+def write_snapshot(path, tasks, velocity, source=None):
+    columns = {name: array(code) for name, code in TASK_COLUMNS + SEGMENT_COLUMNS}
+    segment_start = array("Q", [0])
+    strings = {"": 0}
+    for task in tasks:
+        columns["estimated"].append(task.estimated_hours)
+        columns["actual"].append(NAN if task.actual_hours is None else task.actual_hours)
+        columns["start"].append(task.start_time)
+        columns["end"].append(NAN if task.end_time is None else task.end_time)
+        columns["name"].append(strings.setdefault(task.name, len(strings)))
+        columns["estimator"].append(strings.setdefault(task.estimator or "", len(strings)))
+        columns["flags"].append(COMPLETED if task.completed else 0)
+        columns["hours"].extend(task.hours)
+        columns["timestamp"].extend(task.timestamps)
+        segment_start.append(len(columns["hours"]))
+    columns["segment_start"] = segment_start
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("Q", [0])
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    columns["string_offsets"] = offsets
+    columns["blob"] = b"".join(encoded)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sys.byteorder[0].encode(), len(columns["estimated"]),
+                            len(columns["hours"]), len(strings), offsets[-1], velocity))
+        f.write(b"\0" * _padding(HEADER.size))
+        for name, code, length in _layout(len(columns["estimated"]), len(columns["hours"]), len(strings), offsets[-1]):
+            data = columns[name]
+            f.write(data)
+            f.write(b"\0" * _padding(len(data) * (data.itemsize if isinstance(data, array) else 1)))
+        f.flush()
+        os.fsync(f.fileno())
+        if instrument.enabled:
+            instrument.count("bytes_written.snapshot", f.tell())
+    if source is not None:
+        source.close()
+    os.replace(tmp_path, path)
+
+# A memory-mapped snapshot. Columns are memoryviews over the mapping; nothing is
+# copied until a task is materialized with task(i) or tasks().
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+        self.columns = {}
+        self.raw = {}
+        magic, version, byteorder, self.n_tasks, self.n_segments, n_strings, blob_size, self.velocity = \
+            HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not an EBS snapshot (version {VERSION})")
+        if byteorder != sys.byteorder[0].encode():
+            self.close()
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+        offset = HEADER.size + _padding(HEADER.size)
+        for name, code, length in _layout(self.n_tasks, self.n_segments, n_strings, blob_size):
+            size = length * struct.calcsize(code)
+            self.raw[name] = self.buffer[offset:offset + size]
+            self.columns[name] = self.raw[name].cast(code)
+            offset += size + _padding(size)
+
+    def close(self):
+        if self.mmap.closed:
+            return
+        for view in list(self.columns.values()) + list(self.raw.values()):
+            view.release()
+        self.columns = self.raw = {}
+        self.buffer.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_tasks
+
+    def string(self, i):
+        offsets = self.columns["string_offsets"]
+        return str(self.raw["blob"][offsets[i]:offsets[i + 1]], "utf-8")
+
+    def strings(self):
+        blob = self.raw["blob"]
+        offsets = self.columns["string_offsets"].tolist()
+        return [str(blob[start:stop], "utf-8") for start, stop in zip(offsets, offsets[1:])]
+
+    def name(self, i):
+        return self.string(self.columns["name"][i])
+
+    def _task(self, name, estimated, estimator, actual, start, end, flags, first, last):
+        task = Task.__new__(Task)
+        task.name = name
+        task.estimated_hours = estimated
+        task.estimator = estimator
+        task.actual_hours = None if actual != actual else actual
+        task.start_time = start
+        task.end_time = None if end != end else end
+        task.completed = bool(flags & COMPLETED)
+        task.hours = array("d")
+        task.hours.frombytes(self.raw["hours"][first * 8:last * 8])
+        task.timestamps = array("d")
+        task.timestamps.frombytes(self.raw["timestamp"][first * 8:last * 8])
+        return task
+
+    # Materialize row i as a Task record
+    def task(self, i):
+        c = self.columns
+        return self._task(self.string(c["name"][i]), c["estimated"][i], self.string(c["estimator"][i]), c["actual"][i],
+                          c["start"][i], c["end"][i], c["flags"][i], c["segment_start"][i], c["segment_start"][i + 1])
+
+    # All rows as Task records; columns are read in bulk and each string decoded once
+    def tasks(self):
+        c = self.columns
+        strings = self.strings()
+        bounds = c["segment_start"].tolist()
+        rows = zip(c["name"].tolist(), c["estimated"].tolist(), c["estimator"].tolist(), c["actual"].tolist(),
+                   c["start"].tolist(), c["end"].tolist(), c["flags"].tolist(), bounds, bounds[1:])
+        for name, estimated, estimator, actual, start, end, flags, first, last in rows:
+            yield self._task(strings[name], estimated, strings[estimator], actual, start, end, flags, first, last)
+
+    # (name, completed) of every row, in order
+    def task_names(self):
+        strings = self.strings()
+        flags = self.columns["flags"].tolist()
+        return [(strings[name], bool(flag & COMPLETED)) for name, flag in zip(self.columns["name"].tolist(), flags)]
+
+    # Velocity statistics of the completed tasks (VelocityStats without per-task
+    # entries). The moments are computed on the mapped columns without building
+    # any task objects; the sketch is filled one velocity at a time so its buckets
+    # are exactly the ones VelocityStats would use.
+    def velocity_stats(self):
+        import numpy as np
+        c = self.columns
+        flags = np.frombuffer(c["flags"], dtype=np.uint8)
+        actual = np.frombuffer(c["actual"], dtype=np.float64)
+        starts = np.frombuffer(c["segment_start"], dtype=np.uint64)
+        completed = (flags & COMPLETED).astype(bool)
+        done = completed & (np.diff(starts) > 0) & (actual > 0)
+        velocities = np.frombuffer(c["estimated"], dtype=np.float64)[done] / actual[done]
+        stats = VelocityStats()
+        stats.total_tasks = int(completed.sum())
+        if len(velocities):
+            stats.count = len(velocities)
+            stats.mean = float(velocities.mean())
+            stats.m2 = float(((velocities - stats.mean) ** 2).sum())
+            for velocity in velocities.tolist():
+                stats.sketch.add(velocity)
+        return stats
@@ -0,0 +1,226 @@
+import math
+
+# Relative accuracy of the velocity quantile sketch
+SKETCH_ACCURACY = 0.01
+
+# Log-bucketed quantile sketch (DDSketch). Values are counted in buckets whose
+# width grows geometrically, so every quantile is within SKETCH_ACCURACY of the
+# true value. Adding and removing are O(1) and two sketches merge by adding counts.
+class QuantileSketch:
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            key = self._key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += count
+
+    # Removing a value that was never added is ignored, so counts never go negative
+    def remove(self, value):
+        if value <= 0:
+            if self.zero_count <= 0:
+                return
+            self.zero_count -= 1
+        else:
+            key = self._key(value)
+            if self.buckets.get(key, 0) <= 0:
+                return
+            self.buckets[key] -= 1
+            if not self.buckets[key]:
+                del self.buckets[key]
+        self.count -= 1
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def to_dict(self):
+        return {"accuracy": self.accuracy, "zero_count": self.zero_count,
+                "buckets": {str(key): count for key, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d["accuracy"])
+        sketch.buckets = {int(key): count for key, count in d["buckets"].items()}
+        sketch.zero_count = d["zero_count"]
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+    def quantile(self, q):
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+# (actual hours, velocity) of a task; tasks without time segments have no velocity
+def _velocity(task):
+    actual = task.actual_hours or 0
+    return actual, task.estimated_hours / actual if task.hours and actual > 0 else None
+
+# Running velocity statistics over completed tasks. Each task contributes at most
+# one velocity (estimated / actual); update_task swaps a task's old contribution
+# for its new one, so segment edits and completions cost O(1).
+class VelocityStats:
+    def __init__(self):
+        self.total_tasks = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch()
+        # name -> (estimated, actual, velocity) for completed tasks, in completion order
+        self.completed = {}
+        # Attached archive (see ebs_archive), whose tasks come first in entries()
+        self.archive = None
+        # Called before entries() are read while completed tasks that are counted
+        # here are still in the store (see TaskRepository.defer)
+        self.loader = None
+        # Bumped on every change so views can tell whether they are stale
+        self.version = 0
+
+    def _add(self, velocity):
+        self.count += 1
+        delta = velocity - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (velocity - self.mean)
+        self.sketch.add(velocity)
+
+    def _remove(self, velocity):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = self.m2 = 0.0
+        else:
+            delta = velocity - self.mean
+            self.mean -= delta / self.count
+            self.m2 = max(self.m2 - delta * (velocity - self.mean), 0.0)
+        self.sketch.remove(velocity)
+
+    def _drop(self, name):
+        entry = self.completed.pop(name, None)
+        if entry is not None and entry[2] is not None:
+            self._remove(entry[2])
+
+    def add_task(self, task):
+        self.total_tasks += 1
+        self.update_task(task)
+
+    # Re-evaluate one task record from its estimated_hours, actual_hours and completed flag
+    def update_task(self, task):
+        self.version += 1
+        name = task.name
+        if not task.completed:
+            self._drop(name)
+            return
+        old = self.completed.get(name)
+        if old is not None and old[2] is not None:
+            self._remove(old[2])
+        actual, velocity = _velocity(task)
+        # Assigning an existing key keeps the task's place in completion order
+        self.completed[name] = (task.estimated_hours, actual, velocity)
+        if velocity is not None:
+            self._add(velocity)
+
+    # A task counted in merged statistics (see merge) gets its own entry: its
+    # velocity is taken out of the aggregate and added back with the entry
+    def separate(self, task):
+        velocity = _velocity(task)[1]
+        if velocity is not None:
+            self._remove(velocity)
+        self.update_task(task)
+
+    def remove_task(self, name):
+        self.version += 1
+        self.total_tasks -= 1
+        self._drop(name)
+
+    # A completed task counted in the aggregate only, with no per-task entry;
+    # `velocity` is None for a task without time. For statistics kept next to
+    # the tasks they count (see SqliteStore).
+    def count_completed(self, velocity):
+        self.version += 1
+        self.total_tasks += 1
+        if velocity is not None:
+            self._add(velocity)
+
+    def uncount_completed(self, velocity):
+        self.version += 1
+        self.total_tasks -= 1
+        if velocity is not None:
+            self._remove(velocity)
+
+    def rename_task(self, old_name, new_name):
+        if old_name in self.completed:
+            self.version += 1
+            self.completed = {new_name if name == old_name else name: entry for name, entry in self.completed.items()}
+
+    # The aggregate state without the per-task entries, as plain JSON types. Enough
+    # to merge partitions' statistics (see merge) without loading their tasks.
+    def summary(self):
+        return {"total_tasks": self.total_tasks, "count": self.count, "mean": self.mean, "m2": self.m2,
+                "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_summary(cls, d):
+        stats = cls()
+        stats.total_tasks = d["total_tasks"]
+        stats.count = d["count"]
+        stats.mean = d["mean"]
+        stats.m2 = d["m2"]
+        stats.sketch = QuantileSketch.from_dict(d["sketch"])
+        return stats
+
+    # Fold in another set of statistics (Chan et al.'s pairwise update of the
+    # mean and sum of squares; the sketches merge by adding counts)
+    def merge(self, other):
+        self.version += 1
+        self.total_tasks += other.total_tasks
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.sketch.merge(other.sketch)
+
+    # Fold in archived tasks: their merged statistics, and the archive they are
+    # in, whose per-task rows are only read when entries() is called
+    def add_archive(self, stats, archive):
+        self.merge(stats)
+        self.archive = archive
+
+    # (estimated, actual, velocity) of every completed task, archived ones first
+    def entries(self):
+        if self.loader is not None:
+            self.loader()
+        archived = self.archive.entries() if self.archive is not None else []
+        return archived + list(self.completed.values())
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def velocities(self):
+        return [entry[2] for entry in self.entries() if entry[2] is not None]
@@ -0,0 +1,583 @@
+import json
+import os
+import sqlite3
+import threading
+import urllib.parse
+from datetime import datetime
+import ebs_instrument as instrument
+from ebs_instrument import timed, timed_methods
+from ebs_model import Task, TaskRepository, _epoch, _iso
+from ebs_snapshot import COMPLETED, Snapshot, write_snapshot
+from ebs_stats import VelocityStats
+
+# Data file
+DATA_FILE = "ebs_data.json"
+# Journal records appended before the journal is folded into a fresh snapshot
+COMPACT_EVERY = 500
+
+# Ensure each task has a "time_segments" field
+def migrate_data(data):
+    for task in data["tasks"]:
+        if "time_segments" not in task:
+            task["time_segments"] = []
+            if task["actual_hours"] is not None:
+                task["time_segments"].append({
+                    "hours": task["actual_hours"],
+                    "timestamp": task.get("end_time", datetime.now().isoformat())
+                })
+    return data
+
+# Load or initialize data
+@timed("storage.load_data")
+def load_data(path=DATA_FILE):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return migrate_data(json.load(f))
+    return {"tasks": [], "velocity": 1.0}
+
+# Write to a temporary file and rename it over the target, so a crash leaves
+# either the old or the new file but never a half-written one
+def atomic_write(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        if instrument.enabled:
+            instrument.count("bytes_written.snapshot", f.tell())
+    os.replace(tmp_path, path)
+
+# Save data to file
+@timed("storage.save_data")
+def save_data(data, path=DATA_FILE):
+    atomic_write(path, json.dumps(data, indent=4))
+
+# Stores persist a TaskRepository (see ebs_model); load() returns the
+# ebs_data.json schema for TaskRepository.from_data. apply() persists a batch of
+# ("put", task) / ("delete", name) / ("rename", old, new) changes at once.
+# Stores that build the repository themselves provide load_repository(); their
+# apply() and close() only read the velocity from the repo they are given.
+
+# Journal record of one change; the sync server (see ebs_server) pushes the same
+# records to its clients. It also pushes the segment-level changes
+# ("segment_add", name, hours, timestamp, end_time), ("segment_delete", name,
+# index, end_time) and ("finish", name, end_time), so an operation on a task with
+# a long history sends a few fields instead of the whole task. Stores are only
+# given whole tasks: unlike a put, these records are not idempotent.
+def change_record(change):
+    op = change[0]
+    if op == "put":
+        return {"op": "put", "task": change[1].to_dict()}
+    if op == "delete":
+        return {"op": "delete", "name": change[1]}
+    if op == "rename":
+        return {"op": "rename", "old": change[1], "new": change[2]}
+    if op == "segment_add":
+        return {"op": "segment_add", "name": change[1], "hours": change[2], "timestamp": _iso(change[3]),
+                "end_time": _iso(change[4])}
+    if op == "segment_delete":
+        return {"op": "segment_delete", "name": change[1], "index": change[2], "end_time": _iso(change[3])}
+    return {"op": "finish", "name": change[1], "end_time": _iso(change[2])}
+
+# Apply a record to a TaskRepository. Journal records are idempotent like
+# JournalStore._apply; segment-level records are applied once each, in order
+# (the sync clients skip the ones they have seen by their seq).
+def replay_record(repo, record):
+    op = record["op"]
+    if op == "put":
+        task = Task.from_dict(record["task"])
+        if task.name in repo:
+            repo.replace(task)
+        else:
+            repo.add(task)
+    elif op == "delete":
+        if record["name"] in repo:
+            repo.remove(record["name"])
+    elif op == "rename":
+        if record["old"] in repo and record["new"] not in repo:
+            repo.rename(record["old"], record["new"])
+    else:
+        task = repo.get(record["name"])
+        if task is None:
+            return
+        if op == "segment_add":
+            repo.add_segment(task, record["hours"], _epoch(record["timestamp"]))
+        elif op == "segment_delete":
+            if not 0 <= record["index"] < len(task.hours):
+                return
+            repo.remove_segment(task, record["index"])
+        else:
+            task.actual_hours = task.actual_hours or 0
+            task.completed = True
+        if record["end_time"] is not None:
+            task.end_time = _epoch(record["end_time"])
+        repo.update(task)
+
+# Rewrites the whole data file on every mutation
+@timed_methods("storage.JsonStore")
+class JsonStore:
+    def __init__(self, path=DATA_FILE, read_only=False):
+        self.path = path
+
+    def load(self):
+        return load_data(self.path)
+
+    def put_task(self, repo, task):
+        save_data(repo.to_data(), self.path)
+
+    def delete_task(self, repo, name):
+        save_data(repo.to_data(), self.path)
+
+    def rename_task(self, repo, old_name, new_name):
+        save_data(repo.to_data(), self.path)
+
+    def apply(self, repo, changes):
+        save_data(repo.to_data(), self.path)
+
+    def close(self, repo):
+        pass
+
+# Write-ahead journal: each mutation appends one JSON line next to the data file,
+# and the journal is periodically compacted into a new snapshot
+@timed_methods("storage.JournalStore")
+class JournalStore:
+    def __init__(self, path=DATA_FILE, compact_every=COMPACT_EVERY, read_only=False):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.compact_every = compact_every
+        # A read-only store leaves a torn journal line in place
+        self.read_only = read_only
+        self.records = 0
+        # Whether this store wrote anything since it was opened
+        self.changed = False
+
+    def load(self):
+        data = load_data(self.path)
+        if not os.path.exists(self.journal_path):
+            return data
+        index = {task["name"]: i for i, task in enumerate(data["tasks"])}
+        for record in self._read_journal():
+            self._apply(data, index, record)
+        data["tasks"] = [task for task in data["tasks"] if task is not None]
+        return data
+
+    # Journal records in order; a torn line from a crash and everything after it
+    # is ignored, and cut off the file unless the store is read-only
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        valid_end = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                yield record
+                valid_end += len(line)
+                self.records += 1
+        if valid_end < os.path.getsize(self.journal_path) and not self.read_only:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_end)
+
+    # Replay one record; every operation is idempotent so a journal that
+    # survived a crash during compaction can be replayed onto the new snapshot
+    def _apply(self, data, index, record):
+        op = record["op"]
+        if op == "put":
+            task = record["task"]
+            if task["name"] in index:
+                data["tasks"][index[task["name"]]] = task
+            else:
+                index[task["name"]] = len(data["tasks"])
+                data["tasks"].append(task)
+        elif op == "delete":
+            if record["name"] in index:
+                data["tasks"][index.pop(record["name"])] = None
+        elif op == "rename":
+            if record["old"] in index and record["new"] not in index:
+                i = index.pop(record["old"])
+                index[record["new"]] = i
+                data["tasks"][i]["name"] = record["new"]
+        data["velocity"] = record.get("velocity", data["velocity"])
+
+    def _append(self, repo, records):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            start = f.tell()
+            for record in records:
+                record["velocity"] = repo.velocity
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            if instrument.enabled:
+                instrument.count("bytes_written.journal", f.tell() - start)
+        self.records += len(records)
+        if self.records >= self.compact_every:
+            self.compact(repo)
+
+    def put_task(self, repo, task):
+        self.apply(repo, [("put", task)])
+
+    def delete_task(self, repo, name):
+        self.apply(repo, [("delete", name)])
+
+    def rename_task(self, repo, old_name, new_name):
+        self.apply(repo, [("rename", old_name, new_name)])
+
+    # A batch is appended with a single fsync. A batch that would trigger
+    # compaction anyway (e.g. a bulk import) skips the journal and goes straight
+    # into the new snapshot.
+    def apply(self, repo, changes):
+        records = [change_record(change) for change in changes]
+        self.changed = True
+        if self.records + len(records) >= self.compact_every:
+            self.compact(repo, records)
+        else:
+            self._append(repo, records)
+
+    # Fold the journal into the snapshot; the snapshot is renamed into place
+    # before the journal is removed. `records` are changes not yet journaled,
+    # which repo already includes.
+    def compact(self, repo, records=()):
+        save_data(repo.to_data(), self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.records = 0
+
+    # A store that was only read (e.g. for a report) leaves its files as they are;
+    # the journal is folded in by the next session that writes
+    def close(self, repo):
+        if self.records and self.changed:
+            self.compact(repo)
+
+# Columnar snapshot (see ebs_snapshot) plus the write-ahead journal. The JSON data
+# file is converted once, on first use, with the migration applied; after that
+# startup maps the snapshot and replays the journal instead of parsing JSON.
+# Compaction merges the journal into the previous snapshot on disk, so apply()
+# and close() only read the velocity from the repo they are given.
+@timed_methods("storage.SnapshotStore")
+class SnapshotStore(JournalStore):
+    def __init__(self, path=DATA_FILE, compact_every=COMPACT_EVERY, read_only=False):
+        super().__init__(path, compact_every, read_only)
+        base = os.path.splitext(path)[0]
+        self.snapshot_path = base + ".snap"
+        self.journal_path = base + ".snap.journal"
+        # Snapshot the deferred completed tasks are read from, kept mapped until
+        # close(), and its rows by name (built on the first lookup). Compaction may
+        # swap it on the background writer's thread, hence the lock.
+        self.snapshot = None
+        self.rows = None
+        self.lock = threading.Lock()
+
+    # Only the unfinished rows become tasks; the completed ones stay in the
+    # mapping, counted from its velocity columns, until they are read (see
+    # TaskRepository.defer). The journal is replayed on top. A read-only store
+    # reads the JSON data file as it is if there is no snapshot yet.
+    def load_repository(self):
+        if not os.path.exists(self.snapshot_path):
+            if self.read_only:
+                return TaskRepository.from_data(JournalStore(self.path, read_only=True).load())
+            self.import_json()
+        with self.lock:
+            if self.snapshot is not None:
+                self.snapshot.close()
+            self.snapshot = snapshot = Snapshot(self.snapshot_path)
+            self.rows = None
+        repo = TaskRepository(snapshot.velocity)
+        flags = snapshot.columns["flags"]
+        for i in range(len(snapshot)):
+            if not flags[i] & COMPLETED:
+                repo.add(snapshot.task(i))
+        repo.defer(self, snapshot.velocity_stats())
+        for record in self._read_journal():
+            replay_record(repo, record)
+        return repo
+
+    def completed_task(self, name):
+        with self.lock:
+            if self.rows is None:
+                self.rows = {row_name: i for i, (row_name, completed) in enumerate(self.snapshot.task_names()) if completed}
+            i = self.rows.get(name)
+            return None if i is None else self.snapshot.task(i)
+
+    def completed_tasks(self):
+        with self.lock:
+            return [task for task in self.snapshot.tasks() if task.completed]
+
+    def task_names(self):
+        with self.lock:
+            return self.snapshot.task_names()
+
+    def load(self):
+        return self.load_repository().to_data()
+
+    # Convert the JSON data file (and its pending journal) into a fresh snapshot
+    def import_json(self, path=None):
+        repo = TaskRepository.from_data(JournalStore(path or self.path).load())
+        write_snapshot(self.snapshot_path, repo, repo.velocity)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.records = 0
+
+    # Snapshot rows with the journal applied, in order. Rows the journal does not
+    # touch are only materialized one at a time while the new snapshot is written.
+    @staticmethod
+    def _merge(snapshot, records):
+        slots = list(range(len(snapshot)))
+        index = {snapshot.name(i): i for i in slots}
+        for record in records:
+            op = record["op"]
+            if op == "put":
+                task = Task.from_dict(record["task"])
+                if task.name in index:
+                    slots[index[task.name]] = task
+                else:
+                    index[task.name] = len(slots)
+                    slots.append(task)
+            elif op == "delete":
+                if record["name"] in index:
+                    slots[index.pop(record["name"])] = None
+            elif record["old"] in index and record["new"] not in index:
+                i = index.pop(record["old"])
+                task = snapshot.task(slots[i]) if isinstance(slots[i], int) else slots[i]
+                task.name = record["new"]
+                slots[i] = task
+                index[task.name] = i
+        for slot in slots:
+            if slot is not None:
+                yield snapshot.task(slot) if isinstance(slot, int) else slot
+
+    # The snapshot deferred tasks are read from is replaced by the new one, which
+    # has the same rows for every task that was not changed since
+    def compact(self, repo, records=()):
+        records = list(self._read_journal()) + list(records)
+        with self.lock:
+            snapshot = self.snapshot or Snapshot(self.snapshot_path)
+            write_snapshot(self.snapshot_path, self._merge(snapshot, records), repo.velocity, source=snapshot)
+            if self.snapshot is not None:
+                self.snapshot = Snapshot(self.snapshot_path)
+                self.rows = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.records = 0
+
+    def close(self, repo):
+        super().close(repo)
+        with self.lock:
+            if self.snapshot is not None:
+                self.snapshot.close()
+                self.snapshot = self.rows = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    estimated_hours REAL NOT NULL,
+    estimator TEXT NOT NULL DEFAULT '',
+    actual_hours REAL,
+    start_time TEXT,
+    end_time TEXT,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+CREATE TABLE IF NOT EXISTS segments (
+    task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    hours REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (task_id, seq)
+);
+CREATE INDEX IF NOT EXISTS segments_timestamp ON segments (timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+# Columns of a tasks row that give its velocity (see _row_velocity)
+VELOCITY_COLUMNS = "estimated_hours, actual_hours, EXISTS (SELECT 1 FROM segments WHERE task_id = tasks.id)"
+
+# Velocity a completed task counts with in VelocityStats, from its stored fields
+def _row_velocity(estimated, actual, timed):
+    return estimated / actual if timed and actual and actual > 0 else None
+
+# Tasks and time segments in SQLite. Each mutation is one small transaction on
+# the affected rows. The statistics of the completed tasks are kept in the meta
+# table and updated with every batch, so startup reads them and the unfinished
+# tasks rather than the whole history; a completed task is read when it is first
+# used. Segment timestamps are stored as epoch seconds.
+@timed_methods("storage.SqliteStore")
+class SqliteStore:
+    def __init__(self, path=DATA_FILE, db_path=None, read_only=False):
+        self.json_path = path
+        self.db_path = db_path or os.path.splitext(path)[0] + ".db"
+        self.read_only = read_only
+        if read_only:
+            self._open_read_only()
+            return
+        is_new = not os.path.exists(self.db_path)
+        # The connection may be handed to the background writer thread (see ebs_writer)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        if is_new and (os.path.exists(self.json_path) or os.path.exists(JournalStore(self.json_path).journal_path)):
+            self.import_data(JournalStore(self.json_path).load())
+        # Tasks left in the database are read on their own connection, so a read
+        # never lands inside a batch the background writer has open on self.conn
+        self.reader = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.stats = self._read_stats()
+
+    # A read-only store opens the database with mode=ro and creates nothing: with
+    # no database yet, load_repository() reads the JSON data file as it is
+    def _open_read_only(self):
+        self.conn = self.reader = None
+        if os.path.exists(self.db_path):
+            uri = "file:" + urllib.parse.quote(os.path.abspath(self.db_path)) + "?mode=ro"
+            self.conn = self.reader = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.stats = self._read_stats()
+
+    # One-shot import of ebs_data.json (already migrated by load_data) in a single transaction
+    def import_data(self, data):
+        with self.conn:
+            for d in data["tasks"]:
+                self._write_task(d)
+            self._set_velocity(data.get("velocity", 1.0))
+            self.stats = self._count_stats()
+            self._set_stats(self.stats)
+
+    def _write_task(self, d):
+        row = self.conn.execute("SELECT id FROM tasks WHERE name = ?", (d["name"],)).fetchone()
+        values = (d["name"], d["estimated_hours"], d.get("estimator") or "", d.get("actual_hours"),
+                  d.get("start_time"), d.get("end_time"), int(d.get("completed", False)))
+        if row is None:
+            task_id = self.conn.execute(
+                "INSERT INTO tasks (name, estimated_hours, estimator, actual_hours, start_time, end_time, completed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", values).lastrowid
+        else:
+            task_id = row[0]
+            self.conn.execute(
+                "UPDATE tasks SET name = ?, estimated_hours = ?, estimator = ?, actual_hours = ?, start_time = ?, "
+                "end_time = ?, completed = ? WHERE id = ?", values + (task_id,))
+            self.conn.execute("DELETE FROM segments WHERE task_id = ?", (task_id,))
+        self.conn.executemany(
+            "INSERT INTO segments (task_id, seq, hours, timestamp) VALUES (?, ?, ?, ?)",
+            ((task_id, i, segment["hours"], _epoch(segment["timestamp"]))
+             for i, segment in enumerate(d["time_segments"])))
+
+    def _set_velocity(self, velocity):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('velocity', ?)", (velocity,))
+
+    def _set_stats(self, stats):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stats', ?)",
+                          (json.dumps(stats.summary(), separators=(",", ":")),))
+
+    # Statistics of the completed tasks (VelocityStats without per-task entries).
+    # A database written before they were kept is counted once.
+    def _read_stats(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'stats'").fetchone()
+        if row is not None:
+            return VelocityStats.from_summary(json.loads(row[0]))
+        stats = self._count_stats()
+        if not self.read_only:
+            with self.conn:
+                self._set_stats(stats)
+        return stats
+
+    def _count_stats(self):
+        stats = VelocityStats()
+        for velocity_row in self.conn.execute(f"SELECT {VELOCITY_COLUMNS} FROM tasks WHERE completed = 1"):
+            stats.count_completed(_row_velocity(*velocity_row))
+        return stats
+
+    # Take a stored task out of the statistics of the completed tasks
+    def _uncount(self, stats, name):
+        row = self.conn.execute(f"SELECT {VELOCITY_COLUMNS} FROM tasks WHERE name = ? AND completed = 1", (name,)).fetchone()
+        if row is not None:
+            stats.uncount_completed(_row_velocity(*row))
+
+    # Only the unfinished tasks are loaded; the completed ones are counted from the
+    # saved statistics and read when they are used (see TaskRepository.defer)
+    def load_repository(self):
+        if self.reader is None:
+            return TaskRepository.from_data(JournalStore(self.json_path, read_only=True).load())
+        row = self.reader.execute("SELECT value FROM meta WHERE key = 'velocity'").fetchone()
+        repo = TaskRepository(row[0] if row else 1.0)
+        for task in self._read_tasks("completed = 0").values():
+            repo.add(task)
+        repo.defer(self, self.stats)
+        return repo
+
+    def load(self):
+        return self.load_repository().to_data()
+
+    # Tasks matching a condition on the tasks table, with their segments, by name
+    def _read_tasks(self, where, params=()):
+        tasks = {}
+        for name, estimated, estimator, actual, start, end, completed in self.reader.execute(
+                "SELECT name, estimated_hours, estimator, actual_hours, start_time, end_time, completed "
+                f"FROM tasks WHERE {where} ORDER BY id", params):
+            task = Task(name, estimated, estimator, _epoch(start))
+            task.actual_hours = actual
+            task.end_time = _epoch(end)
+            task.completed = bool(completed)
+            tasks[name] = task
+        for name, hours, ts in self.reader.execute(
+                "SELECT tasks.name, s.hours, s.timestamp FROM segments s JOIN tasks ON tasks.id = s.task_id "
+                f"WHERE {where} ORDER BY s.task_id, s.seq", params):
+            tasks[name].hours.append(hours)
+            tasks[name].timestamps.append(ts)
+        return tasks
+
+    def completed_task(self, name):
+        return self._read_tasks("completed = 1 AND name = ?", (name,)).get(name)
+
+    def completed_tasks(self):
+        return self._read_tasks("completed = 1").values()
+
+    def put_task(self, repo, task):
+        self.apply(repo, [("put", task)])
+
+    def delete_task(self, repo, name):
+        self.apply(repo, [("delete", name)])
+
+    def rename_task(self, repo, old_name, new_name):
+        self.apply(repo, [("rename", old_name, new_name)])
+
+    # A batch is one transaction, which also saves the updated statistics; they
+    # are updated on a copy so a failed batch leaves them as they were
+    def apply(self, repo, changes):
+        stats = VelocityStats.from_summary(self.stats.summary())
+        with self.conn:
+            for change in changes:
+                if change[0] == "put":
+                    d = change[1].to_dict()
+                    self._uncount(stats, d["name"])
+                    if d["completed"]:
+                        stats.count_completed(_row_velocity(d["estimated_hours"], d["actual_hours"], d["time_segments"]))
+                    self._write_task(d)
+                elif change[0] == "delete":
+                    self._uncount(stats, change[1])
+                    self.conn.execute("DELETE FROM tasks WHERE name = ?", (change[1],))
+                else:
+                    self.conn.execute("UPDATE tasks SET name = ? WHERE name = ?", (change[2], change[1]))
+            self._set_velocity(repo.velocity)
+            self._set_stats(stats)
+        self.stats = stats
+
+    def close(self, repo):
+        if self.reader is not None:
+            self.reader.close()
+            self.conn.close()
+
+    # (name, completed) of every task, in creation order
+    def task_names(self):
+        return [(name, bool(completed)) for name, completed in self.reader.execute("SELECT name, completed FROM tasks ORDER BY id")]
+
+STORES = {"json": JsonStore, "journal": JournalStore, "snapshot": SnapshotStore, "sqlite": SqliteStore}
+
+# Storage mode can be chosen with the EBS_STORAGE environment variable. A
+# read-only store writes nothing while loading (e.g. for reports); it must not
+# be given changes.
+def open_store(mode=None, path=DATA_FILE, read_only=False):
+    mode = mode or os.environ.get("EBS_STORAGE", "json")
+    if mode not in STORES:
+        raise ValueError(f"Unknown storage mode: {mode}")
+    return STORES[mode](path, read_only=read_only)
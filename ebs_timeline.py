@@ -0,0 +1,312 @@
+import math
+import time
+from datetime import date
+
+# Per-day sums kept for every calendar day with activity
+FIELDS = ("completed", "velocities", "velocity_sum", "velocity_squares", "hours", "segments")
+COMPLETED, VELOCITIES, VELOCITY_SUM, VELOCITY_SQUARES, HOURS, SEGMENTS = range(len(FIELDS))
+WIDTH = len(FIELDS)
+DAY_SECONDS = 86400
+# Default window of the "recent" velocity and half-life of the decayed velocity
+RECENT_DAYS = 90
+DECAY_HALF_LIFE_DAYS = 90
+
+# Local calendar day of an epoch time, as a proleptic Gregorian ordinal
+def day_of(ts):
+    return date.fromtimestamp(ts).toordinal()
+
+# ISO (year, week) of a day ordinal
+def week_of(day):
+    return tuple(date.fromordinal(day).isocalendar()[:2])
+
+def month_of(day):
+    d = date.fromordinal(day)
+    return d.year, d.month
+
+# When a completed task was finished: its end time, else its last segment, else its start
+def completion_time(task):
+    if task.end_time is not None:
+        return task.end_time
+    return task.timestamps[-1] if task.timestamps else task.start_time
+
+# Velocity (estimated / actual) a completed task contributes, or None (same rule as VelocityStats)
+def task_velocity(task):
+    actual = task.actual_hours or 0
+    return task.estimated_hours / actual if task.hours and actual > 0 else None
+
+# Fenwick (binary indexed) tree over the per-day sums, so the sums over any range
+# of days cost O(log n). It covers a range of days with room to grow on both
+# sides and is rebuilt in O(n) from the day sums when a day falls outside it.
+class _DayTree:
+    def __init__(self, days):
+        self.days = days
+        self._rebuild()
+
+    def _rebuild(self):
+        if self.days:
+            low = min(self.days)
+            span = max(self.days) - low + 1
+        else:
+            low, span = day_of(time.time()), 1
+        self.size = 1 << (2 * span + 63).bit_length()
+        self.origin = low - (self.size - span) // 4
+        nodes = [0.0] * ((self.size + 1) * WIDTH)
+        for day, sums in self.days.items():
+            base = (day - self.origin + 1) * WIDTH
+            for j in range(WIDTH):
+                nodes[base + j] += sums[j]
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                for j in range(WIDTH):
+                    nodes[parent * WIDTH + j] += nodes[i * WIDTH + j]
+        self.nodes = nodes
+        self.total = [sum(sums[j] for sums in self.days.values()) for j in range(WIDTH)]
+
+    # Apply deltas to one day; self.days must already include them
+    def add(self, day, deltas):
+        if not self.origin <= day < self.origin + self.size:
+            self._rebuild()
+            return
+        nodes = self.nodes
+        i = day - self.origin + 1
+        while i <= self.size:
+            base = i * WIDTH
+            for j in range(WIDTH):
+                nodes[base + j] += deltas[j]
+            i += i & -i
+        for j in range(WIDTH):
+            self.total[j] += deltas[j]
+
+    # Sums over every day up to and including `day`
+    def prefix(self, day):
+        if day < self.origin:
+            return [0.0] * WIDTH
+        if day >= self.origin + self.size - 1:
+            return list(self.total)
+        sums = [0.0] * WIDTH
+        nodes = self.nodes
+        i = day - self.origin + 1
+        while i > 0:
+            base = i * WIDTH
+            for j in range(WIDTH):
+                sums[j] += nodes[base + j]
+            i -= i & -i
+        return sums
+
+    def range(self, first, last):
+        if last < first:
+            return [0.0] * WIDTH
+        high = self.prefix(last)
+        return [h - l for h, l in zip(high, self.prefix(first - 1))]
+
+# Completed tasks, velocities and logged hours summed as a dict of FIELDS
+def summarize(sums):
+    count = int(round(sums[VELOCITIES]))
+    mean = sums[VELOCITY_SUM] / count if count else None
+    variance = max(sums[VELOCITY_SQUARES] - count * mean * mean, 0.0) / (count - 1) if count > 1 else 0.0
+    return {
+        "completed": int(round(sums[COMPLETED])),
+        "velocities": count,
+        "velocity": mean,
+        "variance": variance,
+        "hours": sums[HOURS],
+        "segments": int(round(sums[SEGMENTS]))
+    }
+
+# Completions and time segments indexed by calendar day. Answers "velocity over
+# the last 90 days" style range queries in O(log n), keeps per-week and per-month
+# aggregates and an exponentially decayed mean velocity, all updated in O(log n)
+# per change. Loading only collects the per-day sums; the tree and the week and
+# month aggregates are built on the first query and kept up to date from then on.
+class Timeline:
+    def __init__(self, half_life_days=DECAY_HALF_LIFE_DAYS):
+        self.days = {}
+        self.weeks = {}
+        self.months = {}
+        self.tree = None
+        # name -> (completion time, velocity or None) for completed tasks
+        self.entries = {}
+        # Decayed mean = decay_sum / decay_weight with weights exp(rate * (t - decay_origin))
+        self.rate = math.log(2) / (half_life_days * DAY_SECONDS)
+        self.decay_origin = None
+        self.decay_weight = 0.0
+        self.decay_sum = 0.0
+        self.velocity_count = 0
+
+    # Bulk load. Local-time offsets only change on quarter hours, so the calendar
+    # day is looked up once per quarter hour instead of once per timestamp.
+    @classmethod
+    def from_tasks(cls, tasks, half_life_days=DECAY_HALF_LIFE_DAYS):
+        timeline = cls(half_life_days)
+        days = timeline.days
+        quarters = {}
+
+        def bucket(ts):
+            quarter = int(ts // 900)
+            day = quarters.get(quarter)
+            if day is None:
+                day = quarters[quarter] = day_of(ts)
+            sums = days.get(day)
+            if sums is None:
+                sums = days[day] = [0, 0, 0.0, 0.0, 0.0, 0]
+            return sums
+
+        for task in tasks:
+            for hours, ts in zip(task.hours, task.timestamps):
+                sums = bucket(ts)
+                sums[HOURS] += hours
+                sums[SEGMENTS] += 1
+            if task.completed:
+                t, velocity = timeline.entries[task.name] = (completion_time(task), task_velocity(task))
+                sums = bucket(t)
+                sums[COMPLETED] += 1
+                if velocity is not None:
+                    sums[VELOCITIES] += 1
+                    sums[VELOCITY_SUM] += velocity
+                    sums[VELOCITY_SQUARES] += velocity * velocity
+                    timeline._decay(t, velocity, 1)
+        return timeline
+
+    @staticmethod
+    def _bump(buckets, key, deltas):
+        sums = buckets.get(key)
+        if sums is None:
+            sums = buckets[key] = [0.0] * WIDTH
+        for j in range(WIDTH):
+            sums[j] += deltas[j]
+        if not sums[COMPLETED] and not sums[SEGMENTS]:
+            del buckets[key]
+
+    def _adjust(self, day, deltas):
+        self._bump(self.days, day, deltas)
+        if self.tree is not None:
+            self.tree.add(day, deltas)
+            self._bump(self.weeks, week_of(day), deltas)
+            self._bump(self.months, month_of(day), deltas)
+
+    def _index(self):
+        if self.tree is None:
+            for day, sums in self.days.items():
+                self._bump(self.weeks, week_of(day), sums)
+                self._bump(self.months, month_of(day), sums)
+            self.tree = _DayTree(self.days)
+        return self.tree
+
+    def _decay(self, t, velocity, sign):
+        if self.decay_origin is None:
+            self.decay_origin = t
+        x = self.rate * (t - self.decay_origin)
+        if x > 500:
+            # Move the origin forward before the weights overflow
+            scale = math.exp(-x)
+            self.decay_weight *= scale
+            self.decay_sum *= scale
+            self.decay_origin = t
+            x = 0.0
+        weight = math.exp(x) * sign
+        self.decay_weight += weight
+        self.decay_sum += weight * velocity
+        self.velocity_count += sign
+        if not self.velocity_count:
+            self.decay_weight = self.decay_sum = 0.0
+
+    def _complete(self, t, velocity, sign):
+        if velocity is None:
+            self._adjust(day_of(t), (sign, 0, 0.0, 0.0, 0.0, 0))
+        else:
+            self._adjust(day_of(t), (sign, sign, sign * velocity, sign * velocity * velocity, 0.0, 0))
+            self._decay(t, velocity, sign)
+
+    def add_segment(self, hours, ts):
+        self._adjust(day_of(ts), (0, 0, 0.0, 0.0, hours, 1))
+
+    def remove_segment(self, hours, ts):
+        self._adjust(day_of(ts), (0, 0, 0.0, 0.0, -hours, -1))
+
+    def add_task(self, task):
+        for hours, ts in task.segments():
+            self.add_segment(hours, ts)
+        self.update_task(task)
+
+    def remove_task(self, task):
+        for hours, ts in task.segments():
+            self.remove_segment(hours, ts)
+        self._drop(task.name)
+
+    def _drop(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self._complete(entry[0], entry[1], -1)
+
+    # Re-evaluate a task's completion (its segments are tracked separately)
+    def update_task(self, task):
+        old = self.entries.get(task.name)
+        if not task.completed:
+            if old is not None:
+                self._drop(task.name)
+            return
+        entry = (completion_time(task), task_velocity(task))
+        if entry != old:
+            self._drop(task.name)
+            self.entries[task.name] = entry
+            self._complete(entry[0], entry[1], 1)
+
+    def rename_task(self, old_name, new_name):
+        if old_name in self.entries:
+            self.entries[new_name] = self.entries.pop(old_name)
+
+    # [origin, weight, sum, count] of the decayed mean velocity, to fold into
+    # another timeline with the same half-life (see add_decay)
+    def decay_state(self):
+        return [self.decay_origin, self.decay_weight, self.decay_sum, self.velocity_count]
+
+    # Fold in another timeline's decayed velocity: both weight sums are moved to
+    # the later of the two origins, so neither can overflow
+    def add_decay(self, state):
+        origin, weight, total, count = state
+        if not count:
+            return
+        if self.decay_origin is None:
+            self.decay_origin = origin
+        new_origin = max(origin, self.decay_origin)
+        own = math.exp(self.rate * (self.decay_origin - new_origin))
+        other = math.exp(self.rate * (origin - new_origin))
+        self.decay_weight = self.decay_weight * own + weight * other
+        self.decay_sum = self.decay_sum * own + total * other
+        self.decay_origin = new_origin
+        self.velocity_count += count
+
+    # Add archived tasks (see ebs_archive): their per-day sums and their
+    # decayed-velocity state
+    def add_archive(self, days, decay):
+        for day, sums in days.items():
+            self._adjust(day, sums)
+        self.add_decay(decay)
+
+    # Summary of the days from `start` to `end` (epoch seconds, inclusive by local
+    # calendar day; None = unbounded)
+    def window(self, start=None, end=None):
+        tree = self._index()
+        first = day_of(start) if start is not None else tree.origin
+        last = day_of(end) if end is not None else tree.origin + tree.size
+        return summarize(tree.range(first, last))
+
+    # Summary of the last `days` calendar days up to and including today
+    def recent(self, days=RECENT_DAYS, now=None):
+        today = day_of(time.time() if now is None else now)
+        return summarize(self._index().range(today - days + 1, today))
+
+    # Exponentially decayed mean velocity, or None without velocity history
+    def decayed_velocity(self):
+        return self.decay_sum / self.decay_weight if self.velocity_count and self.decay_weight > 0 else None
+
+    # [((year, week), summary)] in calendar order
+    def weekly(self):
+        self._index()
+        return [(key, summarize(self.weeks[key])) for key in sorted(self.weeks)]
+
+    # [((year, month), summary)] in calendar order
+    def monthly(self):
+        self._index()
+        return [(key, summarize(self.months[key])) for key in sorted(self.months)]
@@ -0,0 +1,213 @@
+import csv
+import json
+import os
+from datetime import datetime
+from ebs_instrument import timed
+from ebs_model import Task
+from ebs_storage import migrate_data
+
+# Bulk import and export of tasks with their time segments, streamed record by
+# record. Two formats, picked from the file extension unless given:
+#
+#   jsonl   one task per line in the ebs_data.json task schema
+#   csv     one row per time segment with the task columns repeated; a task
+#           without segments is one row with the segment columns left empty.
+#           Consecutive rows with the same name are one task.
+CSV_FIELDS = ("name", "estimated_hours", "estimator", "actual_hours", "start_time", "end_time", "completed",
+              "segment_hours", "segment_timestamp")
+FORMATS = ("csv", "jsonl")
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+# Records validated per batch, and how many errors are listed before giving up
+BATCH_SIZE = 1000
+MAX_ERRORS = 20
+
+def detect_format(path, fmt=None):
+    fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import/export format for {path} (use .csv or .jsonl)")
+    return fmt
+
+def _number(value):
+    return float(value) if value not in (None, "") else None
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).strip().lower()
+    if lowered in ("1", "true", "yes", "y"):
+        return True
+    if lowered in ("", "0", "false", "no", "n"):
+        return False
+    raise ValueError(f"invalid completed value {value!r}")
+
+# (line number, task dict) for every task in a JSON Lines file
+def _read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+
+# (line number, task dict) for every task in a CSV file, grouping consecutive rows
+def _read_csv(f):
+    reader = csv.DictReader(f)
+    missing = {"name", "estimated_hours"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing the column(s): {', '.join(sorted(missing))}")
+    current = None
+    for row in reader:
+        name = (row.get("name") or "").strip()
+        if current is None or name != current[1]["name"]:
+            if current is not None:
+                yield current
+            try:
+                d = {
+                    "name": name,
+                    "estimated_hours": _number(row.get("estimated_hours")),
+                    "actual_hours": _number(row.get("actual_hours")),
+                    "start_time": row.get("start_time") or None,
+                    "completed": _flag(row.get("completed", ""))
+                }
+            except ValueError as e:
+                current = None
+                yield reader.line_num, ValueError(f"task '{name}': {e}")
+                continue
+            if row.get("estimator"):
+                d["estimator"] = row["estimator"].strip()
+            if row.get("end_time"):
+                d["end_time"] = row["end_time"]
+            current = (reader.line_num, d)
+        if row.get("segment_hours") or row.get("segment_timestamp"):
+            try:
+                segment = {"hours": float(row["segment_hours"]), "timestamp": row["segment_timestamp"]}
+            except (TypeError, ValueError):
+                segment = {"hours": None, "timestamp": None}
+            current[1].setdefault("time_segments", []).append(segment)
+    if current is not None:
+        yield current
+
+# Validated Task record for one task dict; raises ValueError with the reason
+def _task(d):
+    if isinstance(d, Exception):
+        raise ValueError(str(d))
+    if not isinstance(d, dict):
+        raise ValueError("a task must be an object")
+    name = d.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing task name")
+    estimated = d.get("estimated_hours")
+    if isinstance(estimated, bool) or not isinstance(estimated, (int, float)) or not estimated > 0:
+        raise ValueError(f"task '{name}': estimated hours must be a number greater than 0")
+    actual = d.get("actual_hours")
+    if actual is not None and (isinstance(actual, bool) or not isinstance(actual, (int, float))):
+        raise ValueError(f"task '{name}': actual hours must be a number")
+    segments = d.get("time_segments", [])
+    if not isinstance(segments, list):
+        raise ValueError(f"task '{name}': time segments must be a list")
+    for segment in segments:
+        if not isinstance(segment, dict):
+            raise ValueError(f"task '{name}': a time segment must be an object")
+        hours = segment.get("hours")
+        if isinstance(hours, bool) or not isinstance(hours, (int, float)) or not hours > 0:
+            raise ValueError(f"task '{name}': segment hours must be a number greater than 0")
+        timestamp = segment.get("timestamp")
+        try:
+            datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError(f"task '{name}': segment timestamp must be an ISO date and time, got {timestamp!r}")
+    d = dict(d, name=name.strip(), actual_hours=actual, start_time=d.get("start_time") or datetime.now().isoformat())
+    try:
+        task = Task.from_dict(migrate_data({"tasks": [d]})["tasks"][0])
+        task.completed = _flag(task.completed)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"task '{name}': {e}")
+    if task.hours and task.actual_hours is None:
+        task.actual_hours = sum(task.hours)
+    return task
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Stream the file, validate it batch by batch and add every task to the
+# repository as one transaction: nothing is added unless the whole file is
+# valid, and all the new tasks are persisted with a single store.apply(). Names
+# already in the repository or repeated in the file are errors, or skipped with
+# skip_duplicates. Returns (added tasks, number skipped).
+@timed("transfer.import_file")
+def import_file(repo, store, path, fmt=None, skip_duplicates=False, batch_size=BATCH_SIZE):
+    fmt = detect_format(path, fmt)
+    tasks = []
+    seen = set()
+    errors = []
+    skipped = 0
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        records = _read_csv(f) if fmt == "csv" else _read_jsonl(f)
+        for batch in _batches(records, batch_size):
+            for line_number, d in batch:
+                try:
+                    task = _task(d)
+                except ValueError as e:
+                    errors.append(f"line {line_number}: {e}")
+                    continue
+                if task.name in seen or task.name in repo or repo.is_archived(task.name):
+                    if skip_duplicates:
+                        skipped += 1
+                        continue
+                    errors.append(f"line {line_number}: task '{task.name}' already exists")
+                    continue
+                seen.add(task.name)
+                tasks.append(task)
+            if len(errors) >= MAX_ERRORS:
+                break
+    if errors:
+        raise ValueError(f"{path} has invalid records, nothing imported:\n" + "\n".join(errors[:MAX_ERRORS]))
+    for task in tasks:
+        repo.add(task)
+    try:
+        store.apply(repo, [("put", task) for task in tasks])
+    except Exception:
+        for task in tasks:
+            repo.remove(task.name)
+        raise
+    return tasks, skipped
+
+# CSV rows of one task: one per segment, or a single row without segment columns
+def _csv_rows(task):
+    d = task.to_dict()
+    row = [d["name"], d["estimated_hours"], d.get("estimator", ""), d["actual_hours"], d["start_time"],
+           d.get("end_time", ""), int(d["completed"])]
+    if not d["time_segments"]:
+        return [row + ["", ""]]
+    return [row + [segment["hours"], segment["timestamp"]] for segment in d["time_segments"]]
+
+# Write tasks (any iterable of Task records) one at a time, so memory use does
+# not grow with the number of tasks. The file is renamed into place when done.
+# Returns the number of tasks written.
+@timed("transfer.export_file")
+def export_file(tasks, path, fmt=None):
+    fmt = detect_format(path, fmt)
+    tmp_path = f"{path}.tmp"
+    written = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for task in tasks:
+                writer.writerows(_csv_rows(task))
+                written += 1
+        else:
+            for task in tasks:
+                f.write(json.dumps(task.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n")
+                written += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return written
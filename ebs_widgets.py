@@ -0,0 +1,114 @@
+import customtkinter as ctk
+from ebs_instrument import timed
+
+ROW_HEIGHT = 28
+VISIBLE_ROWS = 6
+
+# Scrollable list that only renders the visible rows. A fixed pool of row widgets
+# is created once and re-labelled as the list scrolls, so refreshing or scrolling
+# costs the same for 100 items as for 100k. Rows are CTkRadioButtons sharing one
+# variable when radio=True, otherwise flat CTkButtons.
+class VirtualList(ctk.CTkFrame):
+    def __init__(self, master, command, radio=False, empty_text="", width=200, visible_rows=VISIBLE_ROWS, **kwargs):
+        super().__init__(master, width=width, height=ROW_HEIGHT * visible_rows, **kwargs)
+        self.grid_propagate(False)
+        self.items = []
+        self.first = 0
+        self.command = command
+        self.radio = radio
+        self.variable = ctk.StringVar() if radio else None
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=visible_rows, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+        self.rows = [self._make_row(i) for i in range(visible_rows)]
+        self.empty_label = ctk.CTkLabel(self, text=empty_text)
+        for widget in [self] + self.rows:
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll(-1))
+            widget.bind("<Button-5>", lambda event: self.scroll(1))
+        self.render()
+
+    def _make_row(self, i):
+        if self.radio:
+            row = ctk.CTkRadioButton(
+                self, text="", variable=self.variable, value="", command=lambda: self._on_click(i),
+                fg_color="#4a6cd4", hover_color="#3a5cbd", border_color="#d1d1d1"
+            )
+        else:
+            row = ctk.CTkButton(
+                self, text="", anchor="w", fg_color="transparent",
+                text_color=("black", "white"), hover_color=("gray75", "gray25"), height=25,
+                command=lambda: self._on_click(i)
+            )
+        row.grid(row=i, column=0, sticky="ew", padx=2, pady=1)
+        return row
+
+    def _on_click(self, i):
+        if self.first + i < len(self.items):
+            self.command(self.items[self.first + i])
+
+    def _on_scrollbar(self, action, value):
+        if action == "moveto":
+            self.first = int(float(value) * len(self.items))
+            self.render()
+
+    def _on_wheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def scroll(self, rows):
+        self.first += rows
+        self.render()
+
+    # Re-label the pooled rows for the current window of items
+    @timed("widgets.VirtualList.render")
+    def render(self):
+        self.first = max(0, min(self.first, len(self.items) - len(self.rows)))
+        selected = self.variable.get() if self.radio else None
+        for i, row in enumerate(self.rows):
+            index = self.first + i
+            if index < len(self.items):
+                name = self.items[index]
+                if self.radio:
+                    row.configure(text=name, value=name)
+                    if name == selected:
+                        row.select(from_variable_callback=True)
+                    else:
+                        row.deselect(from_variable_callback=True)
+                else:
+                    row.configure(text=name)
+                row.grid()
+            else:
+                row.grid_remove()
+        if self.items:
+            self.empty_label.grid_remove()
+            self.scrollbar.set(self.first / len(self.items), min(1.0, (self.first + len(self.rows)) / len(self.items)))
+        else:
+            self.empty_label.grid(row=0, column=0)
+            self.scrollbar.set(0.0, 1.0)
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.render()
+
+    # Incremental updates: only the visible window is redrawn
+    def append(self, item):
+        self.items.append(item)
+        if len(self.items) - self.first <= len(self.rows):
+            self.render()
+        else:
+            self.scrollbar.set(self.first / len(self.items), (self.first + len(self.rows)) / len(self.items))
+
+    def remove(self, item):
+        if item in self.items:
+            self.items.remove(item)
+            self.render()
+
+    def rename(self, old_item, new_item):
+        if old_item in self.items:
+            self.items[self.items.index(old_item)] = new_item
+            self.render()
+
+    def select(self, item):
+        if self.radio:
+            self.variable.set(item or "")
+            self.render()
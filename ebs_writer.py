@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import ebs_instrument as instrument
+from ebs_instrument import timed
+
+# Seconds between background flushes; override with EBS_FLUSH_INTERVAL
+FLUSH_INTERVAL = float(os.environ.get("EBS_FLUSH_INTERVAL", "1.0"))
+
+# Writer-side copy of the data. The GUI thread (or the sync server's event loop)
+# only ever hands over task dicts, so the writer never touches the live TaskRepository.
+class Shadow:
+    def __init__(self, data):
+        self.tasks = {task["name"]: task for task in data["tasks"]}
+        self.velocity = data.get("velocity", 1.0)
+
+    def to_data(self):
+        return {"tasks": list(self.tasks.values()), "velocity": self.velocity}
+
+    def apply(self, change):
+        if change[0] == "put":
+            self.tasks[change[1]["name"]] = change[1]
+        elif change[0] == "delete":
+            self.tasks.pop(change[1], None)
+        else:
+            # Copy rather than edit the dict, which a queued put may still refer to
+            old_name, new_name = change[1], change[2]
+            self.tasks = {new_name if name == old_name else name: dict(task, name=new_name) if name == old_name else task
+                          for name, task in self.tasks.items()}
+
+# Task dict that stores can serialize like a Task record
+class TaskSnapshot(dict):
+    def to_dict(self):
+        return self
+
+# Merge repeated puts of the same task into its first put, unless a rename or
+# delete of that task comes in between; the first position keeps new tasks in order
+def coalesce(changes):
+    kept = []
+    first_put = {}
+    for change in changes:
+        if change[0] == "put":
+            name = change[1]["name"]
+            if name in first_put:
+                kept[first_put[name]] = change
+                continue
+            first_put[name] = len(kept)
+        else:
+            for name in change[1:]:
+                first_put.pop(name, None)
+        kept.append(change)
+    return kept
+
+# Runs a store on a background thread. Mutations are queued as small deltas and
+# return immediately; the writer drains the queue every flush_interval seconds
+# (or when flush() is called), coalesces the pending changes and persists them as
+# one batch. Write failures are queued for the GUI to collect with poll_errors()
+# and the failed batch is retried with the next flush.
+class BackgroundWriter:
+    def __init__(self, store, data, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.shadow = Shadow(data)
+        self.flush_interval = flush_interval
+        self.changes = queue.Queue()
+        self.errors = queue.Queue()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.failed = []
+        self.thread = threading.Thread(target=self._run, name="ebs-writer", daemon=True)
+        self.thread.start()
+
+    def put_task(self, repo, task):
+        self.changes.put((("put", task.to_dict()), repo.velocity))
+
+    def delete_task(self, repo, name):
+        self.changes.put((("delete", name), repo.velocity))
+
+    def rename_task(self, repo, old_name, new_name):
+        self.changes.put((("rename", old_name, new_name), repo.velocity))
+
+    # Queue a batch of changes (e.g. a bulk import) and persist it right away
+    def apply(self, repo, changes):
+        for change in changes:
+            change = ("put", change[1].to_dict()) if change[0] == "put" else change
+            self.changes.put((change, repo.velocity))
+        self.flush()
+
+    # Ask the writer to persist what is queued now instead of at the next interval
+    def flush(self):
+        self.wakeup.set()
+
+    def poll_errors(self):
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    @timed("writer.drain")
+    def _drain(self):
+        pending = []
+        while True:
+            try:
+                pending.append(self.changes.get_nowait())
+            except queue.Empty:
+                break
+        if not pending and not self.failed:
+            return
+        for change, velocity in pending:
+            self.shadow.apply(change)
+        if pending:
+            self.shadow.velocity = pending[-1][1]
+        batch = [("put", TaskSnapshot(change[1])) if change[0] == "put" else change
+                 for change in coalesce(self.failed + [change for change, velocity in pending])]
+        instrument.count("writer.changes", len(pending))
+        instrument.count("writer.batched_changes", len(batch))
+        try:
+            self.store.apply(self.shadow, batch)
+            self.failed = []
+        except Exception as e:
+            self.failed = batch
+            self.errors.put(e)
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self._drain()
+        self._drain()
+
+    # Flush everything still queued, then close the underlying store
+    def close(self, repo=None):
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join()
+        try:
+            self.store.close(self.shadow)
+        except Exception as e:
+            self.errors.put(e)
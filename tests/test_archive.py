@@ -0,0 +1,49 @@
+import os
+import ebs_core as core
+from ebs_archive import Archive, archivable, archive_tasks, archive_paths, load_archive
+from ebs_storage import open_store
+
+def _populate(path):
+    store = open_store("json", path)
+    repo = core.open_repository(store)
+    for i in range(6):
+        name = f"task {i}"
+        core.add_task(repo, store, name, 2 + i)
+        core.record_time(repo, store, name, 3)
+        if i < 4:
+            core.finish_task(repo, store, name)
+    return repo, store
+
+def _reopen(path):
+    store = open_store("json", path)
+    repo = core.open_repository(store)
+    load_archive(repo, store, path)
+    return repo, store
+
+def test_archive_keeps_statistics(tmp_path):
+    path = str(tmp_path / "ebs_data.json")
+    repo, store = _populate(path)
+    velocity, count = repo.velocity, repo.stats.count
+    tasks = archivable(repo, days=0, now=float("inf"))
+    assert len(tasks) == 4
+    archive_tasks(repo, store, path, tasks)
+    repo, store = _reopen(path)
+    assert len(repo) == 2 and len(repo.archive) == 4
+    assert "task 0" not in repo and repo.is_archived("task 0")
+    assert repo.velocity == velocity and repo.stats.count == count
+    assert repo.archive.get("task 0").to_dict()["name"] == "task 0"
+    assert repo.archive.search("TASK 1") == ["task 1"]
+
+def test_interrupted_run_is_cleaned_up(tmp_path):
+    path = str(tmp_path / "ebs_data.json")
+    repo, store = _populate(path)
+    tasks = archivable(repo, days=0, now=float("inf"))
+    # The run stops after writing the archive, before the tasks leave the store
+    Archive(path).add(tasks)
+    assert Archive.open(path).pending
+    repo, store = _reopen(path)
+    assert len(repo) == 2 and len(repo.archive) == 4
+    assert not Archive.open(path).pending
+    repo, store = _reopen(path)
+    assert len(repo) == 2
+    assert all(os.path.exists(p) for p in archive_paths(path))
@@ -0,0 +1,29 @@
+import json
+import os
+import pytest
+from ebs_cli import main
+from ebs_storage import STORES
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_commands_round_trip(tmp_path, capsys, mode):
+    data = str(tmp_path / "ebs_data.json")
+    run = lambda *argv: main(["--data", data, "--storage", mode, *argv])
+    assert run("add", "a", "4") == 0
+    assert run("add", "b", "2", "--estimator", "ann") == 0
+    assert run("log", "a", "3") == 0
+    assert run("finish", "a") == 0
+    assert run("add", "a", "1") == 1
+    assert "already exists" in capsys.readouterr().err
+    assert run("list", "--all") == 0
+    listing = capsys.readouterr().out
+    assert "a" in listing and "b" in listing
+    assert run("stats", "--json") == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert (stats["tasks"], stats["completed"], stats["velocity"]) == (2, 1, 4 / 3)
+
+def test_journal_is_folded_in_on_exit(tmp_path):
+    data = str(tmp_path / "ebs_data.json")
+    assert main(["--data", data, "--storage", "journal", "add", "a", "4"]) == 0
+    assert not os.path.exists(str(tmp_path / "ebs_data.journal"))
+    with open(data, encoding="utf-8") as f:
+        assert [task["name"] for task in json.load(f)["tasks"]] == ["a"]
@@ -0,0 +1,17 @@
+from ebs_model import Task, _epoch, _iso
+
+def test_epoch_iso_round_trip():
+    assert _epoch(None) is None and _iso(None) is None
+    assert _epoch(_iso(1700000000.5)) == 1700000000.5
+
+def test_task_dict_round_trip():
+    task = Task("write docs", 4, "ann", start_time=1700000000.0)
+    task.hours.extend([1.5, 2.0])
+    task.timestamps.extend([1700003600.0, 1700007200.0])
+    task.actual_hours = 3.5
+    task.completed = True
+    task.end_time = 1700007200.0
+    d = task.to_dict()
+    restored = Task.from_dict(d)
+    assert restored.to_dict() == d
+    assert list(restored.segments()) == [(1.5, 1700003600.0), (2.0, 1700007200.0)]
@@ -0,0 +1,31 @@
+import pytest
+from ebs_model import Task
+from ebs_partitions import Workspace
+
+def test_sidecar_files_are_not_partition_files(tmp_path):
+    workspace = Workspace(str(tmp_path / "data.json"), "sqlite")
+    directory = tmp_path / "data.partitions"
+    directory.mkdir()
+    for name in ("web+ann.db", "web+ann.db-wal", "web+ann.db-shm", "web+ann.db-journal", "web+ann.json.tmp",
+                 "app+bob.json", "app+bob.journal", "summaries.json"):
+        (directory / name).write_bytes(b"x")
+    files = workspace._files()
+    assert [entry[0] for entry in files["web+ann"]] == ["web+ann.db"]
+    assert [entry[0] for entry in files["app+bob"]] == ["app+bob.journal", "app+bob.json"]
+    assert workspace.partitions() == [("app", "bob"), ("web", "ann")]
+
+def test_split_and_summaries(tmp_path):
+    workspace = Workspace(str(tmp_path / "data.json"), "json")
+    tasks = [Task("a", 2, "ann"), Task("b", 3, "bob"), Task("c", 1, "ann")]
+    tasks[0].hours.append(4.0)
+    tasks[0].timestamps.append(1700000000.0)
+    tasks[0].actual_hours = 4.0
+    tasks[0].completed = True
+    assert workspace.split(tasks, "web") == {("web", "ann"): 2, ("web", "bob"): 1}
+    with pytest.raises(ValueError):
+        workspace.split([Task("a", 1, "ann")], "web")
+    summaries = workspace.summaries()
+    assert summaries[("web", "ann")]["tasks"] == 2
+    assert summaries[("web", "ann")]["completed"] == 1
+    assert summaries[("web", "ann")]["velocity"] == 0.5
+    assert summaries[("web", "bob")]["unfinished"] == 1
@@ -0,0 +1,43 @@
+import os
+import pytest
+import ebs_core as core
+from ebs_report import generate_reports
+from ebs_storage import STORES, open_store, save_data
+from ebs_bench import generate_data
+
+def _files(directory):
+    return {entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns) for entry in os.scandir(directory)}
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_report_reads_json_without_writing(tmp_path, mode):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    path = str(data_dir / "ebs_data.json")
+    save_data(generate_data(60, seed=2), path)
+    # A journal with a torn last line
+    (data_dir / "ebs_data.journal").write_bytes(b'{"op":"delete","name":"task 0000000"}\n{"op":"del')
+    before = _files(data_dir)
+    reports = generate_reports([("team", path)], str(tmp_path / "out"), storage=mode, workers=1)
+    assert "error" not in reports[0]
+    # Every mode but json replays the journal's complete record
+    assert reports[0]["tasks"] == (60 if mode == "json" else 59)
+    assert _files(data_dir) == before
+
+@pytest.mark.parametrize("mode", ["snapshot", "sqlite"])
+def test_report_leaves_existing_store_alone(tmp_path, mode):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    path = str(data_dir / "ebs_data.json")
+    store = open_store(mode, path)
+    repo = core.open_repository(store)
+    core.add_task(repo, store, "a", 2)
+    core.record_time(repo, store, "a", 1)
+    core.finish_task(repo, store, "a")
+    core.add_task(repo, store, "b", 2)
+    store.close(repo)
+    before = _files(data_dir)
+    reports = generate_reports([("team", path)], str(tmp_path / "out"), storage=mode, workers=1)
+    assert (reports[0]["tasks"], reports[0]["unfinished"]) == (2, 1)
+    after = _files(data_dir)
+    # SQLite may add its shared-memory and WAL sidecars next to the database
+    assert {name: entry for name, entry in after.items() if not name.endswith(("-wal", "-shm"))} == before
@@ -0,0 +1,24 @@
+import random
+from ebs_search import NameIndex
+
+def _scan(names, text):
+    return [name for name in names if text.lower() in name.lower()]
+
+def test_search_matches_scan():
+    rng = random.Random(3)
+    words = ["Fix", "login", "API", "cache", "db", "UI", "review", "x"]
+    names = [f"{rng.choice(words)} {rng.choice(words)} {i}" for i in range(300)]
+    index = NameIndex(names)
+    for text in ("", "f", "X", "ui", "9", "12", "fix", "Api c", "login 1", "zz", "cache db 29"):
+        assert index.search(text) == _scan(names, text), text
+
+def test_edits_keep_display_order():
+    index = NameIndex(["alpha", "beta", "gamma"])
+    index.add("alphabet")
+    index.remove("beta")
+    index.rename("alpha", "omega")
+    names = ["omega", "gamma", "alphabet"]
+    for text in ("", "a", "al", "alp", "ga", "meg", "omega", "b"):
+        assert index.search(text) == _scan(names, text), text
+    assert "omega" in index and "alpha" not in index
+    assert index.search("alph") == ["alphabet"]
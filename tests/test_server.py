@@ -0,0 +1,108 @@
+import asyncio
+import json
+import socket
+import threading
+import pytest
+import ebs_core as core
+from ebs_remote import RemoteSession
+from ebs_server import SyncServer
+from ebs_storage import STORES, open_store
+
+# A SyncServer on a free local port, run by an event loop in its own thread
+class _Running:
+    def __init__(self, store):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = SyncServer(store)
+        self.address = self._run(self.server.start("127.0.0.1", 0))
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(10)
+
+    def stop(self):
+        self._run(self.server.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+@pytest.fixture
+def running(tmp_path):
+    servers = []
+    def start(mode="json"):
+        path = str(tmp_path / "ebs_data.json")
+        servers.append(_Running(open_store(mode, path)))
+        return servers[-1], path
+    yield start
+    for server in servers:
+        if server.loop.is_running():
+            server.stop()
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_operations_reach_other_clients_and_the_store(running, mode):
+    server, path = running(mode)
+    first, second = RemoteSession(server.address), RemoteSession(server.address)
+    try:
+        mine, theirs = first.load_repository(), second.load_repository()
+        first.add_task(mine, first, "a", 2)
+        first.add_task(mine, first, "b", 3, "ann")
+        first.record_time(mine, first, "a", 1.5)
+        first.record_time(mine, first, "a", 0.5)
+        first.delete_time_segment(mine, first, "a", 0)
+        first.finish_task(mine, first, "a")
+        first.modify_task(mine, first, "b", "c", 4)
+        # Events are sent before the answer to any later request
+        second.call("ping")
+        records = second.poll_changes(theirs)
+        assert [record["op"] for record in records] == ["put", "put", "segment_add", "segment_add",
+                                                        "segment_delete", "finish", "rename", "put"]
+        assert theirs.to_data() == mine.to_data()
+        expected = mine.to_data()
+    finally:
+        first.close()
+        second.close()
+    server.stop()
+    assert core.open_repository(open_store(mode, path)).to_data() == expected
+
+@pytest.mark.parametrize("op, args", [
+    ("add_task", ["a"]),
+    ("add_task", ["a", "2"]),
+    ("add_task", ["a", True]),
+    ("add_task", [5, 2]),
+    ("add_task", ["a", 2, "ann", "extra"]),
+    ("record_time", [["a"], 1]),
+    ("delete_time_segment", ["a", 0.5]),
+    ("modify_task", ["a", 7]),
+    ("finish_task", []),
+    ("import_tasks", ["a"]),
+    ("import_tasks", [["a"]]),
+    ("import_tasks", [[{"name": "x", "estimated_hours": "1", "time_segments": []}]]),
+    ("no_such_op", []),
+])
+def test_malformed_arguments_are_refused(running, op, args):
+    server, path = running()
+    session = RemoteSession(server.address)
+    try:
+        repo = session.load_repository()
+        session.add_task(repo, session, "a", 2)
+        with pytest.raises(ValueError):
+            session.call(op, *args)
+        # Nothing changed and the connection still works
+        session.record_time(repo, session, "a", 1)
+        assert session.load_repository().to_data() == repo.to_data()
+        assert session.poll_errors() == []
+    finally:
+        session.close()
+
+def test_malformed_requests_keep_the_connection(running):
+    server, path = running()
+    with socket.create_connection(server.address, 10) as sock, sock.makefile("rb") as f:
+        requests = [b"not json\n", b"[1, 2]\n",
+                    b'{"id": 1, "op": ["add_task"]}\n',
+                    b'{"id": 2, "op": "add_task", "args": {"name": "a"}}\n',
+                    b'{"id": 3, "op": "add_task", "args": ["a", NaN]}\n',
+                    b'{"id": 4, "op": "ping"}\n']
+        sock.sendall(b"".join(requests))
+        responses = [json.loads(f.readline()) for request in requests]
+    assert [response["ok"] for response in responses] == [False] * 5 + [True]
+    assert [response["id"] for response in responses] == [None, None, 1, 2, 3, 4]
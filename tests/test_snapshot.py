@@ -0,0 +1,94 @@
+import os
+import pytest
+import ebs_core as core
+from ebs_bench import generate_data
+from ebs_model import Task, TaskRepository
+from ebs_snapshot import Snapshot, write_snapshot
+from ebs_storage import SnapshotStore, save_data
+
+def _same_stats(a, b):
+    assert (a.total_tasks, a.count) == (b.total_tasks, b.count)
+    assert a.mean == pytest.approx(b.mean)
+    assert a.m2 == pytest.approx(b.m2)
+    assert a.sketch.buckets == b.sketch.buckets
+
+# Task fields that do not depend on when the test ran
+def _fields(repo):
+    return [(t.name, t.estimated_hours, t.actual_hours, t.completed, list(t.hours)) for t in repo]
+
+@pytest.fixture
+def data():
+    data = generate_data(200, seed=7)
+    # Names and estimators outside ASCII, and a task without segments
+    data["tasks"][0]["name"] = "寫文件 ✓"
+    data["tasks"][1]["estimator"] = "Zoë"
+    data["tasks"].append(Task("blank", 2).to_dict())
+    return data
+
+def test_write_and_map_round_trip(tmp_path, data):
+    repo = TaskRepository.from_data(data)
+    path = str(tmp_path / "tasks.snap")
+    write_snapshot(path, repo, repo.velocity)
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == len(repo)
+        assert snapshot.velocity == repo.velocity
+        assert [task.to_dict() for task in snapshot.tasks()] == [task.to_dict() for task in repo]
+        assert snapshot.task(0).to_dict() == repo.get("寫文件 ✓").to_dict()
+        assert snapshot.task_names() == [(task.name, task.completed) for task in repo]
+        stats = snapshot.velocity_stats()
+        assert stats.total_tasks == len(repo.completed)
+        stats.total_tasks += len(repo.unfinished)
+        _same_stats(stats, repo.stats)
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "tasks.snap"
+    path.write_bytes(b"not a snapshot" + b"\0" * 100)
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+def test_store_converts_json_and_defers_completed_rows(tmp_path, data):
+    path = str(tmp_path / "ebs_data.json")
+    save_data(data, path)
+    full = TaskRepository.from_data(data)
+    store = SnapshotStore(path)
+    repo = store.load_repository()
+    assert os.path.exists(store.snapshot_path)
+    assert list(repo._tasks) == list(full.unfinished)
+    assert len(repo) == len(full)
+    assert repo.velocity == pytest.approx(full.velocity)
+    _same_stats(repo.stats, full.stats)
+    assert "寫文件 ✓" in repo
+    assert repo.get("no such task") is None
+    store.close(repo)
+
+def test_journal_on_deferred_rows_and_compaction(tmp_path, data):
+    path = str(tmp_path / "ebs_data.json")
+    save_data(data, path)
+    full = TaskRepository.from_data(data)
+    store = SnapshotStore(path, compact_every=6)
+    repo = store.load_repository()
+    assert list(repo._tasks) == list(full.unfinished)
+    assert len(repo) == len(full)
+    _same_stats(repo.stats, full.stats)
+    completed = list(full.completed)
+    null = type("Null", (), {"put_task": lambda *a: None, "delete_task": lambda *a: None,
+                             "rename_task": lambda *a: None})()
+    for r, s in ((full, null), (repo, store)):
+        core.modify_task(r, s, completed[0], new_name="renamed")
+        core.delete_task(r, s, completed[1])
+        core.record_time(r, s, completed[2], 2)
+    assert store.records == 4
+    # Reopening replays the journal onto the deferred rows, keeping the order
+    store = SnapshotStore(path, compact_every=6)
+    repo = store.load_repository()
+    _same_stats(repo.stats, full.stats)
+    assert list(repo.names()) == list(full.tasks)
+    # Compaction swaps the snapshot under the deferred rows
+    for r, s in ((full, null), (repo, store)):
+        core.record_time(r, s, completed[3], 1)
+        core.record_time(r, s, completed[3], 1)
+    assert store.records == 0
+    assert repo.get(completed[5]).to_dict() == full.get(completed[5]).to_dict()
+    assert _fields(repo) == _fields(full)
+    assert repo.velocity == pytest.approx(full.velocity)
+    store.close(repo)
@@ -0,0 +1,75 @@
+import pytest
+import ebs_core as core
+from ebs_bench import generate_data
+from ebs_model import TaskRepository
+from ebs_storage import SqliteStore
+
+def _same_stats(a, b):
+    assert (a.total_tasks, a.count) == (b.total_tasks, b.count)
+    assert a.mean == pytest.approx(b.mean)
+    assert a.m2 == pytest.approx(b.m2)
+    assert a.sketch.buckets == b.sketch.buckets
+
+@pytest.fixture
+def dataset(tmp_path):
+    data = generate_data(300, seed=5)
+    SqliteStore(str(tmp_path / "ebs_data.json")).import_data(data)
+    return str(tmp_path / "ebs_data.json"), data
+
+def test_startup_reads_only_unfinished_tasks(dataset):
+    path, data = dataset
+    full = TaskRepository.from_data(data)
+    repo = SqliteStore(path).load_repository()
+    assert list(repo._tasks) == list(full.unfinished)
+    assert len(repo) == len(full)
+    assert repo.velocity == pytest.approx(full.velocity)
+    _same_stats(repo.stats, full.stats)
+    # A completed task is read when it is asked for
+    name = next(iter(full.completed))
+    assert name in repo
+    assert repo.get(name).to_dict() == full.get(name).to_dict()
+    assert list(repo._tasks)[-1] == name and repo.source is not None
+    assert "no such task" not in repo and repo.get("no such task") is None
+    # Listing the names indexes the rest in creation order without reading them
+    assert list(repo.names()) == list(full.tasks)
+    assert repo.source is not None
+    assert repo.to_data() == full.to_data()
+    assert repo.source is None
+
+def test_statistics_follow_changes(dataset):
+    path, data = dataset
+    full = TaskRepository.from_data(data)
+    store = SqliteStore(path)
+    repo = store.load_repository()
+    completed = list(full.completed)
+    unfinished = list(full.unfinished)
+    for r, s in ((full, None), (repo, store)):
+        s = s or type("Null", (), {"put_task": lambda *a: None, "delete_task": lambda *a: None,
+                                   "rename_task": lambda *a: None})()
+        core.modify_task(r, s, completed[0], new_name="renamed", estimated_hours=30)
+        core.delete_task(r, s, completed[1])
+        core.record_time(r, s, completed[2], 1.5)
+        core.delete_time_segment(r, s, completed[3], 0)
+        core.record_time(r, s, unfinished[0], 2)
+        core.finish_task(r, s, unfinished[0])
+        core.add_task(r, s, "new", 3)
+        with pytest.raises(ValueError):
+            core.add_task(r, s, completed[4], 1)
+    assert repo.source is not None
+    assert completed[0] not in repo and completed[1] not in repo and "renamed" in repo
+    _same_stats(repo.stats, full.stats)
+    store.close(repo)
+    reopened = SqliteStore(path)
+    _same_stats(reopened.stats, reopened._count_stats())
+    repo = reopened.load_repository()
+    _same_stats(repo.stats, full.stats)
+    assert sorted(t.name for t in repo) == sorted(full.tasks)
+
+def test_statistics_are_counted_once_for_old_databases(dataset):
+    path, data = dataset
+    store = SqliteStore(path)
+    expected = store.stats
+    with store.conn:
+        store.conn.execute("DELETE FROM meta WHERE key = 'stats'")
+    store.close(None)
+    _same_stats(SqliteStore(path).stats, expected)
@@ -0,0 +1,54 @@
+import random
+from ebs_stats import SKETCH_ACCURACY, QuantileSketch
+
+def _exact(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+def test_quantiles_within_accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(0, 0.6) for _ in range(5000)]
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= SKETCH_ACCURACY * exact * 1.0001
+
+def test_remove_restores_quantiles():
+    rng = random.Random(2)
+    kept = [rng.uniform(0.2, 3) for _ in range(500)]
+    dropped = [rng.uniform(5, 10) for _ in range(500)]
+    sketch = QuantileSketch()
+    for v in kept + dropped:
+        sketch.add(v)
+    for v in dropped:
+        sketch.remove(v)
+    assert sketch.count == len(kept)
+    exact = _exact(kept, 0.5)
+    assert abs(sketch.quantile(0.5) - exact) <= SKETCH_ACCURACY * exact * 1.0001
+
+def test_remove_unknown_value_is_ignored():
+    sketch = QuantileSketch()
+    sketch.add(1.0)
+    sketch.remove(2.0)
+    sketch.remove(0.0)
+    assert sketch.count == 1
+    assert sketch.zero_count == 0
+    assert all(count > 0 for count in sketch.buckets.values())
+    sketch.remove(1.0)
+    sketch.remove(1.0)
+    assert sketch.count == 0 and not sketch.buckets
+    assert sketch.quantile(0.5) is None
+
+def test_merge_and_round_trip():
+    a, b = QuantileSketch(), QuantileSketch()
+    for v in (0.5, 1, 2):
+        a.add(v)
+    for v in (0, 4):
+        b.add(v)
+    a.merge(b)
+    restored = QuantileSketch.from_dict(a.to_dict())
+    assert restored.count == 5 and restored.zero_count == 1
+    assert restored.quantile(0) == 0.0
+    assert restored.quantile(1) == a.quantile(1)
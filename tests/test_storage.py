@@ -0,0 +1,96 @@
+import json
+import os
+import pytest
+import ebs_core as core
+from ebs_storage import STORES, JournalStore, open_store
+
+# A few tasks touched by every kind of change
+def _edit(repo, store):
+    core.add_task(repo, store, "spec", 3, "ann")
+    core.add_task(repo, store, "build", 8, "bob")
+    core.add_task(repo, store, "ship", 2)
+    core.add_task(repo, store, "scrap", 1)
+    core.record_time(repo, store, "spec", 2)
+    core.record_time(repo, store, "spec", 2.5)
+    core.finish_task(repo, store, "spec")
+    core.record_time(repo, store, "build", 4)
+    core.record_time(repo, store, "build", 1)
+    core.delete_time_segment(repo, store, "build", 0)
+    core.modify_task(repo, store, "ship", new_name="release", estimated_hours=3)
+    core.delete_task(repo, store, "scrap")
+
+def _reopen(mode, path):
+    store = open_store(mode, path)
+    return core.open_repository(store), store
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_write_reopen_round_trip(tmp_path, mode):
+    path = str(tmp_path / "ebs_data.json")
+    repo, store = _reopen(mode, path)
+    _edit(repo, store)
+    expected = repo.to_data()
+    store.close(repo)
+    reopened, store = _reopen(mode, path)
+    assert reopened.to_data() == expected
+    assert list(reopened.names()) == ["spec", "build", "release"]
+    # A second session's changes land on top of the first
+    core.finish_task(reopened, store, "build")
+    expected = reopened.to_data()
+    store.close(reopened)
+    reopened, store = _reopen(mode, path)
+    assert reopened.to_data() == expected
+    assert reopened.velocity == expected["velocity"]
+    store.close(reopened)
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_reopen_without_close(tmp_path, mode):
+    path = str(tmp_path / "ebs_data.json")
+    repo, store = _reopen(mode, path)
+    _edit(repo, store)
+    expected = repo.to_data()
+    reopened, _ = _reopen(mode, path)
+    assert reopened.to_data() == expected
+
+def test_default_mode_is_json(tmp_path, monkeypatch):
+    monkeypatch.delenv("EBS_STORAGE", raising=False)
+    assert type(open_store(path=str(tmp_path / "ebs_data.json"))) is STORES["json"]
+    monkeypatch.setenv("EBS_STORAGE", "journal")
+    assert type(open_store(path=str(tmp_path / "ebs_data.json"))) is JournalStore
+    with pytest.raises(ValueError):
+        open_store("paper")
+
+def test_journal_compacts(tmp_path):
+    path = str(tmp_path / "ebs_data.json")
+    store = JournalStore(path, compact_every=3)
+    repo = core.open_repository(store)
+    core.add_task(repo, store, "a", 1)
+    core.add_task(repo, store, "b", 1)
+    assert os.path.exists(store.journal_path)
+    core.add_task(repo, store, "c", 1)
+    assert not os.path.exists(store.journal_path)
+    with open(path, encoding="utf-8") as f:
+        assert [task["name"] for task in json.load(f)["tasks"]] == ["a", "b", "c"]
+
+def test_journal_torn_last_line(tmp_path):
+    path = str(tmp_path / "ebs_data.json")
+    store = JournalStore(path)
+    repo = core.open_repository(store)
+    core.add_task(repo, store, "a", 1)
+    core.record_time(repo, store, "a", 2)
+    expected = repo.to_data()
+    core.add_task(repo, store, "b", 1)
+    # A crash in the middle of the last append
+    with open(store.journal_path, "rb") as f:
+        lines = f.readlines()
+    with open(store.journal_path, "wb") as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])
+    reopened = core.open_repository(JournalStore(path))
+    assert reopened.to_data() == expected
+    with open(store.journal_path, "rb") as f:
+        assert f.read() == b"".join(lines[:-1])
+    # New records follow the last good line
+    store = JournalStore(path)
+    reopened = core.open_repository(store)
+    core.add_task(reopened, store, "c", 1)
+    assert list(core.open_repository(JournalStore(path)).names()) == ["a", "c"]
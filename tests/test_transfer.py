@@ -0,0 +1,74 @@
+import json
+import pytest
+import ebs_core as core
+from ebs_storage import open_store
+from ebs_transfer import detect_format, export_file, import_file
+
+@pytest.fixture
+def session(tmp_path):
+    store = open_store("json", str(tmp_path / "ebs_data.json"))
+    return core.open_repository(store), store
+
+def _write_jsonl(path, records):
+    path.write_text("\n".join(r if isinstance(r, str) else json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_import_round_trip(tmp_path, session, fmt):
+    repo, store = session
+    core.add_task(repo, store, "a", 2, "ann")
+    core.record_time(repo, store, "a", 1.5)
+    core.record_time(repo, store, "a", 1)
+    core.finish_task(repo, store, "a")
+    core.add_task(repo, store, "b", 3)
+    path = str(tmp_path / f"tasks.{fmt}")
+    assert export_file(repo, path) == 2
+    other_store = open_store("json", str(tmp_path / "other.json"))
+    tasks, skipped = import_file(core.open_repository(other_store), other_store, path)
+    assert (len(tasks), skipped) == (2, 0)
+    other = core.open_repository(other_store)
+    for name in ("a", "b"):
+        assert other.get(name).to_dict() == repo.get(name).to_dict()
+
+def test_invalid_records_import_nothing(tmp_path, session):
+    repo, store = session
+    path = _write_jsonl(tmp_path / "tasks.jsonl", [
+        {"name": "ok", "estimated_hours": 1},
+        {"name": "", "estimated_hours": 1},
+        {"name": "neg", "estimated_hours": -1},
+        {"name": "flag", "estimated_hours": True},
+        {"name": "seg", "estimated_hours": 1, "time_segments": [{"hours": 1, "timestamp": "yesterday"}]},
+        "{broken",
+        "[1]",
+    ])
+    with pytest.raises(ValueError) as raised:
+        import_file(repo, store, path)
+    message = str(raised.value)
+    assert [f"line {n}:" in message for n in range(1, 8)] == [False] + [True] * 6
+    assert "ok" not in repo
+    assert "ok" not in core.open_repository(store)
+
+def test_duplicates_are_errors_or_skipped(tmp_path, session):
+    repo, store = session
+    core.add_task(repo, store, "a", 1)
+    path = _write_jsonl(tmp_path / "tasks.jsonl", [{"name": "a", "estimated_hours": 2},
+                                                   {"name": "b", "estimated_hours": 2},
+                                                   {"name": "b", "estimated_hours": 3}])
+    with pytest.raises(ValueError, match="already exists"):
+        import_file(repo, store, path)
+    tasks, skipped = import_file(repo, store, path, skip_duplicates=True)
+    assert ([task.name for task in tasks], skipped) == (["b"], 2)
+    assert core.open_repository(store).get("b").estimated_hours == 2
+
+def test_csv_requires_name_and_estimate_columns(tmp_path, session):
+    path = tmp_path / "tasks.csv"
+    path.write_text("name,estimator\na,ann\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="estimated_hours"):
+        import_file(*session, str(path))
+
+def test_detect_format():
+    assert detect_format("x.CSV") == "csv"
+    assert detect_format("x.ndjson") == "jsonl"
+    assert detect_format("x.txt", "csv") == "csv"
+    with pytest.raises(ValueError):
+        detect_format("x.txt")
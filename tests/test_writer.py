@@ -0,0 +1,41 @@
+import pytest
+import ebs_core as core
+from ebs_storage import STORES, open_store
+from ebs_writer import BackgroundWriter, Shadow, coalesce
+
+def _put(name, hours=1):
+    return ("put", {"name": name, "estimated_hours": hours})
+
+def test_coalesce_keeps_last_put_in_first_position():
+    changes = [_put("a"), _put("b"), _put("a", 2), _put("b", 3), _put("a", 4)]
+    assert coalesce(changes) == [_put("a", 4), _put("b", 3)]
+
+def test_coalesce_stops_at_rename_and_delete():
+    changes = [_put("a"), ("rename", "a", "c"), _put("c", 2), _put("b"), ("delete", "b"), _put("b", 5), _put("c", 3)]
+    assert coalesce(changes) == [_put("a"), ("rename", "a", "c"), _put("c", 3), _put("b"), ("delete", "b"), _put("b", 5)]
+
+def test_coalesced_batch_gives_same_shadow():
+    changes = [_put("a"), _put("b"), ("rename", "a", "c"), _put("c", 2), ("delete", "b"), _put("b", 7), _put("c", 9)]
+    direct, merged = Shadow({"tasks": []}), Shadow({"tasks": []})
+    for change in changes:
+        direct.apply(change)
+    for change in coalesce(changes):
+        merged.apply(change)
+    assert direct.to_data() == merged.to_data()
+
+@pytest.mark.parametrize("mode", sorted(STORES))
+def test_background_writer_persists_on_close(tmp_path, mode):
+    path = str(tmp_path / "ebs_data.json")
+    store = open_store(mode, path)
+    repo = core.open_repository(store)
+    data = {"tasks": [], "velocity": repo.velocity} if hasattr(store, "load_repository") else repo.to_data()
+    writer = BackgroundWriter(store, data, flush_interval=60)
+    core.add_task(repo, writer, "a", 2)
+    core.add_task(repo, writer, "b", 3)
+    core.record_time(repo, writer, "a", 1)
+    core.finish_task(repo, writer, "a")
+    core.modify_task(repo, writer, "b", new_name="c")
+    expected = repo.to_data()
+    writer.close()
+    assert writer.poll_errors() == []
+    assert core.open_repository(open_store(mode, path)).to_data() == expected